@@ -0,0 +1,213 @@
+"""
+Anytime solving: HiGHS reports every improving integer solution through its callback, and
+each one is written at once as a timestamped submission with a progress record (objective,
+bound, gap, elapsed seconds), so a usable plan is on disk long before the solve ends and
+survives the process being killed.
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+from model_cache import ModelCache
+from submission import submission_from_arrays
+
+
+# plans a solve can start from, see start_values
+STARTS = ["greedy", "relax_round", "none"]
+
+
+class IncumbentWriter:
+    """
+    This class writes every incumbent of a solve as a submission and a progress record
+
+    parameters: columns: list: (component, index) of every solver column, None for columns
+                               that are not decision variables
+                output_dir: str: directory of the submissions and of progress.jsonl
+                prefix: str: file name prefix of the submissions
+
+    Each incumbent goes to <prefix>_<YYYYmmdd-HHMMSS.ffffff>.csv and is copied over
+    <prefix>_best.csv, replaced atomically so a reader never sees a partial file.
+    """
+
+    def __init__(self, columns, output_dir = "incumbents", prefix = "submission"):
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.started = time.perf_counter()
+        self.records = []
+        os.makedirs(output_dir, exist_ok = True)
+        self.best_path = os.path.join(output_dir, f"{prefix}_best.csv")
+        self.progress_path = os.path.join(output_dir, "progress.jsonl")
+
+        # column positions of every component, so an incumbent is split by fancy indexing
+        grouped = {}
+        for position, key in enumerate(columns):
+            if key is not None:
+                component, index = key
+                grouped.setdefault(component, ([], []))
+                grouped[component][0].append(index)
+                grouped[component][1].append(position)
+        self.components = {name: (keys, np.array(positions)) for name, (keys, positions) in grouped.items()}
+
+    def write(self, solution, objective, bound = None, source = "solver"):
+        """
+        This function writes one incumbent and returns its progress record
+
+        parameters: solution: array: value of every solver column
+                    objective: float: objective of the incumbent
+                    bound: float: optional, best dual bound when it was found
+                    source: str: what produced it, "start" for the initial plan
+        """
+        solution = np.asarray(solution, dtype = float)
+        now = datetime.now()
+        path = os.path.join(self.output_dir, f"{self.prefix}_{now.strftime('%Y%m%d-%H%M%S.%f')}.csv")
+        arrays = {name: (keys, solution[positions]) for name, (keys, positions) in self.components.items()}
+        submission_from_arrays(arrays, path)
+
+        scratch = self.best_path + ".tmp"
+        with open(path, "rb") as source_file, open(scratch, "wb") as target:
+            target.write(source_file.read())
+        os.replace(scratch, self.best_path)
+
+        finite = bound is not None and np.isfinite(bound)
+        record = {
+            "time": now.isoformat(timespec = "milliseconds"),
+            "elapsed": time.perf_counter() - self.started,
+            "objective": float(objective),
+            "bound": float(bound) if finite else None,
+            "gap": float((objective - bound) / abs(objective)) if finite and objective else None,
+            "source": source,
+            "file": path,
+        }
+        self.records.append(record)
+        with open(self.progress_path, "a") as file:
+            file.write(json.dumps(record) + "\n")
+            file.flush()
+        return record
+
+
+def start_values(dataset, start):
+    """
+    This function returns the decision values of a starting plan
+
+    parameters: dataset: FleetDataset: the loaded dataset
+                start: str: "greedy" (milliseconds) or "relax_round" (LP rounding, about a minute)
+
+    returns component name -> {index: value} for the sparse linear model, None when the greedy
+    plan can not be repaired into a feasible one
+    """
+    from catalog import VehicleCatalog
+    from fleet_model import build_model
+    from rolling_horizon import model_values
+
+    catalog = VehicleCatalog(dataset)
+    if start == "relax_round":
+        from relax_round import solve_relax_round
+
+        return solve_relax_round(dataset, catalog, polish = False)["values"]
+    if start == "greedy":
+        from greedy import GreedyPlanner
+        from warm_start import warm_start_from_submission
+
+        model = build_model(dataset, catalog, linear = True, sparse = True)
+        loaded, _ = warm_start_from_submission(model, GreedyPlanner(dataset, catalog).plan(), catalog)
+        return model_values(model) if loaded else None
+    raise ValueError(f"start must be one of {', '.join(STARTS)}")
+
+
+def solve_anytime(data_dir = "dataset", output_dir = "incumbents", gap = None, time_limit = None, threads = None,
+                  start = "greedy", cache = None, tee = False):
+    """
+    This function solves the sparse linear fleet model with HiGHS and streams its incumbents to disk
+
+    parameters: data_dir: str: dataset directory
+                output_dir: str: directory of the timestamped submissions and progress.jsonl
+                gap: float: optional, stop once the relative gap is at most this
+                time_limit: float: optional, stop after this many seconds of solving
+                threads: int: optional, HiGHS threads
+                start: str: plan handed to HiGHS as its first incumbent, one of STARTS; it is
+                            written before the solve starts
+                cache: ModelCache: optional, cache of the model file, .model_cache by default
+                tee: bool: stream the HiGHS log
+
+    Whichever of the gap and the time limit is reached first stops the solve.
+
+    returns the progress records, one per incumbent plus a final one with the status
+    """
+    import highspy
+
+    from fleet_data import FleetDataset
+
+    cache = cache or ModelCache()
+    entry = cache.load_or_build(data_dir = data_dir, linear = True, sparse = True)
+    highs = highspy.Highs()
+    highs.setOptionValue("output_flag", tee)
+    for option, value in (("time_limit", time_limit), ("mip_rel_gap", gap), ("threads", threads)):
+        if value is not None:
+            highs.setOptionValue(option, value)
+    if highs.readModel(entry.path) == highspy.HighsStatus.kError:
+        raise RuntimeError(f"HiGHS could not read {entry.path}")
+
+    names = highs.getLp().col_names_
+    columns = [entry.symbols["columns"].get(name) for name in names]
+    writer = IncumbentWriter(columns, output_dir)
+
+    values = start_values(FleetDataset.load(data_dir), start) if start != "none" else None
+    if values is not None:
+        initial = np.array([values.get(key[0], {}).get(key[1], 0.0) if key else 0.0 for key in columns])
+        solution = highspy.HighsSolution()
+        solution.col_value = initial.tolist()
+        solution.value_valid = True
+        highs.setSolution(solution)
+        lp = highs.getLp()
+        objective = lp.offset_ + float(np.dot(lp.col_cost_, initial))
+        writer.write(initial, objective, source = "start")
+
+    def improving(event):
+        out = event.data_out
+        # HiGHS also reports the accepted start, only strictly better plans are written
+        if writer.records and out.mip_primal_bound >= writer.records[-1]["objective"] * (1 - 1e-9):
+            return
+        writer.write(out.mip_solution, out.mip_primal_bound, out.mip_dual_bound)
+
+    highs.cbMipImprovingSolution.subscribe(improving)
+    highs.run()
+
+    info = highs.getInfo()
+    writer.records.append({
+        "time": datetime.now().isoformat(timespec = "milliseconds"),
+        "elapsed": time.perf_counter() - writer.started,
+        "objective": info.objective_function_value if info.primal_solution_status == 2 else None,
+        "bound": info.mip_dual_bound,
+        "gap": info.mip_gap,
+        "source": "final",
+        "status": highs.modelStatusToString(highs.getModelStatus()),
+    })
+    with open(writer.progress_path, "a") as file:
+        file.write(json.dumps(writer.records[-1]) + "\n")
+    return writer.records
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "solve the fleet model, writing every better plan as it is found")
+    parser.add_argument("--data", default = "dataset", help = "dataset directory")
+    parser.add_argument("--output-dir", default = "incumbents", help = "directory of the timestamped submissions and progress.jsonl")
+    parser.add_argument("--gap", type = float, default = None, help = "stop once the relative gap is at most this")
+    parser.add_argument("--time-limit", type = float, default = 300, help = "stop after this many seconds")
+    parser.add_argument("--threads", type = int, default = None, help = "HiGHS threads")
+    parser.add_argument("--start", default = "greedy", choices = STARTS, help = "first incumbent handed to HiGHS")
+    parser.add_argument("--cache", default = ".model_cache", help = "model cache directory")
+    parser.add_argument("--verbose", action = "store_true", help = "stream the HiGHS log")
+    args = parser.parse_args()
+
+    records = solve_anytime(
+        args.data, args.output_dir, args.gap, args.time_limit, args.threads, args.start, ModelCache(args.cache), args.verbose,
+    )
+    for record in records:
+        gap = f"{record['gap']:.2%}" if record["gap"] is not None else "-"
+        objective = f"{record['objective']:,.2f}" if record["objective"] is not None else "-"
+        print(f"{record['elapsed']:8.1f}s {record['source']:<7} {objective:>18} gap {gap}")
+    print("best plan", os.path.join(args.output_dir, "submission_best.csv"))
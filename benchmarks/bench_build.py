@@ -0,0 +1,500 @@
+"""
+Build-time benchmark: the row-by-row model construction main.py used to do against the
+same model built with indexed rules over the precomputed vehicle catalog. Both builders
+must give the same row and column counts before they are timed.
+
+fleet_model.build_model, with and without the cohort stock variables and the sparse index
+sets, is timed too, but it builds a different model (see its docstring), so it is reported
+apart and not as a speedup.
+
+usage: python benchmarks/bench_build.py [--data dataset] [--repeat 3] [--skip-legacy]
+"""
+import argparse
+import os
+import sys
+import time
+
+import pyomo.environ as pe
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import VehicleCatalog
+from fleet_data import FleetDataset
+from fleet_model import build_model
+
+
+def build_legacy_model(dataset):
+    """
+    This function is the model construction of main.py before the catalog builder, kept as the baseline
+    """
+    data = dataset.frames["vehicles"]
+
+    years = (range(2023, 2039))
+    vehicles = data["ID"]
+    size_bucket = {'S1', 'S2', 'S3', 'S4'}
+    distance_bucket = {'D1', 'D2', 'D3', 'D4'}
+    fuel_types = {'Electricity', 'B20', 'LNG', 'BioLNG', 'HVO'}
+    vehicle_cost = dataset.vehicle_cost_dict()
+    vehicle_range = dataset.vehicle_range_dict()
+    vehicle_consumption = dataset.vehicle_consumption_dict()
+    vehicle_demand = dataset.vehicle_demand_dict()
+    fuel_emissions = dataset.fuel_emissions_dict()
+    fuel_cost = dataset.fuel_cost_dict()
+
+
+    ### Model
+
+    model = pe.ConcreteModel()
+
+
+    # Set
+
+    model.years = pe.Set(initialize = years)
+    model.vehicles = pe.Set(initialize = vehicles)
+    model.size = pe.Set(initialize = size_bucket)
+    model.distance = pe.Set(initialize = distance_bucket)
+    model.fuel = pe.Set(initialize = fuel_types)
+    carbon_emission = dataset.carbon_emissions_dict()
+
+
+    # parameters
+
+    model.carbon_emissions = pe.Param(model.years, initialize = carbon_emission)
+    model.vehicle_cost = pe.Param(model.vehicles, initialize = vehicle_cost)
+    model.vehicle_range = pe.Param(model.vehicles, initialize = vehicle_range)
+    model.vehicle_consumption = pe.Param(model.vehicles, model.fuel, initialize = vehicle_consumption, default = 0.0)
+    model.vehicle_demand = pe.Param(model.years, model.size, model.distance, initialize = vehicle_demand)
+    model.fuel_emissions = pe.Param(model.fuel, model.years, initialize = fuel_emissions)
+    model.fuel_cost = pe.Param(model.fuel, model.years, initialize = fuel_cost)
+
+
+    # variables 
+
+    model.number_vehicles_bought = pe.Var(model.vehicles, model.years, domain = pe.NonNegativeIntegers)
+    model.number_vehicles_use = pe.Var(model.vehicles, model.fuel, model.years, domain = pe.NonNegativeIntegers)
+    model.number_vehicles_sold = pe.Var(model.vehicles, model.years, domain = pe.NonNegativeIntegers)
+    model.number_vehicles_distance = pe.Var(model.vehicles, model.fuel, model.years, domain = pe.NonNegativeIntegers)
+
+
+    # constraint 1
+
+    model.size_constraint = pe.ConstraintList()
+
+    size_to_vehicles = {size: list(data[data["Size"] == size]["ID"]) for size in size_bucket}
+
+    for year in years:
+        for size in size_bucket:
+            for distance in distance_bucket:
+                model.size_constraint.add(
+                    sum(model.number_vehicles_distance[v, f, year] for v in size_to_vehicles[size] for f in fuel_types) >= model.vehicle_demand[year, size, distance]
+                )    
+
+
+    # constraint 2
+
+    model.distance_constraint = pe.ConstraintList()
+
+    # Vehicle belonging to distance bucket Dx can satisfy all demands for distance bucket D1 to 
+    # Dx. For example, vehicle belonging to distance bucket D4 can satisfy demand of D1, D2, 
+    # D3, D4buckets; similarly, D3 can satisfy D1, D2, D3 but NOT D4
+
+    distance_satisfies = {
+        'D1': ['D1'],
+        'D2': ['D1', 'D2'],
+        'D3': ['D1', 'D2', 'D3'],
+        'D4': ['D1', 'D2', 'D3', 'D4']
+    }
+
+    for year in years:
+        for size in size_bucket:
+            for distance in distance_bucket:
+                valid_distances = distance_satisfies[distance]
+                model.distance_constraint.add(
+                    sum(model.number_vehicles_distance[v, f, year] 
+                        for v in vehicles 
+                        for f in fuel_types
+                        if data[data["ID"] == v]["Distance"].values[0] in valid_distances
+                        ) >= model.vehicle_demand[year, size, distance]
+                )
+
+
+    # constraints 3
+
+    model.carbon_emission_constraint = pe.ConstraintList()
+
+    # total carbon emission by fleet operation each year should be within the respective year's carbon emission limit provided in the carbon_emission csv file
+
+    for year in years:
+        model.carbon_emission_constraint.add(
+            sum(
+                model.number_vehicles_distance[v, f, year] *
+                model.number_vehicles_use[v, f, year] *
+                model.vehicle_consumption[v, f] *
+                model.fuel_emissions[f, year]
+                for v in vehicles
+                for f in fuel_types
+            ) <= model.carbon_emissions[year]
+        )
+
+
+    # constraints 4
+
+    model.yearly_demand_constraint = pe.ConstraintList()
+
+    # Total yearly demand for each year must be satisfied for each distance and size bucket
+
+    vehicles_ids_by_size = { size: data[data['Size'] == size]['ID'].tolist() for size in size_bucket}
+
+    for year in years:
+        for size in size_bucket:
+            for distance in distance_bucket:
+                demand_value = model.vehicle_demand[year, size, distance]
+                if demand_value > 0:
+                    model.yearly_demand_constraint.add(
+                        sum(
+                            model.number_vehicles_distance[v, f, year] *
+                            model.number_vehicles_use[v, f, year]
+                            for v in vehicles_ids_by_size[size]
+                            for f in fuel_types
+                        ) >= demand_value
+                    )
+
+
+    # constraint 5
+
+    model.vehicle_purchase_constraint = pe.ConstraintList()
+
+    # Vehicle model of year 20xx can only be bought in the year 20xx. For example, 
+    # Diesel_S1_2026 can only be bought in 2026 and not in any subsequent or previous years.
+
+    vehicle_model_year = {}
+    for v in vehicles:
+        year = int(v.split('_')[-1])
+        vehicle_model_year[v] = year
+
+    for v in vehicles:
+        model_year = vehicle_model_year[v]
+        for year in years:
+            if year != model.years:
+                model.vehicle_purchase_constraint.add(
+                    model.number_vehicles_bought[v, year] == 0
+                )
+
+
+    # constraint 6
+
+    model.vehicle_lifetime_constraint = pe.ConstraintList()
+
+    # Every vehicle has a 10-year life and must be sold by the end of 10th year. For example, a 
+    # vehicle bought in 2025 must be sold by the end of 2034. 
+
+    for v in vehicles:
+        for purchase_year in years:
+            sell_years = range(purchase_year, min(purchase_year + 10, max(years) + 1))
+            model.vehicle_lifetime_constraint.add(
+                sum(model.number_vehicles_sold[v, sell_year] for sell_year in sell_years) >= model.number_vehicles_bought[v, purchase_year]
+            )
+
+
+    # constraint  7
+
+    # You cannot buy/sell a vehicle mid-year. All buy operations happen at the beginning of the 
+    # year and all sell operations happen at the end of the year
+
+    model.use_after_purchase_constraint = pe.ConstraintList()
+
+    for v in vehicles:
+        for year in years:
+            model.use_after_purchase_constraint.add(        
+                sum(model.number_vehicles_use[v, f, year] for f in fuel_types) <= 
+                sum(model.number_vehicles_bought[v, y] for y in years if y <= year)
+            )
+
+    model.sell_at_end_of_year_constraint = pe.ConstraintList()
+
+    for v in vehicles:
+        for year in years:
+            model.sell_at_end_of_year_constraint.add(
+                sum(model.number_vehicles_sold[v, y] for y in years if y <= year) <=
+                sum(model.number_vehicles_bought[v, y] for y in years if y <= year)
+            )
+
+
+    # constraint 8 
+
+    # Every year at most 20% of the vehicles in the existing fleet can be sold
+
+    model.sell_limit_constraint = pe.ConstraintList()
+
+    for year in years:
+        for v in vehicles:
+            existing_fleet = sum(model.number_vehicles_bought[v,y] - model.number_vehicles_sold[v, y] for y in years if y <= year)
+            model.sell_limit_constraint.add(
+                model.number_vehicles_sold[v, year] <=  0.2 * existing_fleet
+            )
+
+
+    # cost profiles
+
+    resale_value = dict(enumerate(dataset.resale_value.tolist(), start=1))
+    insurance_cost = dict(enumerate(dataset.insurance_cost.tolist(), start=1))
+    maintenance_cost = dict(enumerate(dataset.maintenance_cost.tolist(), start=1))
+    # Objective function
+
+    def total_cost(model):
+
+        # buying cost
+        buying_cost = sum(
+            model.number_vehicles_bought[v, year] * model.vehicle_cost[v] 
+            for v in model.vehicles for year in model.years
+        ) 
+
+        # Insurance cost
+        ins_cost = sum ( 
+            insurance_cost[min(year - y + 1, 10)] *
+            model.vehicle_cost[v] * 
+            model.number_vehicles_bought[v, y]
+            for v in model.vehicles for year in model.years for y in model.years if y <= year
+        ) 
+
+        # Maintaenance cost
+        mnt_cost = sum(
+           model.vehicle_cost[v] * maintenance_cost[min(year - y + 1, 10)] *
+            model.number_vehicles_bought[v, y]
+            for v in model.vehicles for year in model.years for y in model.years if y <= year
+        ) 
+
+        # fuel cost
+        fuel_cost = sum(
+            model.number_vehicles_distance[v, f, year] * 
+            model.vehicle_consumption[v, f] *
+            model.fuel_cost[f, year]
+            for v in model.vehicles for f in model.fuel for year in model.years
+        )
+
+        # selling cost
+        sl_cost = sum(
+            model.number_vehicles_sold[v, year] * model.vehicle_cost[v] *
+            resale_value[min(year - y + 1, 10)]
+            for v in model.vehicles for year in model.years for y in model.years if y <= year
+        ) 
+
+        return buying_cost + ins_cost + mnt_cost + fuel_cost - sl_cost
+
+    model.total_cost = pe.Objective(rule = total_cost, sense = pe.minimize)
+
+    return model
+
+
+def build_indexed_legacy_model(dataset, catalog = None):
+    """
+    This function builds the same model as build_legacy_model with indexed rules and quicksum over the catalog
+
+    Every constraint family, variable and objective term of main.py is kept as it was, including
+    its purchase rule, which compared a year with the year set and so forbade every purchase.
+    """
+    catalog = catalog or VehicleCatalog(dataset)
+    years = catalog.years
+    vehicles = dataset.vehicle_ids
+    fuel_types = dataset.fuels
+    first_year, last_year = years[0], years[-1]
+
+    model = pe.ConcreteModel()
+
+    # Set
+
+    model.years = pe.Set(initialize = years)
+    model.vehicles = pe.Set(initialize = vehicles)
+    model.size = pe.Set(initialize = dataset.sizes)
+    model.distance = pe.Set(initialize = dataset.distances)
+    model.fuel = pe.Set(initialize = fuel_types)
+
+    # parameters
+
+    model.carbon_emissions = pe.Param(model.years, initialize = dataset.carbon_emissions_dict())
+    model.vehicle_cost = pe.Param(model.vehicles, initialize = dataset.vehicle_cost_dict())
+    model.vehicle_range = pe.Param(model.vehicles, initialize = dataset.vehicle_range_dict())
+    model.vehicle_consumption = pe.Param(model.vehicles, model.fuel, initialize = dataset.vehicle_consumption_dict(), default = 0.0)
+    model.vehicle_demand = pe.Param(model.years, model.size, model.distance, initialize = dataset.vehicle_demand_dict())
+    model.fuel_emissions = pe.Param(model.fuel, model.years, initialize = dataset.fuel_emissions_dict())
+    model.fuel_cost = pe.Param(model.fuel, model.years, initialize = dataset.fuel_cost_dict())
+
+    # variables
+
+    model.number_vehicles_bought = pe.Var(model.vehicles, model.years, domain = pe.NonNegativeIntegers)
+    model.number_vehicles_use = pe.Var(model.vehicles, model.fuel, model.years, domain = pe.NonNegativeIntegers)
+    model.number_vehicles_sold = pe.Var(model.vehicles, model.years, domain = pe.NonNegativeIntegers)
+    model.number_vehicles_distance = pe.Var(model.vehicles, model.fuel, model.years, domain = pe.NonNegativeIntegers)
+
+    # constraint 1
+
+    def size_rule(m, year, size, distance):
+        return pe.quicksum(
+            m.number_vehicles_distance[v, f, year] for v in catalog.by_size[size] for f in fuel_types
+        ) >= m.vehicle_demand[year, size, distance]
+
+    model.size_constraint = pe.Constraint(model.years, model.size, model.distance, rule = size_rule)
+
+    # constraint 2, with the bucket order of main.py: a demand of bucket Dx counts the vehicles of D1 to Dx
+
+    by_distance = {
+        distance: [v for v in vehicles if catalog.vehicles[v].distance in dataset.distances[: position + 1]]
+        for position, distance in enumerate(dataset.distances)
+    }
+
+    def distance_rule(m, year, size, distance):
+        return pe.quicksum(
+            m.number_vehicles_distance[v, f, year] for v in by_distance[distance] for f in fuel_types
+        ) >= m.vehicle_demand[year, size, distance]
+
+    model.distance_constraint = pe.Constraint(model.years, model.size, model.distance, rule = distance_rule)
+
+    # constraints 3
+
+    def carbon_emission_rule(m, year):
+        return pe.quicksum(
+            m.number_vehicles_distance[v, f, year] * m.number_vehicles_use[v, f, year]
+            * m.vehicle_consumption[v, f] * m.fuel_emissions[f, year]
+            for v in vehicles for f in fuel_types
+        ) <= m.carbon_emissions[year]
+
+    model.carbon_emission_constraint = pe.Constraint(model.years, rule = carbon_emission_rule)
+
+    # constraints 4
+
+    def yearly_demand_rule(m, year, size, distance):
+        demand_value = m.vehicle_demand[year, size, distance]
+        if demand_value <= 0:
+            return pe.Constraint.Skip
+        return pe.quicksum(
+            m.number_vehicles_distance[v, f, year] * m.number_vehicles_use[v, f, year]
+            for v in catalog.by_size[size] for f in fuel_types
+        ) >= demand_value
+
+    model.yearly_demand_constraint = pe.Constraint(model.years, model.size, model.distance, rule = yearly_demand_rule)
+
+    # constraint 5
+
+    def vehicle_purchase_rule(m, v, year):
+        return m.number_vehicles_bought[v, year] == 0
+
+    model.vehicle_purchase_constraint = pe.Constraint(model.vehicles, model.years, rule = vehicle_purchase_rule)
+
+    # constraint 6
+
+    def vehicle_lifetime_rule(m, v, purchase_year):
+        return pe.quicksum(
+            m.number_vehicles_sold[v, year] for year in range(purchase_year, min(purchase_year + 10, last_year + 1))
+        ) >= m.number_vehicles_bought[v, purchase_year]
+
+    model.vehicle_lifetime_constraint = pe.Constraint(model.vehicles, model.years, rule = vehicle_lifetime_rule)
+
+    # constraint  7
+
+    def bought_to(m, v, year):
+        return pe.quicksum(m.number_vehicles_bought[v, y] for y in range(first_year, year + 1))
+
+    def use_after_purchase_rule(m, v, year):
+        return pe.quicksum(m.number_vehicles_use[v, f, year] for f in fuel_types) <= bought_to(m, v, year)
+
+    model.use_after_purchase_constraint = pe.Constraint(model.vehicles, model.years, rule = use_after_purchase_rule)
+
+    def sell_at_end_of_year_rule(m, v, year):
+        return pe.quicksum(m.number_vehicles_sold[v, y] for y in range(first_year, year + 1)) <= bought_to(m, v, year)
+
+    model.sell_at_end_of_year_constraint = pe.Constraint(model.vehicles, model.years, rule = sell_at_end_of_year_rule)
+
+    # constraint 8
+
+    def sell_limit_rule(m, year, v):
+        existing_fleet = pe.quicksum(
+            m.number_vehicles_bought[v, y] - m.number_vehicles_sold[v, y] for y in range(first_year, year + 1)
+        )
+        return m.number_vehicles_sold[v, year] <= 0.2 * existing_fleet
+
+    model.sell_limit_constraint = pe.Constraint(model.years, model.vehicles, rule = sell_limit_rule)
+
+    # Objective function, the age factor of main.py summed once per (purchase year, year) pair
+
+    resale_value = dataset.resale_value.tolist()
+    holding_cost = (dataset.insurance_cost + dataset.maintenance_cost).tolist()
+    # the insurance and maintenance of a purchase in year y are paid in every year from y on
+    bought_factor = {y: sum(holding_cost[min(year - y + 1, 10) - 1] for year in years if year >= y) for y in years}
+    # the resale value of a sale in year is summed over every y <= year
+    sold_factor = {year: sum(resale_value[min(year - y + 1, 10) - 1] for y in years if y <= year) for year in years}
+
+    def total_cost(m):
+        return pe.quicksum(
+            m.vehicle_cost[v] * (1 + bought_factor[year]) * m.number_vehicles_bought[v, year]
+            for v in vehicles for year in years
+        ) + pe.quicksum(
+            m.number_vehicles_distance[v, f, year] * m.vehicle_consumption[v, f] * m.fuel_cost[f, year]
+            for v in vehicles for f in fuel_types for year in years
+        ) - pe.quicksum(
+            m.vehicle_cost[v] * sold_factor[year] * m.number_vehicles_sold[v, year]
+            for v in vehicles for year in years
+        )
+
+    model.total_cost = pe.Objective(rule = total_cost, sense = pe.minimize)
+
+    return model
+
+
+def model_size(model):
+    """
+    This function returns the row and column counts of a model
+    """
+    rows = sum(len(c) for c in model.component_objects(pe.Constraint, active = True))
+    columns = sum(len(v) for v in model.component_objects(pe.Var))
+    return rows, columns
+
+
+def time_build(build, dataset, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        model = build(dataset)
+        timings.append(time.perf_counter() - start)
+    return min(timings), model_size(model)
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "model build-time benchmark")
+    parser.add_argument("--data", default = "dataset", help = "dataset directory")
+    parser.add_argument("--repeat", type = int, default = 3, help = "builds per variant, the best one is reported")
+    parser.add_argument("--skip-legacy", action = "store_true", help = "only time the catalog builder")
+    args = parser.parse_args()
+
+    dataset = FleetDataset.load(args.data)
+
+    # builders of the same model, the main.py model, compared with each other
+    same_model = [("indexed", lambda d: build_indexed_legacy_model(d, VehicleCatalog(d)))]
+    if not args.skip_legacy:
+        same_model.insert(0, ("legacy", build_legacy_model))
+    # builders of the fleet_model model, which is not the main.py model
+    fleet_variants = [
+        ("catalog", lambda d: build_model(d, VehicleCatalog(d))),
+        ("stock", lambda d: build_model(d, VehicleCatalog(d), stock = True)),
+        ("sparse", lambda d: build_model(d, VehicleCatalog(d), sparse = True)),
+    ]
+
+    print("main.py model")
+    results = {}
+    for name, build in same_model:
+        seconds, (rows, columns) = time_build(build, dataset, args.repeat)
+        results[name] = (seconds, rows, columns)
+        print(f"{name:>8}: {seconds:8.3f} s  {rows:7d} rows  {columns:7d} columns")
+
+    if "legacy" in results:
+        if results["legacy"][1:] != results["indexed"][1:]:
+            sys.exit("the indexed builder does not build the legacy model, no speedup reported")
+        print(f" speedup: {results['legacy'][0] / results['indexed'][0]:8.1f}x")
+
+    print("fleet_model.build_model, a different model, not comparable with the above")
+    for name, build in fleet_variants:
+        seconds, (rows, columns) = time_build(build, dataset, args.repeat)
+        print(f"{name:>8}: {seconds:8.3f} s  {rows:7d} rows  {columns:7d} columns")
+
+
+if __name__ == "__main__":
+    main()
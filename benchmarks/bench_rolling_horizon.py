@@ -0,0 +1,75 @@
+"""
+Rolling-horizon report: objective and wall time of solve_rolling_horizon against the
+monolithic 2023-2038 model on the same dataset.
+
+usage: python benchmarks/bench_rolling_horizon.py [--data dataset] [--window 5] [--commit 1]
+                                                  [--window-time-limit 60] [--time-limit 900]
+"""
+import argparse
+import os
+import sys
+import time
+
+import pyomo.environ as pe
+import pyomo.opt as po
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalog import VehicleCatalog
+from fleet_data import FleetDataset
+from fleet_model import build_model
+from rolling_horizon import solve_rolling_horizon
+
+
+def solve_monolithic(dataset, catalog, solver, time_limit):
+    """
+    This function solves the full-horizon model and returns its objective and bound, None when no plan was found
+    """
+    model = build_model(dataset, catalog, linear = True)
+    result = po.SolverFactory(solver).solve(model, timelimit = time_limit, load_solutions = False)
+    if len(result.solution) == 0:
+        return None, result.problem.lower_bound
+    model.solutions.load_from(result)
+    return pe.value(model.total_cost), result.problem.lower_bound
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "rolling horizon vs monolithic model")
+    parser.add_argument("--data", default = "dataset", help = "dataset directory")
+    parser.add_argument("--window", type = int, default = 5, help = "years per window")
+    parser.add_argument("--commit", type = int, default = 1, help = "years committed per window")
+    parser.add_argument("--solver", default = "appsi_highs", help = "Pyomo solver name")
+    parser.add_argument("--window-time-limit", type = float, default = 60, help = "seconds per window")
+    parser.add_argument("--time-limit", type = float, default = 900, help = "seconds for the monolithic model")
+    args = parser.parse_args()
+
+    dataset = FleetDataset.load(args.data)
+    catalog = VehicleCatalog(dataset)
+
+    start = time.perf_counter()
+    _, rolling, log = solve_rolling_horizon(
+        dataset, args.window, args.commit, args.solver, args.window_time_limit, catalog
+    )
+    rolling_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    monolithic, bound = solve_monolithic(dataset, catalog, args.solver, args.time_limit)
+    monolithic_s = time.perf_counter() - start
+
+    print(f"{'window':>11} {'termination':>22} {'build s':>8} {'solve s':>8}")
+    for record in log:
+        years = "%d-%d" % record["years"]
+        print(f"{years:>11} {record['termination']:>22} {record['build_s']:8.2f} {record['solve_s']:8.2f}")
+    print()
+    print(f"rolling horizon (window {args.window}, commit {args.commit}): {rolling:16,.0f}  {rolling_s:8.1f} s")
+    if monolithic is None:
+        print(f"monolithic: no plan within {args.time_limit:.0f} s, {monolithic_s:8.1f} s")
+    else:
+        print(f"monolithic:  {monolithic:16,.0f}  {monolithic_s:8.1f} s")
+        print(f"rolling / monolithic: {rolling / monolithic - 1:+.2%}")
+    if bound is not None:
+        print(f"monolithic bound:     {bound:16,.0f}  rolling gap to bound: {rolling / bound - 1:+.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Scaling benchmark: load, build, write and LP solve time, model size and peak memory of
+every model variant on synthetic datasets of growing scale, checked against saved baselines.
+
+usage: python benchmarks/bench_scaling.py [--scales small base large] [--variants dense sparse stock]
+                                          [--save] [--tolerance 1.5] [--memory-tolerance 1.25]
+
+Every case runs in a fresh process so its peak RSS is its own. Without --save the results
+are compared with benchmarks/baselines/scaling.json and the run fails on a regression.
+
+Phase times are stored relative to a fixed reference workload timed in the same process
+(see reference_seconds), so baselines saved on one machine hold on a faster or slower
+one; the model sizes are exact and the peak RSS does not depend on the host's speed.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import SCALES
+
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "scaling.json")
+
+# build_model options of each variant
+VARIANTS = {
+    "dense": dict(linear = True),
+    "sparse": dict(linear = True, sparse = True),
+    "stock": dict(linear = True, sparse = True, stock = True),
+}
+
+PHASES = ["load", "build", "write", "solve"]
+
+# phases shorter than this never count as a regression, timer noise dominates them
+MIN_SECONDS = 0.05
+
+
+def reference_seconds(repeat = 5):
+    """
+    This function times a fixed pure-Python workload, the unit the phase times are compared in
+
+    Building and writing a Pyomo model is interpreter-bound work of the same kind, so the
+    ratio of a phase to this reference changes little from host to host.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        # a small dict rebuilt many times, so the reference adds nothing to the peak RSS
+        for _ in range(50):
+            values = {key: key * 0.5 for key in range(4000)}
+            sum(value for key, value in values.items() if key % 3)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run_case(scale, variant, time_limit, seed):
+    """
+    This function generates a dataset of a scale and times the pipeline of a model variant on it
+
+    returns the seconds of every phase and their ratio to reference_seconds, the peak RSS,
+    the model size and the LP objective
+    """
+    import highspy
+
+    from catalog import VehicleCatalog
+    from fleet_data import FleetDataset
+    from fleet_model import build_model
+    from profiling import PhaseProfiler
+    from synthetic import generate_dataset
+
+    reference = reference_seconds()
+    profiler = PhaseProfiler(sizes = False)
+    with tempfile.TemporaryDirectory() as scratch:
+        data_dir = generate_dataset(os.path.join(scratch, "dataset"), scale, seed)
+        with profiler.phase("load"):
+            dataset = FleetDataset.load(data_dir)
+            catalog = VehicleCatalog(dataset)
+        with profiler.phase("build"):
+            model = build_model(dataset, catalog, **VARIANTS[variant])
+        path = os.path.join(scratch, "model.mps")
+        with profiler.phase("write"):
+            model.write(path, format = "mps", io_options = {"symbolic_solver_labels": False})
+        with profiler.phase("solve"):
+            highs = highspy.Highs()
+            highs.setOptionValue("output_flag", False)
+            highs.setOptionValue("solve_relaxation", True)
+            highs.setOptionValue("time_limit", float(time_limit))
+            highs.readModel(path)
+            highs.run()
+        lp = highs.getLp()
+        result = {
+            "vehicles": len(dataset.vehicle_ids),
+            "rows": lp.num_row_,
+            "cols": lp.num_col_,
+            "nnz": len(lp.a_matrix_.value_),
+            "objective": highs.getInfo().objective_function_value,
+            "status": highs.modelStatusToString(highs.getModelStatus()),
+        }
+    records = {record["name"]: record for record in profiler.report()}
+    result["seconds"] = {name: records[name]["seconds"] for name in PHASES}
+    result["relative"] = {name: seconds / reference for name, seconds in result["seconds"].items()}
+    # the case has a process of its own, whose peak up to the last phase is the peak of the case
+    result["peak_rss_mb"] = max(record["process_peak_rss_mb"] or 0.0 for record in records.values())
+    return result
+
+
+def run_isolated(scale, variant, time_limit, seed):
+    # one fresh interpreter per case, a forked or reused worker would carry the peak RSS of earlier cases
+    with ProcessPoolExecutor(1, mp_context = multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(run_case, scale, variant, time_limit, seed).result()
+
+
+def regressions(results, baselines, tolerance, memory_tolerance):
+    """
+    This function lists the phases and peak memory that got worse than their baseline by more than the tolerances
+    """
+    found = []
+    for case, result in results.items():
+        baseline = baselines.get(case)
+        if baseline is None:
+            continue
+        for name in PHASES:
+            relative, reference = result["relative"][name], baseline["relative"][name]
+            if result["seconds"][name] > MIN_SECONDS and relative > reference * tolerance:
+                found.append(f"{case} {name}: {relative:.2f} against {reference:.2f} reference units")
+        if result["peak_rss_mb"] > baseline["peak_rss_mb"] * memory_tolerance:
+            found.append(f"{case} peak RSS: {result['peak_rss_mb']:.0f} MB against {baseline['peak_rss_mb']:.0f} MB")
+        if (result["rows"], result["cols"], result["nnz"]) != (baseline["rows"], baseline["cols"], baseline["nnz"]):
+            found.append(
+                f"{case} size: {result['rows']}x{result['cols']} ({result['nnz']} nnz) against"
+                f" {baseline['rows']}x{baseline['cols']} ({baseline['nnz']} nnz)"
+            )
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "model scaling benchmark on synthetic datasets")
+    parser.add_argument("--scales", nargs = "+", default = ["small", "base", "large"], choices = sorted(SCALES), help = "dataset scales")
+    parser.add_argument("--variants", nargs = "+", default = list(VARIANTS), choices = list(VARIANTS), help = "model variants")
+    parser.add_argument("--time-limit", type = float, default = 120, help = "seconds of each LP solve")
+    parser.add_argument("--seed", type = int, default = 0, help = "seed of the synthetic datasets")
+    parser.add_argument("--baselines", default = BASELINES, help = "baseline JSON file")
+    parser.add_argument("--save", action = "store_true", help = "record the results as the new baselines")
+    parser.add_argument("--tolerance", type = float, default = 1.5, help = "slowdown factor of a phase reported as a regression")
+    parser.add_argument("--memory-tolerance", type = float, default = 1.25, help = "peak RSS growth factor reported as a regression")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'case':<16} {'vehicles':>8} {'rows':>8} {'cols':>8} {'nnz':>9} " + " ".join(f"{name:>8}" for name in PHASES) + f" {'peak MB':>8}")
+    for scale in args.scales:
+        for variant in args.variants:
+            case = f"{scale}/{variant}"
+            result = results[case] = run_isolated(scale, variant, args.time_limit, args.seed)
+            print(
+                f"{case:<16} {result['vehicles']:8d} {result['rows']:8d} {result['cols']:8d} {result['nnz']:9d} "
+                + " ".join(f"{result['seconds'][name]:8.3f}" for name in PHASES)
+                + f" {result['peak_rss_mb']:8.0f}"
+            )
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as file:
+            baselines = json.load(file)
+    if args.save:
+        # host-independent figures only, the absolute seconds stay on the console
+        baselines.update({case: {key: value for key, value in result.items() if key != "seconds"} for case, result in results.items()})
+        os.makedirs(os.path.dirname(args.baselines), exist_ok = True)
+        with open(args.baselines, "w") as file:
+            json.dump(baselines, file, indent = 2, sort_keys = True)
+        print(f"saved {len(results)} baselines to {args.baselines}")
+        return
+
+    found = regressions(results, baselines, args.tolerance, args.memory_tolerance)
+    for line in found:
+        print("REGRESSION", line)
+    if found:
+        sys.exit(1)
+    print(f"no regression against {sum(case in baselines for case in results)} baselines")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+from collections import defaultdict, namedtuple
+
+
+# Every vehicle has a 10-year life and must be sold by the end of 10th year
+LIFETIME = 10
+
+# Every year at most 20% of the vehicles in the existing fleet can be sold
+SELL_LIMIT = 0.2
+
+
+VehicleInfo = namedtuple(
+    "VehicleInfo", ["size", "distance", "model_year", "powertrain", "fuels", "cost", "range"]
+)
+
+
+class VehicleCatalog:
+    """
+    This class precomputes every per-vehicle lookup the model builders need
+
+    parameters: dataset: FleetDataset: the loaded dataset
+
+    vehicles: ID -> VehicleInfo(size, distance bucket, model year, powertrain, compatible fuels, cost, range)
+    by_size: size -> IDs of that size
+    by_model_year: year -> IDs that can only be bought in that year
+    serving: (size, distance) -> IDs of that size whose distance bucket covers the demand bucket
+    """
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.years = dataset.years.tolist()
+        self.first_year = self.years[0]
+        self.last_year = self.years[-1]
+
+        fuels = defaultdict(list)
+        for v, f in zip(*dataset.compatible.nonzero()):
+            fuels[dataset.vehicle_ids[v]].append(dataset.fuels[f])
+
+        self.vehicles = {}
+        self.by_size = defaultdict(list)
+        self.by_model_year = defaultdict(list)
+        self.serving = defaultdict(list)
+        self._buckets = {}
+        columns = zip(
+            dataset.vehicle_ids,
+            dataset.vehicle_size.tolist(),
+            dataset.vehicle_distance.tolist(),
+            dataset.vehicle_year.tolist(),
+            dataset.vehicle_type.tolist(),
+            dataset.vehicle_cost.tolist(),
+            dataset.vehicle_range.tolist(),
+        )
+        for v, s, d, year, powertrain, cost, km in columns:
+            size, distance = dataset.sizes[s], dataset.distances[d]
+            self.vehicles[v] = VehicleInfo(size, distance, year, powertrain, tuple(fuels[v]), cost, km)
+            self.by_size[size].append(v)
+            self.by_model_year[year].append(v)
+            # Vehicle belonging to distance bucket Dx can satisfy all demands for distance bucket D1 to Dx
+            self._buckets[v] = tuple(dataset.distances[: d + 1])
+            for covered in self._buckets[v]:
+                self.serving[size, covered].append(v)
+
+    def model_year(self, v):
+        return self.vehicles[v].model_year
+
+    def fuels(self, v):
+        return self.vehicles[v].fuels
+
+    def buckets(self, v):
+        """
+        This function returns the demand buckets D1..Dx a vehicle of bucket Dx can serve
+        """
+        return self._buckets[v]
+
+    def age(self, v, year):
+        """
+        This function returns the age of the vehicle during the given year, 1 in its model year
+        """
+        return year - self.vehicles[v].model_year + 1
+
+    def active_years(self, v):
+        """
+        This function returns the horizon years in which a vehicle can be in the fleet
+        """
+        model_year = self.vehicles[v].model_year
+        return [y for y in self.years if model_year <= y < model_year + LIFETIME]
+
+    def retirement_year(self, v):
+        """
+        This function returns the year the vehicle must be sold by, or None when that is past the horizon
+        """
+        year = self.vehicles[v].model_year + LIFETIME - 1
+        return year if year <= self.last_year else None
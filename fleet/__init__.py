@@ -0,0 +1,86 @@
+"""
+Library entry points of the fleet optimizer: load a dataset, build its model, solve it,
+score a submission and write a plan.
+
+Importing the package does nothing else: pandas, numpy and Pyomo are imported by the
+functions that need them, so embedding services and short CLI commands only pay for
+what they use. The modules of the repository root must be importable, as for every script.
+"""
+
+__all__ = ["load", "build", "solve", "score", "write"]
+
+
+def load(data_dir = "dataset"):
+    """
+    This function reads and checks a dataset directory
+
+    returns the FleetDataset
+    """
+    from fleet_data import FleetDataset
+
+    return FleetDataset.load(data_dir)
+
+
+def build(dataset, catalog = None, **options):
+    """
+    This function builds the fleet model of a dataset
+
+    parameters: dataset: FleetDataset: from load()
+                catalog: VehicleCatalog: optional, built from the dataset when omitted
+                options: fleet_model.build_model keyword arguments, linear=True and sparse=True by default
+
+    returns the Pyomo model
+    """
+    from catalog import VehicleCatalog
+    from fleet_model import build_model
+
+    options.setdefault("linear", True)
+    options.setdefault("sparse", True)
+    return build_model(dataset, catalog or VehicleCatalog(dataset), **options)
+
+
+def solve(model, solver = None, tee = False, **settings):
+    """
+    This function solves a model and loads the best plan found into it
+
+    parameters: model: ConcreteModel: from build()
+                solver: str: optional, backend or Pyomo solver name, the first installed one
+                             handling the model by default, see solvers.py
+                tee: bool: stream the solver log
+                settings: SolverSettings fields, time_limit, mip_rel_gap, mip_abs_gap, threads, presolve
+
+    returns the Pyomo results
+    """
+    from solvers import SolverSettings, solve as solve_model
+
+    return solve_model(model, solver, SolverSettings(**settings), tee = tee)
+
+
+def score(submission, dataset = None):
+    """
+    This function scores a submission without building a model
+
+    parameters: submission: str: submission csv, or a submission DataFrame
+                dataset: FleetDataset: optional, loaded from the dataset directory when omitted
+
+    returns a scoring.Score: total cost, cost components, yearly table and violations
+    """
+    from scoring import score_frame
+    from submission import read_submission
+
+    return score_frame(read_submission(submission), dataset or load())
+
+
+def write(plan, output_file = None, columnar_file = None):
+    """
+    This function turns a solved model or decision values into the submission DataFrame
+
+    parameters: plan: ConcreteModel or dict: a solved model, or component name -> {index: value}
+                output_file: str: optional, submission csv to write
+                columnar_file: str: optional, .parquet or .arrow file to also write
+    """
+    from submission import create_submission, submission_from_values
+
+    if isinstance(plan, dict):
+        return submission_from_values(plan, output_file, columnar_file)
+    return create_submission(plan, output_file, columnar_file)
@@ -0,0 +1,4 @@
+from fleet.cli import main
+
+
+main()
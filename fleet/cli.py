@@ -0,0 +1,117 @@
+"""
+Command line of the fleet optimizer, python -m fleet <command>
+
+usage: python -m fleet validate [--data dataset] [submission]
+       python -m fleet score submission [--data dataset]
+       python -m fleet solve [--data dataset] [--output submission.csv] [--solver highs] [--time-limit 300] ...
+
+Only the standard library is imported up front: --help is answered at once, validate and
+score import pandas but never Pyomo, and solve imports Pyomo when it starts building.
+"""
+import argparse
+import sys
+import time
+
+from solvers import add_solver_arguments
+
+
+def _print_score(result):
+    for component, cost in result.costs.items():
+        print(f"{component:>12} {cost:16,.0f}")
+    print(f"{'total':>12} {result.total_cost:16,.0f}")
+    print(f"{len(result.violations)} violations")
+    if len(result.violations):
+        print(result.violations.to_string(index = False))
+
+
+def validate(args):
+    """
+    This function checks a dataset and, when given, a submission against it; exits with 1 on a broken rule
+    """
+    import fleet
+
+    dataset = fleet.load(args.data)
+    print(f"{args.data}: {len(dataset.vehicle_ids)} vehicles, {len(dataset.fuels)} fuels, {len(dataset.sizes)} sizes, "
+          f"{len(dataset.distances)} distance buckets, {len(dataset.years)} years")
+    if args.submission is None:
+        return 0
+    result = fleet.score(args.submission, dataset)
+    print(f"{args.submission}: {len(result.violations)} violations")
+    if len(result.violations):
+        print(result.violations.to_string(index = False))
+        return 1
+    return 0
+
+
+def score(args):
+    """
+    This function prints the cost breakdown and the broken rules of a submission
+    """
+    import fleet
+
+    started = time.perf_counter()
+    result = fleet.score(args.submission, fleet.load(args.data))
+    print(result.yearly.to_string(index = False))
+    print()
+    _print_score(result)
+    print(f"scored in {(time.perf_counter() - started) * 1000:.1f} ms")
+    return 1 if len(result.violations) else 0
+
+
+def solve(args):
+    """
+    This function builds and solves the fleet model and writes the best plan found
+    """
+    import fleet
+    from solution_store import record_from_args
+    from solvers import select_backend, solver_from_args, solver_options
+
+    record_from_args(args)
+    solver, settings = solver_from_args(args)
+    dataset = fleet.load(args.data)
+    model = fleet.build(dataset, stock = args.stock)
+    backend = select_backend(model, solver)
+    ignored = solver_options(backend, settings)[1]
+    if ignored:
+        print(f"{backend} has no option for: {', '.join(ignored)}")
+    results = fleet.solve(model, backend, args.verbose, **settings._asdict())
+    print(f"{backend}: {results.solver.termination_condition}, objective {results.problem.upper_bound}, bound {results.problem.lower_bound}")
+    if not len(results.solution):
+        print("no plan found")
+        return 1
+    fleet.write(model, args.output, args.columnar)
+    print(f"plan written to {args.output}")
+    return 0
+
+
+def parser():
+    """
+    This function returns the argument parser of the command line
+    """
+    main_parser = argparse.ArgumentParser(prog = "python -m fleet", description = "fleet decarbonization optimizer")
+    commands = main_parser.add_subparsers(dest = "command", required = True)
+
+    command = commands.add_parser("validate", help = "check a dataset, and a submission against it")
+    command.add_argument("submission", nargs = "?", default = None, help = "optional submission csv")
+    command.add_argument("--data", default = "dataset", help = "dataset directory")
+    command.set_defaults(run = validate)
+
+    command = commands.add_parser("score", help = "cost breakdown and broken rules of a submission")
+    command.add_argument("submission", help = "submission csv")
+    command.add_argument("--data", default = "dataset", help = "dataset directory")
+    command.set_defaults(run = score)
+
+    command = commands.add_parser("solve", help = "solve the fleet model and write the plan")
+    command.add_argument("--data", default = "dataset", help = "dataset directory")
+    command.add_argument("--output", default = "submission.csv", help = "submission csv to write")
+    command.add_argument("--columnar", default = None, help = "optional .parquet or .arrow file of the plan")
+    command.add_argument("--stock", action = "store_true", help = "build with cohort stock variables")
+    command.add_argument("--verbose", action = "store_true", help = "stream the solver log")
+    add_solver_arguments(command)
+    command.set_defaults(run = solve)
+    return main_parser
+
+
+def main(argv = None):
+    args = parser().parse_args(argv)
+    sys.exit(args.run(args))
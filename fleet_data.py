@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+# file names inside the dataset directory
+DATASET_FILES = {
+    "vehicles": "vehicles.csv",
+    "vehicles_fuels": "vehicles_fuels.csv",
+    "fuels": "fuels.csv",
+    "demand": "demand.csv",
+    "carbon_emissions": "carbon_emissions.csv",
+    "cost_profiles": "cost_profiles.csv",
+}
+
+
+def bucket_order(labels):
+    """
+    This function sorts bucket labels such as S1..S4 or D1..D12 by their numeric suffix
+
+    parameters: labels: iterable of str: bucket labels
+    """
+    def key(label):
+        suffix = label[1:]
+        return (int(suffix), label) if suffix.isdigit() else (float("inf"), label)
+
+    return sorted(set(labels), key=key)
+
+
+def _positions(index, values, what):
+    # vectorized label -> position lookup, rejecting labels that are not in the index
+    positions = index.get_indexer(values)
+    if (positions < 0).any():
+        unknown = sorted(set(np.asarray(values)[positions < 0]))
+        raise ValueError(f"unknown {what}: {unknown[:5]}")
+    return positions
+
+
+class FleetDataset:
+    """
+    This class holds every file of the dataset directory as integer-indexed NumPy arrays
+
+    Vehicles, fuels, years, sizes and distance buckets each get a position, and every
+    table is stored against those positions:
+
+    consumption: vehicle x fuel (0.0 where the vehicle cannot run the fuel)
+    compatible: vehicle x fuel boolean mask built from vehicles_fuels.csv
+    fuel_cost, fuel_emissions, fuel_cost_uncertainty: fuel x year
+    demand: year x size x distance
+    carbon_limit: year
+    resale_value, insurance_cost, maintenance_cost: age 1..10 as fractions of the purchase cost
+
+    The *_dict methods return the same dicts the old read_* helpers produced, so they
+    plug straight into pe.Param(initialize=...).
+    """
+
+    def __init__(self, frames):
+        self.frames = frames
+        vehicles = frames["vehicles"]
+        vehicles_fuels = frames["vehicles_fuels"]
+        fuels = frames["fuels"]
+        demand = frames["demand"]
+        carbon = frames["carbon_emissions"]
+        profiles = frames["cost_profiles"].sort_values("End of Year")
+
+        # index sets
+        self.years = np.sort(demand["Year"].unique()).astype(int)
+        self.sizes = bucket_order(vehicles["Size"])
+        self.distances = bucket_order(vehicles["Distance"])
+        self.fuels = list(pd.unique(fuels["Fuel"]))
+        self.vehicle_ids = vehicles["ID"].tolist()
+
+        year_index = pd.Index(self.years)
+        size_index = pd.Index(self.sizes)
+        distance_index = pd.Index(self.distances)
+        fuel_index = pd.Index(self.fuels)
+        vehicle_index = pd.Index(self.vehicle_ids)
+        if not vehicle_index.is_unique:
+            raise ValueError("duplicate vehicle IDs in vehicles.csv")
+
+        self.year_index = {y: i for i, y in enumerate(self.years.tolist())}
+        self.size_index = {s: i for i, s in enumerate(self.sizes)}
+        self.distance_index = {d: i for i, d in enumerate(self.distances)}
+        self.fuel_index = {f: i for i, f in enumerate(self.fuels)}
+        self.vehicle_index = {v: i for i, v in enumerate(self.vehicle_ids)}
+
+        # vehicles
+        self.vehicle_type = vehicles["Vehicle"].to_numpy(dtype=object)
+        self.vehicle_size = _positions(size_index, vehicles["Size"], "size")
+        self.vehicle_distance = _positions(distance_index, vehicles["Distance"], "distance bucket")
+        self.vehicle_year = vehicles["Year"].to_numpy(dtype=int)
+        self.vehicle_cost = vehicles["Cost ($)"].to_numpy(dtype=float)
+        self.vehicle_range = vehicles["Yearly range (km)"].to_numpy(dtype=float)
+
+        # vehicle x fuel
+        v = _positions(vehicle_index, vehicles_fuels["ID"], "vehicle ID in vehicles_fuels.csv")
+        f = _positions(fuel_index, vehicles_fuels["Fuel"], "fuel in vehicles_fuels.csv")
+        self.consumption = np.zeros((len(self.vehicle_ids), len(self.fuels)))
+        self.consumption[v, f] = vehicles_fuels["Consumption (unit_fuel/km)"].to_numpy(dtype=float)
+        self.compatible = np.zeros(self.consumption.shape, dtype=bool)
+        self.compatible[v, f] = True
+
+        # fuel x year, rows outside the planning horizon are ignored
+        f = _positions(fuel_index, fuels["Fuel"], "fuel")
+        y = year_index.get_indexer(fuels["Year"])
+        keep = y >= 0
+        f, y = f[keep], y[keep]
+        shape = (len(self.fuels), len(self.years))
+        self.fuel_emissions = np.zeros(shape)
+        self.fuel_cost = np.zeros(shape)
+        self.fuel_cost_uncertainty = np.zeros(shape)
+        self.fuel_emissions[f, y] = fuels["Emissions (CO2/unit_fuel)"].to_numpy(dtype=float)[keep]
+        self.fuel_cost[f, y] = fuels["Cost ($/unit_fuel)"].to_numpy(dtype=float)[keep]
+        self.fuel_cost_uncertainty[f, y] = fuels["Cost Uncertainty (±%)"].to_numpy(dtype=float)[keep] / 100
+
+        # year x size x distance
+        y = _positions(year_index, demand["Year"], "demand year")
+        s = _positions(size_index, demand["Size"], "demand size")
+        d = _positions(distance_index, demand["Distance"], "demand distance bucket")
+        self.demand = np.zeros((len(self.years), len(self.sizes), len(self.distances)))
+        self.demand[y, s, d] = demand["Demand (km)"].to_numpy(dtype=float)
+
+        # year
+        y = year_index.get_indexer(carbon["Year"])
+        keep = y >= 0
+        self.carbon_limit = np.full(len(self.years), np.inf)
+        self.carbon_limit[y[keep]] = carbon["Carbon emission CO2/kg"].to_numpy(dtype=float)[keep]
+
+        # age 1..10
+        self.resale_value = profiles["Resale Value %"].to_numpy(dtype=float) / 100
+        self.insurance_cost = profiles["Insurance Cost %"].to_numpy(dtype=float) / 100
+        self.maintenance_cost = profiles["Maintenance Cost %"].to_numpy(dtype=float) / 100
+
+    @classmethod
+    def load(cls, data_dir="dataset"):
+        """
+        This function reads every csv of the dataset directory exactly once
+
+        parameters: data_dir: str: path to the directory containing the dataset files
+        """
+        frames = {
+            name: pd.read_csv(os.path.join(data_dir, file_name))
+            for name, file_name in DATASET_FILES.items()
+        }
+        return cls(frames)
+
+    def content_hash(self):
+        """
+        This function hashes the arrays and index lists of the dataset, so edits made after loading count
+
+        Two datasets with the same hash describe the same problem, whatever directory they came from.
+        """
+        digest = hashlib.sha256()
+        for name, value in sorted(vars(self).items()):
+            if isinstance(value, np.ndarray):
+                digest.update(name.encode())
+                if value.dtype == object:
+                    digest.update(json.dumps(value.tolist(), default=str).encode())
+                else:
+                    digest.update(str(value.dtype).encode())
+                    digest.update(str(value.shape).encode())
+                    digest.update(np.ascontiguousarray(value).tobytes())
+            elif isinstance(value, list):
+                digest.update(name.encode())
+                digest.update(json.dumps(value, default=str).encode())
+        return digest.hexdigest()
+
+    # dict views
+
+    def vehicle_cost_dict(self):
+        return dict(zip(self.vehicle_ids, self.vehicle_cost.tolist()))
+
+    def vehicle_range_dict(self):
+        return dict(zip(self.vehicle_ids, self.vehicle_range.tolist()))
+
+    def vehicle_consumption_dict(self):
+        v, f = np.nonzero(self.compatible)
+        return {
+            (self.vehicle_ids[i], self.fuels[j]): c
+            for i, j, c in zip(v.tolist(), f.tolist(), self.consumption[v, f].tolist())
+        }
+
+    def vehicle_demand_dict(self):
+        years = self.years.tolist()
+        return {
+            (years[y], self.sizes[s], self.distances[d]): self.demand[y, s, d]
+            for y, s, d in np.ndindex(self.demand.shape)
+        }
+
+    def fuel_emissions_dict(self):
+        return self._fuel_year_dict(self.fuel_emissions)
+
+    def fuel_cost_dict(self):
+        return self._fuel_year_dict(self.fuel_cost)
+
+    def carbon_emissions_dict(self):
+        return dict(zip(self.years.tolist(), self.carbon_limit.tolist()))
+
+    def _fuel_year_dict(self, values):
+        years = self.years.tolist()
+        return {
+            (self.fuels[f], years[y]): values[f, y]
+            for f, y in np.ndindex(values.shape)
+        }
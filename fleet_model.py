@@ -0,0 +1,411 @@
+import math
+
+import pyomo.environ as pe
+
+from catalog import SELL_LIMIT, VehicleCatalog
+from lifecycle import lifecycle_coefficients
+from profiling import profiled
+
+
+def vehicle_cell_demand(dataset, catalog, v, d, year):
+    """
+    This function returns the km demanded in the (year, size, distance) cell a vehicle serves in bucket d
+    """
+    info = catalog.vehicles[v]
+    return dataset.demand[dataset.year_index[year], dataset.size_index[info.size], dataset.distance_index[d]]
+
+
+def vehicle_use_limit(dataset, catalog, v, d, year):
+    """
+    This function returns the most vehicles of an ID worth using in a demand cell
+    """
+    return math.ceil(vehicle_cell_demand(dataset, catalog, v, d, year) / catalog.vehicles[v].range)
+
+
+def fill_fleet_stock(model):
+    """
+    This function sets the fleet_stock variables of a model built with stock=True from its bought and sold values
+
+    Call it after loading a plan into the decision variables, e.g. before a warm-started solve,
+    so the stock balance holds at the start point.
+    """
+    stock = {v: pe.value(model.initial_stock[v]) for v in model.vehicles}
+    for v, year in sorted(model.fleet_stock, key = lambda index: index[1]):
+        if (v, year) in model.number_vehicles_bought:
+            stock[v] += model.number_vehicles_bought[v, year].value or 0
+        model.fleet_stock[v, year].set_value(stock[v], skip_validation = True)
+        stock[v] -= model.number_vehicles_sold[v, year].value or 0
+
+
+def build_model(dataset, catalog=None, linear=False, years=None, initial_fleet=None, mutable=False, stock=False, sparse=False, sizes=None, profiler=None):
+    """
+    This function builds the fleet model with indexed rules over a precomputed catalog
+
+    parameters: dataset: FleetDataset: the loaded dataset
+                catalog: VehicleCatalog: optional, built from the dataset when omitted
+                linear: bool: replace the distance x use products by total km variables
+                years: iterable of int: optional, consecutive sub-horizon to model, all years by default
+                initial_fleet: dict: optional, vehicles of each ID already held at the start of the first year
+                mutable: bool: make the carbon limit, demand and fuel cost Params mutable so they can be
+                         changed on the built model, demand cells are then kept even when their demand is 0
+                stock: bool: hold the fleet of every (vehicle, year) in a fleet_stock variable tied to the
+                       previous year by a one-step balance, instead of re-summing all earlier purchases
+                       and sales in every fleet constraint
+                sparse: bool: only create the variables a plan can use, purchases in the model year,
+                        sales, stock and use in the years a vehicle can be held, and use only with
+                        its fuels and distance buckets
+                sizes: iterable of str: optional, only model the vehicles and demand of these sizes, all by default;
+                       the carbon and sell limits still hold the fleet-wide values
+                profiler: PhaseProfiler: optional, times the sets and params, the variables, every
+                          constraint family and the objective as phases, see profiling.py
+
+    Use and distance variables carry the demand bucket a vehicle serves, so every
+    (year, size, distance) demand cell is covered by the vehicles allocated to it.
+
+    The model follows the rules of the problem statement, which differs from the model
+    main.py used to build (kept in benchmarks/bench_build.py) in these points:
+    - use and distance variables gain the demand bucket index, and yearly_demand_constraint
+      only counts the km allocated to a cell; the old one counted every km of a size in
+      each of its four distance cells at once
+    - size_constraint is dropped: it asked the summed per-vehicle distance of a size, not
+      the km driven, to reach each demand cell, which the bucket demand rows now cover
+    - distance_constraint now forbids use in buckets a vehicle can not serve; the old one
+      was a demand row over vehicles of every size with the bucket order reversed
+    - the km per vehicle is bounded by its yearly range, which the old model never read
+    - fuel_constraint is new, the old model let a vehicle run on a fuel it does not take at
+      no cost, since its consumption defaults to 0
+    - vehicle_purchase_constraint compares with the model year; the old rule compared a year
+      with the year set, which is never equal, so it forbade every purchase
+    - the fleet a vehicle can be used or sold from is net of the sales of earlier years
+    - sell_limit_constraint caps the sales of each year at 20% of the whole fleet held that
+      year, one row per year, as the rule reads; the old rule capped every (vehicle, year)
+      at 20% of that vehicle's fleet
+    - insurance and maintenance are paid on the vehicles held each year, not on every purchase
+      up to the horizon, and a sale is credited its resale value once, at its age; the old
+      objective added the resale value of every year up to the sale
+
+    By default number_vehicles_distance is the km driven per vehicle and multiplies
+    number_vehicles_use in the demand, carbon and fuel cost terms, which makes the model
+    a nonconvex MINLP. With linear=True the product is replaced by total_km, the km driven
+    by all vehicles of a (vehicle, fuel, bucket, year), bounded by vehicle_range x vehicles
+    in use. That reformulation is exact, since the per-vehicle distance of any feasible
+    plan is total_km / number_vehicles_use, and the whole model becomes a linear MILP.
+
+    With stock=True, fleet_stock[v, year] is the number of vehicles held during the year and
+    fleet_stock[v, year] = fleet_stock[v, year - 1] - sold[v, year - 1] + bought[v, year]. The use,
+    sale, sell limit and retirement constraints then read the stock directly, so each of them
+    has a constant number of terms and the matrix grows linearly with the horizon. Both
+    formulations have the same feasible plans and objective.
+
+    With sparse=True the variables that the purchase, lifetime, distance and fuel rules
+    would force to 0 are never created, nor are those rules: number_vehicles_bought is
+    indexed by buy_keys, number_vehicles_sold and fleet_stock by held_keys and the use and
+    km variables by use_keys. Every other model component keeps its name and meaning.
+    """
+    catalog = catalog or VehicleCatalog(dataset)
+    years = list(years) if years is not None else catalog.years
+    year_set = set(years)
+    initial_fleet = initial_fleet or {}
+    if sizes is None:
+        vehicle_ids, size_list = dataset.vehicle_ids, dataset.sizes
+    else:
+        size_list = [size for size in dataset.sizes if size in set(sizes)]
+        vehicle_ids = [v for v in dataset.vehicle_ids if catalog.vehicles[v].size in size_list]
+        initial_fleet = {v: number for v, number in initial_fleet.items() if v in catalog.vehicles and catalog.vehicles[v].size in size_list}
+    vehicle_set, size_set = set(vehicle_ids), set(size_list)
+
+    def within(values, position):
+        # restrict a dict view keyed by year (at the given key position) to the modelled years
+        if position is None:
+            return {k: value for k, value in values.items() if k in year_set}
+        return {k: value for k, value in values.items() if k[position] in year_set}
+
+    def of_vehicles(values):
+        # restrict a dict view keyed by vehicle (first key) to the modelled vehicles
+        if sizes is None:
+            return values
+        return {k: value for k, value in values.items() if (k[0] if isinstance(k, tuple) else k) in vehicle_set}
+
+    def of_sizes(values):
+        # restrict the demand dict view keyed by (year, size, distance) to the modelled sizes
+        if sizes is None:
+            return values
+        return {k: value for k, value in values.items() if k[1] in size_set}
+
+    model = pe.ConcreteModel()
+    # the problem a model of the whole horizon and fleet solves, the solution store records plans under it
+    model.input_key = dataset.content_hash() if years == catalog.years and sizes is None and not initial_fleet else None
+
+    with profiled(profiler, "sets_params", model):
+        # Set
+
+        model.years = pe.Set(initialize = years)
+        model.vehicles = pe.Set(initialize = vehicle_ids)
+        model.size = pe.Set(initialize = size_list)
+        model.distance = pe.Set(initialize = dataset.distances)
+        model.fuel = pe.Set(initialize = dataset.fuels)
+
+        # keys of every (vehicle, fuel, bucket) a vehicle can actually be used with, and the modelled
+        # years it can be held in, from its model year to the end of its 10th year
+        usable = {
+            v: [(f, d) for f in catalog.fuels(v) for d in catalog.buckets(v)]
+            for v in vehicle_ids
+        }
+        held_years = {v: [year for year in catalog.active_years(v) if year in year_set] for v in vehicle_ids}
+
+        if sparse:
+            model.buy_keys = pe.Set(
+                dimen = 2, initialize = [(v, catalog.model_year(v)) for v in vehicle_ids if catalog.model_year(v) in year_set]
+            )
+            model.held_keys = pe.Set(dimen = 2, initialize = [(v, year) for v in vehicle_ids for year in held_years[v]])
+            model.use_keys = pe.Set(
+                dimen = 4, initialize = [(v, f, d, year) for v in vehicle_ids for year in held_years[v] for f, d in usable[v]]
+            )
+            buy_index, held_index, use_index = (model.buy_keys,), (model.held_keys,), (model.use_keys,)
+        else:
+            buy_index = held_index = (model.vehicles, model.years)
+            use_index = (model.vehicles, model.fuel, model.distance, model.years)
+
+        # (vehicle, fuel, bucket) keys with a use variable in each year
+        in_use = {
+            year: [(v, f, d) for v in vehicle_ids if not sparse or year in held_years[v] for f, d in usable[v]]
+            for year in years
+        }
+
+        # parameters
+
+        model.carbon_emissions = pe.Param(model.years, initialize = within(dataset.carbon_emissions_dict(), None), mutable = mutable)
+        model.vehicle_cost = pe.Param(model.vehicles, initialize = of_vehicles(dataset.vehicle_cost_dict()))
+        model.vehicle_range = pe.Param(model.vehicles, initialize = of_vehicles(dataset.vehicle_range_dict()))
+        model.vehicle_consumption = pe.Param(model.vehicles, model.fuel, initialize = of_vehicles(dataset.vehicle_consumption_dict()), default = 0.0)
+        model.vehicle_demand = pe.Param(model.years, model.size, model.distance, initialize = of_sizes(within(dataset.vehicle_demand_dict(), 0)), mutable = mutable)
+        model.fuel_emissions = pe.Param(model.fuel, model.years, initialize = within(dataset.fuel_emissions_dict(), 1))
+        model.fuel_cost = pe.Param(model.fuel, model.years, initialize = within(dataset.fuel_cost_dict(), 1), mutable = mutable)
+
+    # variables
+
+    # more vehicles or km than a demand cell needs are never useful in a cell. Purchases are
+    # left unbounded: idle vehicles widen the 20% sell limit, which a plan may need when a
+    # large cohort retires, so no bound from demand alone holds for every feasible plan
+
+    def cell_demand(v, d, year):
+        return vehicle_cell_demand(dataset, catalog, v, d, year)
+
+    def use_bounds(m, v, f, d, year):
+        return (0, vehicle_use_limit(dataset, catalog, v, d, year))
+
+    def km_bounds(m, v, f, d, year):
+        return (0, cell_demand(v, d, year))
+
+    with profiled(profiler, "variables", model):
+        model.number_vehicles_bought = pe.Var(*buy_index, domain = pe.NonNegativeIntegers)
+        model.number_vehicles_use = pe.Var(*use_index, domain = pe.NonNegativeIntegers, bounds = use_bounds)
+        model.number_vehicles_sold = pe.Var(*held_index, domain = pe.NonNegativeIntegers)
+        if stock:
+            # integral whenever purchases and sales are, so it is left continuous for the solver
+            model.initial_stock = pe.Param(model.vehicles, initialize = initial_fleet, default = 0)
+            model.fleet_stock = pe.Var(*held_index, domain = pe.NonNegativeReals)
+        if linear:
+            model.total_km = pe.Var(*use_index, domain = pe.NonNegativeReals, bounds = km_bounds)
+        else:
+            model.number_vehicles_distance = pe.Var(
+                *use_index,
+                domain = pe.NonNegativeReals,
+                bounds = lambda m, v, f, d, year: (0, catalog.vehicles[v].range),
+            )
+
+    def bought(m, v, year):
+        # purchases of a (vehicle, year), 0 when the sparse model has no such variable
+        if sparse and year != catalog.model_year(v):
+            return 0
+        return m.number_vehicles_bought[v, year]
+
+    def served_km(m, v, f, d, year):
+        if linear:
+            return m.total_km[v, f, d, year]
+        return m.number_vehicles_distance[v, f, d, year] * m.number_vehicles_use[v, f, d, year]
+
+    # The distance covered by each vehicle in a year can not exceed its yearly range
+
+    if linear:
+        def range_rule(m, v, f, d, year):
+            return m.total_km[v, f, d, year] <= m.vehicle_range[v] * m.number_vehicles_use[v, f, d, year]
+
+        with profiled(profiler, "range_constraint", model):
+            model.range_constraint = pe.Constraint(*use_index, rule = range_rule)
+
+    # Total yearly demand for each year must be satisfied for each distance and size bucket
+
+    def yearly_demand_rule(m, year, size, distance):
+        demand_value = m.vehicle_demand[year, size, distance]
+        if not mutable and demand_value <= 0:
+            return pe.Constraint.Skip
+        return pe.quicksum(
+            served_km(m, v, f, distance, year)
+            for v in catalog.serving[size, distance]
+            if not sparse or year in held_years[v]
+            for f in catalog.fuels(v)
+        ) >= demand_value
+
+    with profiled(profiler, "yearly_demand_constraint", model):
+        model.yearly_demand_constraint = pe.Constraint(model.years, model.size, model.distance, rule = yearly_demand_rule)
+
+    # Vehicle belonging to distance bucket Dx can satisfy all demands for distance bucket D1 to
+    # Dx. For example, vehicle belonging to distance bucket D4 can satisfy demand of D1, D2,
+    # D3, D4buckets; similarly, D3 can satisfy D1, D2, D3 but NOT D4
+
+    def distance_rule(m, v, f, d, year):
+        if d in catalog.buckets(v):
+            return pe.Constraint.Skip
+        return m.number_vehicles_use[v, f, d, year] == 0
+
+    if not sparse:
+        with profiled(profiler, "distance_constraint", model):
+            model.distance_constraint = pe.Constraint(model.vehicles, model.fuel, model.distance, model.years, rule = distance_rule)
+
+    # a vehicle can only run on the fuels listed for it in vehicles_fuels.csv
+
+    def fuel_rule(m, v, f, d, year):
+        if f in catalog.fuels(v) or d not in catalog.buckets(v):
+            return pe.Constraint.Skip
+        return m.number_vehicles_use[v, f, d, year] == 0
+
+    if not sparse:
+        with profiled(profiler, "fuel_constraint", model):
+            model.fuel_constraint = pe.Constraint(model.vehicles, model.fuel, model.distance, model.years, rule = fuel_rule)
+
+    # total carbon emission by fleet operation each year should be within the respective year's carbon emission limit
+
+    def carbon_emission_rule(m, year):
+        return pe.quicksum(
+            served_km(m, v, f, d, year) * m.vehicle_consumption[v, f] * m.fuel_emissions[f, year]
+            for v, f, d in in_use[year]
+        ) <= m.carbon_emissions[year]
+
+    with profiled(profiler, "carbon_emission_constraint", model):
+        model.carbon_emission_constraint = pe.Constraint(model.years, rule = carbon_emission_rule)
+
+    # Vehicle model of year 20xx can only be bought in the year 20xx. For example,
+    # Diesel_S1_2026 can only be bought in 2026 and not in any subsequent or previous years.
+
+    def vehicle_purchase_rule(m, v, year):
+        if year == catalog.model_year(v):
+            return pe.Constraint.Skip
+        return m.number_vehicles_bought[v, year] == 0
+
+    if not sparse:
+        with profiled(profiler, "vehicle_purchase_constraint", model):
+            model.vehicle_purchase_constraint = pe.Constraint(model.vehicles, model.years, rule = vehicle_purchase_rule)
+
+    # Every vehicle has a 10-year life and must be sold by the end of 10th year. For example, a
+    # vehicle bought in 2025 must be sold by the end of 2034.
+
+    def vehicle_lifetime_rule(m, v):
+        retirement_year = catalog.retirement_year(v)
+        if retirement_year is None or retirement_year not in year_set:
+            return pe.Constraint.Skip
+        if stock:
+            # nothing is left in the fleet after the sales at the end of the retirement year
+            return m.number_vehicles_sold[v, retirement_year] >= m.fleet_stock[v, retirement_year]
+        model_year = catalog.model_year(v)
+        owned = m.number_vehicles_bought[v, model_year] if model_year in year_set else initial_fleet.get(v, 0)
+        return pe.quicksum(m.number_vehicles_sold[v, year] for year in held_years[v]) >= owned
+
+    with profiled(profiler, "vehicle_lifetime_constraint", model):
+        model.vehicle_lifetime_constraint = pe.Constraint(model.vehicles, rule = vehicle_lifetime_rule)
+
+    # You cannot buy/sell a vehicle mid-year. All buy operations happen at the beginning of the
+    # year and all sell operations happen at the end of the year
+
+    def fleet(m, v, year):
+        # vehicles of the model held during the year: initial fleet plus bought up to now, minus sold in earlier years
+        if stock:
+            return m.fleet_stock[v, year]
+        return initial_fleet.get(v, 0) + pe.quicksum(bought(m, v, y) for y in years if y <= year) - pe.quicksum(
+            m.number_vehicles_sold[v, y] for y in (held_years[v] if sparse else years) if y < year
+        )
+
+    if stock:
+        previous_year = dict(zip(years[1:], years[:-1]))
+
+        def stock_balance_rule(m, v, year):
+            last = previous_year.get(year)
+            if last is not None and (not sparse or last in held_years[v]):
+                previous = m.fleet_stock[v, last] - m.number_vehicles_sold[v, last]
+            else:
+                previous = initial_fleet.get(v, 0)
+            return m.fleet_stock[v, year] == previous + bought(m, v, year)
+
+        with profiled(profiler, "stock_balance_constraint", model):
+            model.stock_balance_constraint = pe.Constraint(*held_index, rule = stock_balance_rule)
+
+    def use_after_purchase_rule(m, v, year):
+        if sparse:
+            if not usable[v]:
+                return pe.Constraint.Skip
+            return pe.quicksum(m.number_vehicles_use[v, f, d, year] for f, d in usable[v]) <= fleet(m, v, year)
+        return pe.quicksum(
+            m.number_vehicles_use[v, f, d, year] for f in m.fuel for d in m.distance
+        ) <= fleet(m, v, year)
+
+    with profiled(profiler, "use_after_purchase_constraint", model):
+        model.use_after_purchase_constraint = pe.Constraint(*held_index, rule = use_after_purchase_rule)
+
+    def sell_at_end_of_year_rule(m, v, year):
+        if stock:
+            return m.number_vehicles_sold[v, year] <= m.fleet_stock[v, year]
+        return pe.quicksum(
+            m.number_vehicles_sold[v, y] for y in (held_years[v] if sparse else years) if y <= year
+        ) <= initial_fleet.get(v, 0) + pe.quicksum(bought(m, v, y) for y in years if y <= year)
+
+    with profiled(profiler, "sell_at_end_of_year_constraint", model):
+        model.sell_at_end_of_year_constraint = pe.Constraint(*held_index, rule = sell_at_end_of_year_rule)
+
+    # Every year at most 20% of the vehicles in the existing fleet can be sold; the existing
+    # fleet is the whole fleet, so this is one row per year and not one per (vehicle, year)
+
+    # vehicles with a fleet in each year, the fleet of any other vehicle is 0 in the sparse model
+    holding = {year: [v for v in vehicle_ids if not sparse or year in held_years[v]] for year in years}
+
+    def sell_limit_rule(m, year):
+        return pe.quicksum(m.number_vehicles_sold[v, year] for v in holding[year]) <= SELL_LIMIT * pe.quicksum(
+            fleet(m, v, year) for v in holding[year]
+        )
+
+    with profiled(profiler, "sell_limit_constraint", model):
+        model.sell_limit_constraint = pe.Constraint(model.years, rule = sell_limit_rule)
+
+    # Objective function
+
+    # purchase, insurance, maintenance and resale folded into one coefficient per buy and
+    # sell variable, see lifecycle.py
+    with profiled(profiler, "objective", model):
+        lifecycle = lifecycle_coefficients(dataset, years)
+        vehicle_position = [(v, dataset.vehicle_index[v]) for v in vehicle_ids]
+        held_cost = sum(lifecycle.held[dataset.vehicle_index[v]] * number for v, number in initial_fleet.items())
+
+        def total_cost(m):
+
+            # buying cost with the holding cost of every year the vehicle is then held
+            buying_cost = pe.quicksum(
+                lifecycle.buy[i, y] * m.number_vehicles_bought[v, year]
+                for v, i in vehicle_position for y, year in enumerate(years) if (v, year) in m.number_vehicles_bought
+            )
+
+            # fuel cost
+            fuel_cost = pe.quicksum(
+                served_km(m, v, f, d, year) * m.vehicle_consumption[v, f] * m.fuel_cost[f, year]
+                for year in m.years for v, f, d in in_use[year]
+            )
+
+            # selling cost, the resale value and the holding cost saved after the sale (negative coefficients)
+            sl_cost = pe.quicksum(
+                lifecycle.sell[i, y] * m.number_vehicles_sold[v, year]
+                for v, i in vehicle_position for y, year in enumerate(years) if lifecycle.sell[i, y] and (v, year) in m.number_vehicles_sold
+            )
+
+            return buying_cost + held_cost + fuel_cost + sl_cost
+
+        model.total_cost = pe.Objective(rule = total_cost, sense = pe.minimize)
+
+    return model
@@ -0,0 +1,229 @@
+"""
+Solver-free constructive planner: a valid plan in milliseconds, for what-if screens and as
+the fallback when the MILP runs out of time.
+"""
+import argparse
+import math
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from catalog import LIFETIME, SELL_LIMIT, VehicleCatalog
+from fleet_data import FleetDataset
+from submission import submission_frame
+
+
+class GreedyPlanner:
+    """
+    This class builds a fleet plan year by year without a solver
+
+    parameters: dataset: FleetDataset: the loaded dataset
+                catalog: VehicleCatalog: optional, built from the dataset when omitted
+                iterations: int: bisection steps on the carbon price of a year
+
+    Each year the demand cells are covered bucket by bucket, longest distance first, by the
+    cheapest km on offer: vehicles already held cost only their fuel, vehicles of the year's
+    model cost their fuel plus their purchase, holding and resale spread over the km they can
+    drive before they retire or the horizon ends. Fuel and vehicle choices are priced with a
+    carbon price that is raised by bisection until the year fits under its carbon cap. Vehicles
+    reaching 10 years are sold, idle vehicles are sold within what remains of the 20% cap, and
+    when retirements alone break the cap the cheapest model of the year is bought to widen it.
+    """
+
+    def __init__(self, dataset, catalog = None, iterations = 30):
+        self.dataset = dataset
+        self.catalog = catalog or VehicleCatalog(dataset)
+        self.iterations = iterations
+
+        # fuel cost and emissions per km of every vehicle, fuel and year, inf where incompatible
+        incompatible = ~dataset.compatible[:, :, None]
+        per_km = dataset.consumption[:, :, None]
+        self.fuel_cost_km = np.where(incompatible, np.inf, per_km * dataset.fuel_cost[None, :, :])
+        self.emissions_km = np.where(incompatible, np.inf, per_km * dataset.fuel_emissions[None, :, :])
+
+        # purchase, holding and resale of a vehicle bought in its model year, per km it can drive
+        holding = np.cumsum(dataset.insurance_cost + dataset.maintenance_cost)
+        last_year = self.catalog.last_year
+        held = np.minimum(LIFETIME, last_year - dataset.vehicle_year + 1).clip(1, LIFETIME)
+        resale = np.where(held == LIFETIME, dataset.resale_value[LIFETIME - 1], 0.0)
+        self.capital_km = dataset.vehicle_cost * (1 + holding[held - 1] - resale) / (dataset.vehicle_range * held)
+
+    def _allocate(self, year, fleet, price):
+        # cover every demand cell of the year at the given carbon price,
+        # returns use rows {(v, f, d): [vehicles, km]}, vehicles bought and emissions
+        dataset, catalog = self.dataset, self.catalog
+        y = dataset.year_index[year]
+        score = self.fuel_cost_km[:, :, y] + price * np.nan_to_num(self.emissions_km[:, :, y], posinf = 0.0)
+        score[~dataset.compatible] = np.inf
+        best_fuel = score.argmin(axis = 1)
+        best_score = score[np.arange(len(best_fuel)), best_fuel]
+
+        available = dict(fleet)
+        use = {}
+        bought = defaultdict(int)
+        emissions = 0.0
+        for s, size in enumerate(dataset.sizes):
+            for b in range(len(dataset.distances) - 1, -1, -1):
+                d = dataset.distances[b]
+                remaining = dataset.demand[y, s, b]
+                if remaining <= 0:
+                    continue
+                options = []
+                for v in catalog.serving[size, d]:
+                    i = dataset.vehicle_index[v]
+                    if available.get(v, 0) > 0:
+                        options.append((best_score[i], False, v, i))
+                    elif catalog.vehicles[v].model_year == year:
+                        options.append((best_score[i] + self.capital_km[i], True, v, i))
+                options.sort()
+                for _, new, v, i in options:
+                    if remaining <= 0:
+                        break
+                    km_range = dataset.vehicle_range[i]
+                    units = math.ceil(remaining / km_range)
+                    if not new:
+                        units = min(units, available[v])
+                        available[v] -= units
+                    else:
+                        bought[v] += units
+                    km = min(remaining, units * km_range)
+                    remaining -= km
+                    f = dataset.fuels[best_fuel[i]]
+                    use[v, f, d] = [units, km]
+                    emissions += km * self.emissions_km[i, best_fuel[i], y]
+                if remaining > 0:
+                    raise ValueError(f"no vehicle can serve the {size} {d} demand of {year}")
+        return use, bought, emissions
+
+    def _plan_year(self, year, fleet):
+        # the allocation of the year at the lowest carbon price that keeps it under the cap
+        cap = self.dataset.carbon_limit[self.dataset.year_index[year]]
+        allocation = self._allocate(year, fleet, 0.0)
+        if allocation[2] <= cap:
+            return allocation, 0.0
+
+        low, high = 0.0, 1.0
+        while True:
+            candidate = self._allocate(year, fleet, high)
+            if candidate[2] <= cap:
+                allocation = candidate
+                break
+            if high > 1e6:
+                # no price gets under the cap, keep the cleanest plan found
+                self.violations.append((year, f"emissions {candidate[2]:.0f} above the cap {cap:.0f}"))
+                return candidate, high
+            low, high = high, high * 2
+        for _ in range(self.iterations):
+            price = (low + high) / 2
+            candidate = self._allocate(year, fleet, price)
+            if candidate[2] <= cap:
+                allocation, high = candidate, price
+            else:
+                low = price
+        return allocation, high
+
+    def plan(self, output_file = None):
+        """
+        This function builds the plan of every year and returns it as a submission DataFrame
+
+        parameters: output_file: str: optional, path the submission csv is written to
+
+        The carbon price, emissions and vehicles held of each year are kept in self.log,
+        and rules the plan could not satisfy in self.violations.
+        """
+        catalog = self.catalog
+        self.log = []
+        self.violations = []
+        results = []
+        fleet = {}
+
+        for year in catalog.years:
+            (use, bought, emissions), price = self._plan_year(year, fleet)
+            for v, number in bought.items():
+                fleet[v] = fleet.get(v, 0) + number
+
+            # vehicles reaching 10 years are sold at the end of the year
+            held = sum(fleet.values())
+            sold = {v: number for v, number in fleet.items() if catalog.retirement_year(v) == year}
+            cap = math.floor(SELL_LIMIT * held + 1e-9)
+            shortfall = sum(sold.values()) - cap
+            if shortfall > 0:
+                # widen the cap by holding more vehicles: the cheapest model of the year
+                extra = math.ceil(sum(sold.values()) / SELL_LIMIT - held - 1e-9)
+                cheapest = min(catalog.by_model_year[year], key = lambda v: catalog.vehicles[v].cost)
+                bought[cheapest] += extra
+                fleet[cheapest] = fleet.get(cheapest, 0) + extra
+                held += extra
+                cap = math.floor(SELL_LIMIT * held + 1e-9)
+
+            # retirements of the coming years that would not fit under a cap of today's size
+            # are sold ahead, the oldest vehicles first
+            room = cap - sum(sold.values())
+            due = defaultdict(int)
+            for v, number in fleet.items():
+                retirement_year = catalog.retirement_year(v)
+                if v not in sold and retirement_year is not None:
+                    due[retirement_year] += number
+            ahead = 0
+            for later in range(catalog.last_year, year, -1):
+                ahead = max(0, due[later] + ahead - cap)
+            for v in sorted((v for v in fleet if v not in sold), key = catalog.model_year):
+                if min(ahead, room) <= 0:
+                    break
+                number = min(fleet[v], ahead, room)
+                sold[v] = number
+                ahead -= number
+                room -= number
+
+            # idle vehicles are sold while the cap allows, the oldest first
+            in_use = defaultdict(int)
+            for (v, f, d), (units, km) in use.items():
+                in_use[v] += units
+            idle = sorted(
+                (v for v in fleet if v not in sold and catalog.model_year(v) < year and fleet[v] > in_use[v]),
+                key = catalog.model_year,
+            )
+            for v in idle:
+                if room <= 0:
+                    break
+                number = min(fleet[v] - in_use[v], room)
+                sold[v] = number
+                room -= number
+
+            for v, number in bought.items():
+                results.append({"Year": year, "ID": v, "Num_Vehicles": number, "Type": "Buy",
+                                "Fuel": None, "Distance_bucket": None, "Distance_per_vehicle(km)": 0.0})
+            for (v, f, d), (units, km) in use.items():
+                results.append({"Year": year, "ID": v, "Num_Vehicles": units, "Type": "Use",
+                                "Fuel": f, "Distance_bucket": d, "Distance_per_vehicle(km)": km / units})
+            for v, number in sold.items():
+                results.append({"Year": year, "ID": v, "Num_Vehicles": number, "Type": "Sell",
+                                "Fuel": None, "Distance_bucket": None, "Distance_per_vehicle(km)": 0.0})
+
+            self.log.append({"year": year, "carbon_price": price, "emissions": emissions, "vehicles": held})
+            for v, number in sold.items():
+                fleet[v] -= number
+            fleet = {v: number for v, number in fleet.items() if number > 0}
+
+        df_results = submission_frame(results)
+        if output_file is not None:
+            df_results.to_csv(output_file, index = False)
+        return df_results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "build a fleet plan without a solver")
+    parser.add_argument("--data", default = "dataset", help = "dataset directory")
+    parser.add_argument("--output", default = "submission.csv", help = "submission csv to write")
+    args = parser.parse_args()
+
+    dataset = FleetDataset.load(args.data)
+    start = time.perf_counter()
+    planner = GreedyPlanner(dataset)
+    submission = planner.plan(args.output)
+    print(f"{len(submission)} rows in {(time.perf_counter() - start) * 1000:.1f} ms")
+    for record in planner.log:
+        print(record)
+    for year, message in planner.violations:
+        print(year, message)
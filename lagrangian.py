@@ -0,0 +1,313 @@
+"""
+Lagrangian decomposition of the fleet model by vehicle size.
+
+The sizes only interact through the yearly carbon limit and the yearly fleet-wide 20% sell
+limit. Both are relaxed with one multiplier per year, which leaves one independent
+subproblem per size; the subproblems are solved in parallel worker processes and the
+multipliers follow Polyak subgradient steps. The sum of the subproblem bounds gives a
+lower bound on the optimal cost, and the subproblem plans are repaired into a feasible
+fleet plan for the upper bound.
+"""
+import argparse
+import time
+
+import numpy as np
+import pyomo.environ as pe
+from pyomo.contrib.appsi.solvers import Highs
+
+from catalog import SELL_LIMIT, VehicleCatalog
+from fleet_data import FleetDataset
+from fleet_model import build_model
+from greedy import GreedyPlanner
+from rolling_horizon import load_values, model_values
+from solution_store import record_from_args, record_solve
+from solvers import add_store_arguments
+from submission import create_submission
+from warm_start import warm_start_from_submission
+from worker_pool import start_pool, worker
+
+
+# coupling constraints relaxed by the decomposition, each indexed by year with an upper limit
+COUPLING = ["carbon_emission_constraint", "sell_limit_constraint"]
+
+
+def _highs(time_limit = None, mip_rel_gap = None):
+    solver = Highs()
+    if not solver.available():
+        raise RuntimeError("the decomposition needs highspy, pip install highspy")
+    solver.config.load_solution = False
+    solver.config.warmstart = True
+    solver.config.time_limit = time_limit
+    solver.config.mip_gap = mip_rel_gap
+    return solver
+
+
+def add_multiplier_terms(model):
+    """
+    This function moves the coupling constraints of a model into its objective
+
+    parameters: model: ConcreteModel: linear model from fleet_model.build_model
+
+    The coupling constraints are deactivated and every row r of them adds multiplier x body(r)
+    to the objective, the multipliers being the mutable Params lagrange_<constraint>[year].
+    The constant -multiplier x limit is left to the caller, which sums the subproblems.
+
+    returns {constraint name: {year: body expression}}
+    """
+    bodies = {}
+    terms = []
+    for name in COUPLING:
+        constraint = getattr(model, name)
+        constraint.deactivate()
+        multiplier = pe.Param(model.years, initialize = 0.0, mutable = True)
+        model.add_component(f"lagrange_{name}", multiplier)
+        bodies[name] = {}
+        for year, row in constraint.items():
+            # carbon rows read emissions <= limit, sell limit rows sold - 0.2 x fleet <= 0
+            bodies[name][year] = row.body
+            terms.append(multiplier[year] * row.body)
+    model.total_cost.deactivate()
+    model.lagrangian_cost = pe.Objective(expr = model.total_cost.expr + pe.quicksum(terms), sense = pe.minimize)
+    return bodies
+
+
+def _setup_worker(state):
+    state.update(catalog = VehicleCatalog(state["dataset"]), sizes = {})
+
+
+def _subproblem(size):
+    # the subproblem of a size is built and attached to its solver on first use, then kept
+    if size not in worker["sizes"]:
+        dataset, catalog = worker["dataset"], worker["catalog"]
+        model = build_model(dataset, catalog, linear = True, sparse = True, sizes = [size])
+        bodies = add_multiplier_terms(model)
+        warm_start_from_submission(model, GreedyPlanner(dataset, catalog).plan(), catalog)
+        worker["sizes"][size] = (model, bodies, _highs(worker["time_limit"], worker["mip_rel_gap"]))
+    return worker["sizes"][size]
+
+
+def solve_subproblem(task):
+    """
+    This function solves the subproblem of one size at the given multipliers in a worker
+
+    parameters: task: dict: size, and multipliers, {constraint name: array over the years}
+
+    returns the subproblem's lower bound and objective, the body value of every coupling row
+    at its plan (a size's share of the subgradient), its decision values and the termination
+    """
+    model, bodies, solver = _subproblem(task["size"])
+    for name in COUPLING:
+        multiplier = getattr(model, f"lagrange_{name}")
+        for y, year in enumerate(model.years):
+            multiplier[year] = task["multipliers"][name][y]
+    results = solver.solve(model)
+    if results.best_feasible_objective is None:
+        raise RuntimeError(f"no plan found for size {task['size']} ({results.termination_condition})")
+    results.solution_loader.load_vars()
+    return {
+        "size": task["size"],
+        "bound": results.best_objective_bound,
+        "objective": results.best_feasible_objective,
+        "rows": {name: np.array([pe.value(bodies[name][year]) for year in model.years]) for name in COUPLING},
+        "values": model_values(model),
+        "termination": str(results.termination_condition),
+    }
+
+
+def lp_multipliers(dataset, catalog):
+    """
+    This function returns the duals of the coupling rows in the LP relaxation of the full model
+
+    They are the optimal multipliers of the relaxation and a good start for the MILP's.
+    """
+    model = build_model(dataset, catalog, linear = True, sparse = True)
+    pe.TransformationFactory("core.relax_integer_vars").apply_to(model)
+    solver = _highs()
+    solver.config.load_solution = True
+    solver.solve(model)
+    multipliers = {}
+    for name in COUPLING:
+        rows = list(getattr(model, name).values())
+        duals = solver.get_duals(rows)
+        # a <= row of a minimization has a nonpositive dual
+        multipliers[name] = np.maximum(-np.array([duals[row] for row in rows]), 0.0)
+    return multipliers
+
+
+def repair_plan(model, values, solver):
+    """
+    This function restores the coupling constraints on a combined subproblem plan
+
+    parameters: model: ConcreteModel: full linear model, sparse=True
+                values: dict: decision values, e.g. the subproblem plans merged
+                solver: appsi Highs: persistent solver attached to the model
+
+    Purchases and sales are fixed to the plan and use, fuels and km are re-optimized, which
+    brings emissions under the carbon limit by switching to low-carbon fuels and vehicles.
+    When the plan's sales break the sell limit, only the purchases are fixed and the sales
+    are re-optimized as well. Both solves stop at the solver's time limit, the caller keeps
+    its previous plan when neither finds a feasible one.
+
+    returns the repaired cost, or None when no feasible plan was found
+    """
+    for components in (("number_vehicles_bought", "number_vehicles_sold"), ("number_vehicles_bought",)):
+        load_values(model, values)
+        fixed = [var for name in components for var in getattr(model, name).values()]
+        for var in fixed:
+            var.fix(round(var.value or 0))
+        try:
+            results = solver.solve(model)
+        finally:
+            for var in fixed:
+                var.unfix()
+        if results.best_feasible_objective is not None:
+            results.solution_loader.load_vars()
+            return pe.value(model.total_cost)
+    return None
+
+
+def solve_lagrangian(dataset, iterations = 20, workers = None, time_limit = 30, mip_rel_gap = 1e-3, gap_tolerance = 0.01,
+                     step = 0.1, patience = 3, lp_start = True, repair_time_limit = 20):
+    """
+    This function solves the fleet model by Lagrangian decomposition over the vehicle sizes
+
+    parameters: dataset: FleetDataset: the loaded dataset, the subproblems, multipliers and bounds all come from it
+                iterations: int: most multiplier updates
+                workers: int: worker processes, os.cpu_count() by default
+                time_limit: float: seconds per subproblem solve
+                mip_rel_gap: float: relative gap at which a subproblem solve stops
+                gap_tolerance: float: stop once (upper - lower) / upper is below it
+                step: float: initial Polyak step factor, halved after patience iterations without a better lower bound
+                patience: int: iterations without a better lower bound before the step factor is halved
+                lp_start: bool: start from the LP relaxation duals instead of zero multipliers
+                repair_time_limit: float: seconds of each repair solve
+
+    The subgradient of a row is its body at the subproblem plans summed over the sizes minus
+    its limit. Steps are taken on rows scaled by their limit (carbon) or by 20% of the fleet
+    of the greedy plan (sell limit), which puts both in comparable units.
+
+    returns a dict with the best plan's values and cost (upper bound), the best lower bound,
+    the relative gap, the final multipliers and the iteration log
+    """
+    catalog = VehicleCatalog(dataset)
+    years = dataset.years.tolist()
+    greedy = GreedyPlanner(dataset, catalog).plan()
+
+    full = build_model(dataset, catalog, linear = True, sparse = True)
+    loaded, _ = warm_start_from_submission(full, greedy, catalog)
+    if not loaded:
+        raise RuntimeError("the greedy plan could not be repaired into a feasible upper bound")
+    best_values, upper = model_values(full), float(pe.value(full.total_cost))
+    repair_solver = _highs(repair_time_limit, mip_rel_gap)
+
+    limits = {"carbon_emission_constraint": dataset.carbon_limit.astype(float), "sell_limit_constraint": np.zeros(len(years))}
+    scales = {
+        "carbon_emission_constraint": dataset.carbon_limit.astype(float),
+        "sell_limit_constraint": np.maximum(SELL_LIMIT * np.array([_fleet_size(full, year) for year in years]), 1.0),
+    }
+
+    multipliers = lp_multipliers(dataset, catalog) if lp_start else {name: np.zeros(len(years)) for name in COUPLING}
+    lower, best_multipliers, stall = -np.inf, multipliers, 0
+    log = []
+    started = time.perf_counter()
+    with start_pool(dataset, len(dataset.sizes), workers, time_limit, mip_rel_gap, _setup_worker) as pool:
+        for iteration in range(iterations):
+            tasks = [{"size": size, "multipliers": multipliers} for size in dataset.sizes]
+            results = list(pool.map(solve_subproblem, tasks))
+
+            value = sum(result["bound"] for result in results) - sum(
+                float(multipliers[name] @ limits[name]) for name in COUPLING
+            )
+            subgradient = {
+                name: sum(result["rows"][name] for result in results) - limits[name] for name in COUPLING
+            }
+            if value > lower + 1e-6 * abs(value):
+                lower, best_multipliers, stall = value, multipliers, 0
+            else:
+                stall += 1
+                if stall >= patience:
+                    step, stall = step / 2, 0
+
+            # merge the size plans and repair them into a feasible plan
+            merged = {}
+            for result in results:
+                for name, entries in result["values"].items():
+                    merged.setdefault(name, {}).update(entries)
+            repaired = repair_plan(full, merged, repair_solver)
+            if repaired is not None and repaired < upper:
+                upper, best_values = float(repaired), model_values(full)
+
+            gap = (upper - lower) / abs(upper)
+            log.append({
+                "iteration": iteration,
+                "lower": value,
+                "best_lower": lower,
+                "upper": upper,
+                "repaired": repaired,
+                "gap": gap,
+                "carbon_excess": float(np.maximum(subgradient["carbon_emission_constraint"], 0).sum()),
+                "sell_excess": float(np.maximum(subgradient["sell_limit_constraint"], 0).sum()),
+                "step": step,
+                "seconds": time.perf_counter() - started,
+            })
+            if gap <= gap_tolerance:
+                break
+
+            # Polyak step on the scaled rows, towards the best known plan cost
+            scaled = {name: subgradient[name] / scales[name] for name in COUPLING}
+            norm = sum(float(g @ g) for g in scaled.values())
+            if norm == 0:
+                break
+            length = step * (upper - value) / norm
+            multipliers = {
+                name: np.maximum(multipliers[name] + length * scaled[name] / scales[name], 0.0) for name in COUPLING
+            }
+
+    record_solve(
+        dataset.content_hash(),
+        {"solver": "lagrangian", "iterations": iterations, "time_limit": time_limit, "mip_rel_gap": mip_rel_gap,
+         "gap_tolerance": gap_tolerance, "lp_start": lp_start},
+        best_values, upper, lower, "lagrangian", solve_s = time.perf_counter() - started,
+    )
+    return {
+        "values": best_values,
+        "upper": upper,
+        "lower": lower,
+        "gap": (upper - lower) / abs(upper),
+        "multipliers": best_multipliers,
+        "log": log,
+    }
+
+
+def _fleet_size(model, year):
+    # vehicles held during a year by the plan loaded in a stock-free model
+    return sum(
+        pe.value(model.number_vehicles_bought[v, y]) for v, y in model.number_vehicles_bought if y <= year
+    ) - sum(pe.value(model.number_vehicles_sold[v, y]) for v, y in model.number_vehicles_sold if y < year)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "solve the fleet model by Lagrangian decomposition over vehicle sizes")
+    parser.add_argument("--data", default = "dataset", help = "dataset directory")
+    parser.add_argument("--output", default = "submission.csv", help = "submission csv to write")
+    parser.add_argument("--iterations", type = int, default = 20, help = "most multiplier updates")
+    parser.add_argument("--workers", type = int, default = None, help = "worker processes")
+    parser.add_argument("--time-limit", type = float, default = 30, help = "seconds per subproblem")
+    parser.add_argument("--gap", type = float, default = 0.01, help = "relative duality gap to stop at")
+    parser.add_argument("--zero-start", action = "store_true", help = "start from zero multipliers instead of the LP duals")
+    add_store_arguments(parser)
+    args = parser.parse_args()
+
+    record_from_args(args)
+
+    dataset = FleetDataset.load(args.data)
+    solution = solve_lagrangian(
+        dataset, args.iterations, args.workers, args.time_limit, gap_tolerance = args.gap,
+        lp_start = not args.zero_start,
+    )
+    for record in solution["log"]:
+        print(record)
+    print(f"upper {solution['upper']:,.2f} lower {solution['lower']:,.2f} gap {solution['gap']:.2%}")
+    model = build_model(dataset, VehicleCatalog(dataset), linear = True, sparse = True)
+    load_values(model, solution["values"])
+    create_submission(model, args.output)
@@ -0,0 +1,52 @@
+"""
+Lifecycle cost coefficients: the purchase, insurance, maintenance and resale terms of the
+objective folded into one coefficient per buy and per sell variable.
+
+The holding cost of a year is paid on the fleet held that year, initial + bought up to the
+year - sold before it. Summed over the years, a vehicle bought in year y pays the holding
+cost of every held year from y on, and a vehicle sold at the end of year y saves the
+holding cost of every held year after y, so
+
+    buy[v, y] = cost(v) x (1 + sum of (insurance + maintenance)[age] over held years >= y)
+    sell[v, y] = -cost(v) x (resale[age(y)] + sum of (insurance + maintenance)[age] over held years > y)
+
+which replaces the per-year fleet expressions (O(V x Y^2) terms) by O(V x Y) terms.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from catalog import LIFETIME
+
+
+LifecycleCoefficients = namedtuple("LifecycleCoefficients", ["years", "buy", "sell", "held"])
+
+
+def lifecycle_coefficients(dataset, years = None):
+    """
+    This function computes the aggregated lifecycle coefficients of every vehicle and year
+
+    parameters: dataset: FleetDataset: the loaded dataset, profiles come from cost_profiles.csv
+                years: iterable of int: optional, consecutive sub-horizon, all years by default
+
+    returns a LifecycleCoefficients of vehicle x year arrays over the given years: buy and sell
+    coefficients, and held, the holding cost of one vehicle held through every modelled year
+    (the cost of a vehicle already in the fleet when the sub-horizon starts)
+    """
+    years = np.asarray(list(years) if years is not None else dataset.years, dtype = int)
+    age = years[None, :] - dataset.vehicle_year[:, None] + 1
+    active = (age >= 1) & (age <= LIFETIME)
+    profile = np.clip(age, 1, LIFETIME) - 1
+    cost = dataset.vehicle_cost[:, None]
+
+    holding = np.where(active, cost * (dataset.insurance_cost + dataset.maintenance_cost)[profile], 0.0)
+    from_year = np.cumsum(holding[:, ::-1], axis = 1)[:, ::-1]
+    after_year = from_year - holding
+    resale = np.where(active, cost * dataset.resale_value[profile], 0.0)
+
+    return LifecycleCoefficients(
+        years = years.tolist(),
+        buy = cost + from_year,
+        sell = -(resale + after_year),
+        held = from_year[:, 0],
+    )
@@ -0,0 +1,266 @@
+"""
+Direct sparse-matrix engine for the fleet model: the MILP is assembled as a CSR matrix
+with bound vectors and solved with scipy.optimize.milp (HiGHS), without Pyomo.
+
+Columns, per vehicle that can be bought inside the horizon:
+buy: number bought in the model year
+sell: number sold at the end of each year the vehicle can be held
+use: number used per (fuel, demand bucket, year)
+km: total km driven per (fuel, demand bucket, year), at most range x use
+"""
+import argparse
+
+import numpy as np
+from scipy.optimize import Bounds, LinearConstraint, milp
+from scipy.sparse import csr_matrix
+
+from catalog import LIFETIME, SELL_LIMIT
+from fleet_data import FleetDataset
+from lifecycle import lifecycle_coefficients
+from submission import submission_from_arrays
+
+
+def _expand(counts):
+    # (group, position inside group) for groups of the given sizes laid out one after another
+    counts = np.asarray(counts, dtype=int)
+    group = np.repeat(np.arange(len(counts)), counts)
+    starts = np.cumsum(counts) - counts
+    return group, np.arange(counts.sum()) - starts[group]
+
+
+class FleetMatrix:
+    """
+    This class assembles the fleet MILP as c, A (CSR), row and column bounds and integrality
+
+    parameters: dataset: FleetDataset: the loaded dataset
+    """
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+        years = dataset.years
+        n_years = len(years)
+        n_sizes, n_distances = len(dataset.sizes), len(dataset.distances)
+
+        # buy columns: vehicles whose model year lies in the horizon
+        self.buy_vehicle = np.flatnonzero(np.isin(dataset.vehicle_year, years))
+        first_year = dataset.vehicle_year[self.buy_vehicle] - years[0]
+        held = np.minimum(LIFETIME, n_years - first_year)
+        retires = first_year + LIFETIME <= n_years
+
+        # sell columns: one per (vehicle, year it can be held)
+        buy_of_sell, self.sell_age = _expand(held)
+        self.sell_vehicle = self.buy_vehicle[buy_of_sell]
+        self.sell_year = first_year[buy_of_sell] + self.sell_age
+        sell_start = np.cumsum(held) - held
+
+        # use / km columns: one per (vehicle, compatible fuel, servable bucket, year held)
+        pair_buy, pair_fuel = np.nonzero(dataset.compatible[self.buy_vehicle])
+        pair_bucket, bucket = _expand(dataset.vehicle_distance[self.buy_vehicle[pair_buy]] + 1)
+        use_bucket_buy = pair_buy[pair_bucket]
+        use_of, age = _expand(held[use_bucket_buy])
+        use_buy = use_bucket_buy[use_of]
+        self.use_vehicle = self.buy_vehicle[use_buy]
+        self.use_fuel = pair_fuel[pair_bucket][use_of]
+        self.use_distance = bucket[use_of]
+        self.use_year = first_year[use_buy] + age
+        use_sell = sell_start[use_buy] + age
+
+        n_buy, n_sell, n_use = len(self.buy_vehicle), len(self.sell_vehicle), len(self.use_vehicle)
+        self.sell_offset = n_buy
+        self.use_offset = n_buy + n_sell
+        self.km_offset = n_buy + n_sell + n_use
+        n_cols = self.km_offset + n_use
+        buy_col = np.arange(n_buy)
+        sell_col = self.sell_offset + np.arange(n_sell)
+        use_col = self.use_offset + np.arange(n_use)
+        km_col = self.km_offset + np.arange(n_use)
+
+        # (later, earlier) sell column pairs of the same vehicle, for the prefix sums of sales
+        later, earlier = [], []
+        for n in np.unique(held):
+            rows, cols = np.tril_indices(n, -1)
+            base = sell_start[held == n][:, None]
+            later.append((base + rows).ravel())
+            earlier.append((base + cols).ravel())
+        later, earlier = np.concatenate(later), np.concatenate(earlier)
+
+        rows, cols, vals, lower, upper = [], [], [], [], []
+
+        def add_rows(row, col, val, lb, ub):
+            rows.append(row + sum(len(b) for b in lower))
+            cols.append(col)
+            vals.append(np.broadcast_to(val, np.shape(col)).astype(float))
+            lower.append(np.asarray(lb, dtype=float))
+            upper.append(np.asarray(ub, dtype=float))
+
+        # yearly demand per (year, size, distance) cell
+        demand = dataset.demand.ravel()
+        cell_row = np.full(demand.shape, -1)
+        cell_row[demand > 0] = np.arange((demand > 0).sum())
+        cell = (self.use_year * n_sizes + dataset.vehicle_size[self.use_vehicle]) * n_distances + self.use_distance
+        serves = cell_row[cell] >= 0
+        add_rows(cell_row[cell][serves], km_col[serves], 1.0, demand[demand > 0], np.full((demand > 0).sum(), np.inf))
+        self.demand_rows = (demand > 0).sum()
+
+        # distance per vehicle within its yearly range: km - range x use <= 0
+        use_range = dataset.vehicle_range[self.use_vehicle]
+        add_rows(
+            np.concatenate([np.arange(n_use), np.arange(n_use)]),
+            np.concatenate([km_col, use_col]),
+            np.concatenate([np.ones(n_use), -use_range]),
+            np.full(n_use, -np.inf), np.zeros(n_use),
+        )
+
+        # carbon emission cap per year
+        self.km_emissions = (
+            dataset.consumption[self.use_vehicle, self.use_fuel]
+            * dataset.fuel_emissions[self.use_fuel, self.use_year]
+        )
+        add_rows(self.use_year, km_col, self.km_emissions, np.full(n_years, -np.inf), dataset.carbon_limit)
+
+        # vehicles used in a year <= bought - sold in earlier years, one row per sell column (vehicle, year)
+        add_rows(
+            np.concatenate([use_sell, np.arange(n_sell), later]),
+            np.concatenate([use_col, buy_of_sell, sell_col[earlier]]),
+            np.concatenate([np.ones(n_use), -np.ones(n_sell), np.ones(len(later))]),
+            np.full(n_sell, -np.inf), np.zeros(n_sell),
+        )
+
+        # all sales <= purchases, and every vehicle is sold by the end of its 10th year
+        add_rows(
+            np.concatenate([buy_of_sell, np.arange(n_buy)]),
+            np.concatenate([sell_col, buy_col]),
+            np.concatenate([np.ones(n_sell), -np.ones(n_buy)]),
+            np.where(retires, 0.0, -np.inf), np.zeros(n_buy),
+        )
+
+        # at most 20% of the fleet held during a year is sold at its end
+        add_rows(
+            np.concatenate([self.sell_year, self.sell_year, self.sell_year[later]]),
+            np.concatenate([sell_col, buy_of_sell, sell_col[earlier]]),
+            np.concatenate([np.ones(n_sell), np.full(n_sell, -SELL_LIMIT), np.full(len(later), SELL_LIMIT)]),
+            np.full(n_years, -np.inf), np.zeros(n_years),
+        )
+
+        self.A = csr_matrix(
+            (np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+            shape = (sum(len(b) for b in lower), n_cols),
+        )
+        self.row_lb = np.concatenate(lower)
+        self.row_ub = np.concatenate(upper)
+
+        # objective
+        # purchase, insurance, maintenance and resale folded into the buy and sell columns, see lifecycle.py
+        lifecycle = lifecycle_coefficients(dataset)
+        self.c = np.zeros(n_cols)
+        self.c[buy_col] = lifecycle.buy[self.buy_vehicle, first_year]
+        self.c[sell_col] = lifecycle.sell[self.sell_vehicle, self.sell_year]
+        self.c[km_col] = (
+            dataset.consumption[self.use_vehicle, self.use_fuel]
+            * dataset.fuel_cost[self.use_fuel, self.use_year]
+        )
+
+        # more vehicles or km than a demand cell needs are never useful in a cell; purchases are
+        # left unbounded, idle vehicles widen the sell limit, as in fleet_model.build_model
+        self.col_lb = np.zeros(n_cols)
+        self.col_ub = np.full(n_cols, np.inf)
+        self.col_ub[use_col] = np.ceil(demand[cell] / use_range)
+        self.col_ub[km_col] = demand[cell]
+        self.integrality = np.ones(n_cols)
+        self.integrality[km_col] = 0
+
+    @property
+    def shape(self):
+        return self.A.shape
+
+    def solve(self, time_limit = None, mip_rel_gap = None, disp = False, integral = True):
+        """
+        This function solves the assembled model with scipy.optimize.milp
+
+        parameters: time_limit: float: optional, seconds
+                    mip_rel_gap: float: optional, relative MIP gap to stop at
+                    disp: bool: print the HiGHS log
+                    integral: bool: False solves the LP relaxation
+        """
+        options = {"disp": disp}
+        if time_limit is not None:
+            options["time_limit"] = time_limit
+        if mip_rel_gap is not None:
+            options["mip_rel_gap"] = mip_rel_gap
+        return milp(
+            self.c,
+            integrality = self.integrality if integral else np.zeros_like(self.integrality),
+            bounds = Bounds(self.col_lb, self.col_ub),
+            constraints = LinearConstraint(self.A, self.row_lb, self.row_ub),
+            options = options,
+        )
+
+    def submission(self, x):
+        """
+        This function turns a solution vector into the submission DataFrame of create_submission
+
+        parameters: x: np.ndarray: column values, e.g. the x of a milp result
+
+        The columns are handed to submission.submission_from_arrays keyed like the variables
+        of fleet_model.build_model, so both backends write their plans the same way.
+        """
+        dataset = self.dataset
+        years = dataset.years.tolist()
+        ids = dataset.vehicle_ids
+        buy = x[: self.sell_offset]
+        sell = x[self.sell_offset: self.use_offset]
+        use = x[self.use_offset: self.km_offset]
+        km = x[self.km_offset:]
+
+        # only the columns that round to at least one vehicle get an index tuple
+        b = np.flatnonzero(np.rint(buy) > 0)
+        s = np.flatnonzero(np.rint(sell) > 0)
+        u = np.flatnonzero(np.rint(use) > 0)
+        use_keys = list(zip(
+            [ids[v] for v in self.use_vehicle[u]],
+            [dataset.fuels[f] for f in self.use_fuel[u]],
+            [dataset.distances[d] for d in self.use_distance[u]],
+            [years[y] for y in self.use_year[u]],
+        ))
+        arrays = {
+            "number_vehicles_bought": (
+                list(zip([ids[v] for v in self.buy_vehicle[b]], dataset.vehicle_year[self.buy_vehicle[b]].tolist())), buy[b],
+            ),
+            "number_vehicles_use": (use_keys, use[u]),
+            "total_km": (use_keys, km[u]),
+            "number_vehicles_sold": (list(zip([ids[v] for v in self.sell_vehicle[s]], [years[y] for y in self.sell_year[s]])), sell[s]),
+        }
+        return submission_from_arrays(arrays)
+
+
+def solve_milp(dataset, time_limit = None, mip_rel_gap = None, disp = False):
+    """
+    This function builds and solves the fleet model as a sparse MILP
+
+    parameters: dataset: FleetDataset: the loaded dataset
+                time_limit: float: optional, seconds
+                mip_rel_gap: float: optional, relative MIP gap to stop at
+                disp: bool: print the HiGHS log
+
+    returns the submission DataFrame (None when no solution was found) and the milp result
+    """
+    matrix = FleetMatrix(dataset)
+    result = matrix.solve(time_limit = time_limit, mip_rel_gap = mip_rel_gap, disp = disp)
+    if result.x is None:
+        return None, result
+    return matrix.submission(result.x), result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "solve the fleet model with scipy.optimize.milp")
+    parser.add_argument("--data", default = "dataset", help = "dataset directory")
+    parser.add_argument("--output", default = "submission.csv", help = "submission csv to write")
+    parser.add_argument("--time-limit", type = float, default = None, help = "seconds")
+    parser.add_argument("--gap", type = float, default = None, help = "relative MIP gap")
+    parser.add_argument("--verbose", action = "store_true", help = "print the HiGHS log")
+    args = parser.parse_args()
+
+    submission, result = solve_milp(FleetDataset.load(args.data), args.time_limit, args.gap, args.verbose)
+    print(result.message, result.fun)
+    if submission is not None:
+        submission.to_csv(args.output, index = False)
@@ -0,0 +1,227 @@
+"""
+Content-addressed cache of built models: the model of a dataset and build options is
+written once as a compressed MPS (or LP) file with its symbol map, and later runs with the
+same inputs hand that file straight to HiGHS without rebuilding anything in Pyomo.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import namedtuple
+
+from fleet_data import DATASET_FILES
+
+
+CacheEntry = namedtuple("CacheEntry", ["key", "path", "symbols", "hit"])
+
+Solution = namedtuple("Solution", ["values", "objective", "bound", "status"])
+
+FILE_FORMATS = ("mps", "lp")
+
+
+def input_hash(data_dir = "dataset", **options):
+    """
+    This function hashes the dataset files and the build options into a cache key
+
+    parameters: data_dir: str: dataset directory
+                options: build_model keyword arguments, plus anything else that changes the model file
+    """
+    digest = hashlib.sha256()
+    for name in sorted(DATASET_FILES.values()):
+        digest.update(name.encode())
+        with open(os.path.join(data_dir, name), "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+    digest.update(json.dumps(options, sort_keys = True, default = str).encode())
+    return digest.hexdigest()
+
+
+class ModelCache:
+    """
+    This class keeps built models as <key>.<format>.gz files next to <key>.symbols.json.gz
+
+    parameters: directory: str: cache directory, created when missing
+                max_bytes: int: total size the cache is evicted down to, least recently used first
+
+    The symbol map sends every column name of the file back to its (component, index) and
+    every row name to its constraint, so a solution read from the solver maps onto the
+    decision values of fleet_model.build_model.
+    """
+
+    def __init__(self, directory = ".model_cache", max_bytes = 1 << 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok = True)
+
+    def _paths(self, key, file_format):
+        return (
+            os.path.join(self.directory, f"{key}.{file_format}.gz"),
+            os.path.join(self.directory, f"{key}.symbols.json.gz"),
+        )
+
+    def get(self, key, file_format = "mps"):
+        """
+        This function returns the cached entry of a key, None on a miss, and marks it as recently used
+        """
+        path, symbol_path = self._paths(key, file_format)
+        if not (os.path.exists(path) and os.path.exists(symbol_path)):
+            return None
+        now = time.time()
+        os.utime(path, (now, now))
+        os.utime(symbol_path, (now, now))
+        with gzip.open(symbol_path, "rt") as file:
+            stored = json.load(file)
+        symbols = {
+            "columns": {name: (component, tuple(index)) for name, (component, index) in stored["columns"].items()},
+            "rows": stored["rows"],
+        }
+        return CacheEntry(key, path, symbols, True)
+
+    def put(self, key, model, file_format = "mps"):
+        """
+        This function writes a built model and its symbol map under a key and evicts old entries
+        """
+        if file_format not in FILE_FORMATS:
+            raise ValueError(f"file_format must be one of {FILE_FORMATS}")
+        path, symbol_path = self._paths(key, file_format)
+        with tempfile.TemporaryDirectory(dir = self.directory) as scratch:
+            plain = os.path.join(scratch, f"model.{file_format}")
+            _, symbol_map_id = model.write(plain, format = file_format, io_options = {"symbolic_solver_labels": False})
+            symbol_map = model.solutions.symbol_map[symbol_map_id]
+            columns, rows = {}, {}
+            for name, data in symbol_map.bySymbol.items():
+                component = data.parent_component()
+                if component.ctype.__name__ == "Var":
+                    index = data.index()
+                    columns[name] = (component.name, list(index) if isinstance(index, tuple) else [index])
+                else:
+                    rows[name] = data.name
+
+            # write both files aside and move them in, a crashed write never looks like a hit
+            packed = os.path.join(scratch, "model.gz")
+            with open(plain, "rb") as source, gzip.open(packed, "wb", compresslevel = 6) as target:
+                shutil.copyfileobj(source, target)
+            packed_symbols = os.path.join(scratch, "symbols.gz")
+            with gzip.open(packed_symbols, "wt") as file:
+                json.dump({"columns": columns, "rows": rows}, file)
+            os.replace(packed_symbols, symbol_path)
+            os.replace(packed, path)
+        self.evict(keep = key)
+        return self.get(key, file_format)._replace(hit = False)
+
+    def load_or_build(self, data_dir = "dataset", file_format = "mps", **options):
+        """
+        This function returns the cached model of a dataset and build options, building and caching it on a miss
+
+        parameters: data_dir: str: dataset directory, the key is hashed from its files and a miss builds from them
+                    file_format: str: "mps" or "lp"
+                    options: build_model keyword arguments, e.g. linear=True
+        """
+        key = input_hash(data_dir, file_format = file_format, **options)
+        entry = self.get(key, file_format)
+        if entry is not None:
+            return entry
+
+        from catalog import VehicleCatalog
+        from fleet_data import FleetDataset
+        from fleet_model import build_model
+
+        dataset = FleetDataset.load(data_dir)
+        model = build_model(dataset, VehicleCatalog(dataset), **options)
+        return self.put(key, model, file_format)
+
+    def entries(self):
+        """
+        This function lists (last use, bytes, [paths], key) per cached key, the least recently used first
+        """
+        grouped = {}
+        for name in os.listdir(self.directory):
+            if not name.endswith(".gz"):
+                continue
+            path = os.path.join(self.directory, name)
+            key = name.split(".")[0]
+            used, size, paths, _ = grouped.get(key, (0.0, 0, [], key))
+            grouped[key] = (max(used, os.path.getmtime(path)), size + os.path.getsize(path), paths + [path], key)
+        return sorted(grouped.values())
+
+    def evict(self, keep = None):
+        """
+        This function removes the least recently used entries until the cache fits in max_bytes
+
+        parameters: keep: str: optional, key that is never evicted, e.g. the entry just written
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _, _ in entries)
+        for _, size, paths, key in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            for path in paths:
+                os.remove(path)
+            total -= size
+
+
+def solve_cached(entry, time_limit = None, mip_rel_gap = None, threads = None, presolve = None, tee = False):
+    """
+    This function solves a cached model file with HiGHS and maps the solution back to decision values
+
+    parameters: entry: CacheEntry: from ModelCache.get / load_or_build
+                time_limit: float: optional, seconds
+                mip_rel_gap: float: optional, relative gap at which the solve stops
+                threads: int: optional, HiGHS threads
+                presolve: str: optional, "on", "off" or "choose"
+                tee: bool: stream the solver log
+
+    returns a Solution: the values (component name -> {index: value}, see
+    submission.submission_from_values), the objective, the dual bound and the HiGHS model status
+    """
+    import highspy
+
+    highs = highspy.Highs()
+    highs.setOptionValue("output_flag", tee)
+    for option, value in (("time_limit", time_limit), ("mip_rel_gap", mip_rel_gap), ("threads", threads), ("presolve", presolve)):
+        if value is not None:
+            highs.setOptionValue(option, value)
+    if highs.readModel(entry.path) == highspy.HighsStatus.kError:
+        raise RuntimeError(f"HiGHS could not read {entry.path}")
+    highs.run()
+    status = highs.getModelStatus()
+    info = highs.getInfo()
+    if info.primal_solution_status != 2:
+        raise RuntimeError(f"no feasible plan found ({highs.modelStatusToString(status)})")
+
+    columns = entry.symbols["columns"]
+    values = {}
+    for name, value in zip(highs.getLp().col_names_, highs.getSolution().col_value):
+        if value and name in columns:
+            component, index = columns[name]
+            values.setdefault(component, {})[index] = value
+    bound = info.mip_dual_bound if info.mip_node_count >= 0 else info.objective_function_value
+    return Solution(values, info.objective_function_value, bound, highs.modelStatusToString(status))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "solve the linear fleet model through the model cache")
+    parser.add_argument("--data", default = "dataset", help = "dataset directory")
+    parser.add_argument("--cache", default = ".model_cache", help = "cache directory")
+    parser.add_argument("--max-mb", type = float, default = 1024, help = "cache size the least recently used models are evicted down to")
+    parser.add_argument("--format", default = "mps", choices = FILE_FORMATS, help = "model file format")
+    parser.add_argument("--output", default = "submission.csv", help = "submission csv to write")
+    parser.add_argument("--time-limit", type = float, default = None, help = "seconds")
+    parser.add_argument("--mip-rel-gap", type = float, default = None, help = "relative gap")
+    args = parser.parse_args()
+
+    from submission import submission_from_values
+
+    started = time.perf_counter()
+    cache = ModelCache(args.cache, int(args.max_mb * (1 << 20)))
+    entry = cache.load_or_build(data_dir = args.data, file_format = args.format, linear = True)
+    print(f"cache {'hit' if entry.hit else 'miss'} {entry.path} in {time.perf_counter() - started:.2f} s")
+    solution = solve_cached(entry, args.time_limit, args.mip_rel_gap)
+    print(solution.status, solution.objective, solution.bound)
+    submission_from_values(solution.values, args.output)
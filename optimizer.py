@@ -0,0 +1,126 @@
+"""
+Persistent what-if interface: the linear model is built once and kept attached to an appsi
+HiGHS instance, inputs are changed in place and only the changed coefficients, bounds and
+right-hand sides are pushed to the solver before it re-solves from the previous plan.
+"""
+import copy
+import time
+
+import pyomo.environ as pe
+from pyomo.contrib.appsi.base import TerminationCondition
+from pyomo.contrib.appsi.solvers import Highs
+
+from catalog import VehicleCatalog
+from fleet_data import FleetDataset
+from fleet_model import build_model, vehicle_use_limit
+from solution_store import model_key, record_solve
+from submission import create_submission
+from warm_start import warm_start_from_submission
+
+
+class FleetOptimizer:
+    """
+    This class keeps a built fleet model and its solver alive between what-if questions
+
+    parameters: dataset: FleetDataset: the loaded dataset, copied so edits do not leak into it
+                time_limit: float: optional, seconds per solve
+                mip_rel_gap: float: optional, relative gap at which a solve stops
+                tee: bool: stream the solver log
+
+    The set_* methods change the mutable Params of the model (and the variable bounds that
+    depend on demand), the next solve() sends only those changes to HiGHS and starts branch
+    and bound from the last plan.
+    """
+
+    def __init__(self, dataset, time_limit = None, mip_rel_gap = None, tee = False):
+        self.dataset = copy.deepcopy(dataset)
+        self.catalog = VehicleCatalog(self.dataset)
+        self.model = build_model(self.dataset, self.catalog, linear = True, mutable = True, sparse = True)
+
+        self.solver = Highs()
+        if not self.solver.available():
+            raise RuntimeError("the persistent HiGHS interface needs highspy, pip install highspy")
+        self.solver.config.load_solution = False
+        self.solver.config.warmstart = True
+        self.solver.config.stream_solver = tee
+        self.solver.config.time_limit = time_limit
+        self.solver.config.mip_gap = mip_rel_gap
+        self.log = []
+
+    @classmethod
+    def load(cls, data_dir = "dataset", **kwargs):
+        return cls(FleetDataset.load(data_dir), **kwargs)
+
+    def set_fuel_cost(self, fuel, year, value):
+        """
+        This function changes the cost per unit of a fuel in a year, an objective coefficient change
+        """
+        self.dataset.fuel_cost[self.dataset.fuel_index[fuel], self.dataset.year_index[year]] = value
+        self.model.fuel_cost[fuel, year] = value
+
+    def set_carbon_cap(self, year, value):
+        """
+        This function changes the carbon emission limit of a year, a constraint bound change
+        """
+        self.dataset.carbon_limit[self.dataset.year_index[year]] = value
+        self.model.carbon_emissions[year] = value
+
+    def set_demand(self, year, size, dist, km):
+        """
+        This function changes the km demanded in a (year, size, distance) cell
+
+        The demand row bound changes, and so do the bounds of the use and km variables of the cell.
+        """
+        dataset, catalog, model = self.dataset, self.catalog, self.model
+        dataset.demand[dataset.year_index[year], dataset.size_index[size], dataset.distance_index[dist]] = km
+        model.vehicle_demand[year, size, dist] = km
+        for v in catalog.serving[size, dist]:
+            if year not in catalog.active_years(v):
+                continue
+            for f in catalog.fuels(v):
+                model.number_vehicles_use[v, f, dist, year].setub(vehicle_use_limit(dataset, catalog, v, dist, year))
+                model.total_km[v, f, dist, year].setub(km)
+
+    def warm_start(self, path):
+        """
+        This function loads a submission csv as the plan the next solve starts from
+
+        returns whether the plan was loaded and the repairs made to it, see
+        warm_start.warm_start_from_submission; a plan that can not be repaired is not loaded
+        and the next solve starts from the last plan
+        """
+        return warm_start_from_submission(self.model, path, self.catalog)
+
+    def solve(self):
+        """
+        This function re-solves the model after the changes made since the last solve
+
+        returns the objective of the best plan found, which is loaded into the model; the plan
+        is recorded in the solution store, if one is set, under the hash of the edited dataset
+        """
+        started = time.perf_counter()
+        results = self.solver.solve(self.model)
+        elapsed = time.perf_counter() - started
+        self.log.append({
+            "termination": str(results.termination_condition),
+            "objective": results.best_feasible_objective,
+            "bound": results.best_objective_bound,
+            "solve_s": elapsed,
+        })
+        if results.best_feasible_objective is None:
+            if results.termination_condition == TerminationCondition.infeasible:
+                raise RuntimeError("the changed model is infeasible")
+            raise RuntimeError(f"no feasible plan found ({results.termination_condition})")
+        results.solution_loader.load_vars()
+        settings = {"solver": "appsi_highs", "time_limit": self.solver.config.time_limit, "mip_rel_gap": self.solver.config.mip_gap}
+        record_solve(
+            model_key(self.model, self.dataset), settings, self.model, results.best_feasible_objective,
+            results.best_objective_bound, results.termination_condition.name, solve_s = elapsed,
+        )
+        return pe.value(self.model.total_cost)
+
+    def submission(self, output_file = None):
+        """
+        This function returns the last plan as a submission DataFrame
+        """
+        return create_submission(self.model, output_file)
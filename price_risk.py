@@ -0,0 +1,124 @@
+"""
+Fuel-price risk of a fixed plan: fuel price paths are drawn within the Cost Uncertainty (±%)
+bands of fuels.csv and the plan's fuel bill is priced for every path at once.
+"""
+import argparse
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from scipy.special import ndtr
+
+from fleet_data import FleetDataset
+from scoring import score_frame
+from submission import read_submission
+
+
+Risk = namedtuple("Risk", ["base", "mean", "std", "quantile", "cvar", "samples"])
+
+
+def fuel_units(frame, dataset):
+    """
+    This function returns the fuel burnt by a plan as a fuel x year array
+
+    parameters: frame: DataFrame: submission rows
+                dataset: FleetDataset: the dataset the plan was made for
+    """
+    use = frame[frame["Type"] == "Use"]
+    vehicle = pd.Index(dataset.vehicle_ids).get_indexer(use["ID"])
+    fuel = pd.Index(dataset.fuels).get_indexer(use["Fuel"])
+    year = pd.Index(dataset.years).get_indexer(use["Year"])
+    known = (vehicle >= 0) & (fuel >= 0) & (year >= 0)
+    km = (use["Num_Vehicles"] * use["Distance_per_vehicle(km)"]).to_numpy(dtype = float)[known]
+    units = np.zeros(dataset.fuel_cost.shape)
+    np.add.at(units, (fuel[known], year[known]), km * dataset.consumption[vehicle[known], fuel[known]])
+    return units
+
+
+def sample_fuel_prices(dataset, n_samples, seed = None, correlation = 1.0):
+    """
+    This function draws fuel price paths within the Cost Uncertainty (±%) bands of fuels.csv
+
+    parameters: dataset: FleetDataset: the loaded dataset
+                n_samples: int: price paths
+                seed: int: optional, seed of the random draws
+                correlation: float: correlation of a fuel's shock from one year to the next, 1 holds
+                             one shock per fuel across all years, 0 draws every year independently
+
+    Every fuel of a path follows a Gaussian AR(1) walk over the years with unit variance,
+    mapped through the normal CDF, so each year's price is uniform within cost x (1 ±
+    uncertainty) while a fuel that is dear one year stays dear in the next. Fuels are drawn
+    independently of each other.
+
+    returns a samples x fuel x year array
+    """
+    if not 0 <= correlation <= 1:
+        raise ValueError("correlation must be between 0 and 1")
+    rng = np.random.default_rng(seed)
+    noise = rng.standard_normal((n_samples,) + dataset.fuel_cost.shape)
+    walk = np.empty_like(noise)
+    walk[..., 0] = noise[..., 0]
+    for y in range(1, walk.shape[-1]):
+        walk[..., y] = correlation * walk[..., y - 1] + np.sqrt(1 - correlation ** 2) * noise[..., y]
+    shocks = 2 * ndtr(walk) - 1
+    return dataset.fuel_cost * (1 + shocks * dataset.fuel_cost_uncertainty)
+
+
+def price_risk(plan, n_samples = 10000, dataset = None, alpha = 0.95, seed = None, correlation = 1.0):
+    """
+    This function prices a plan under random fuel prices and summarizes the total cost distribution
+
+    parameters: plan: str or DataFrame: submission csv or rows
+                n_samples: int: price paths
+                dataset: FleetDataset: optional, loaded from the dataset directory when omitted
+                alpha: float: level of the quantile and of the CVaR (mean of the worst 1 - alpha)
+                seed: int: optional, seed of the random draws
+                correlation: float: year-to-year correlation of the price shocks, see sample_fuel_prices
+
+    Prices come from sample_fuel_prices. The fuel bills of all samples come from one tensor product of the samples x fuel x year
+    prices with the plan's fuel x year consumption; the other costs of the plan do not move.
+
+    returns a Risk: the cost at the listed prices, the mean, standard deviation, alpha quantile
+    and CVaR of the sampled costs, and the sampled costs themselves
+    """
+    dataset = dataset or FleetDataset.load()
+    frame = read_submission(plan)
+    score = score_frame(frame, dataset)
+    fixed = score.total_cost - score.costs["fuel"]
+    units = fuel_units(frame, dataset)
+
+    prices = sample_fuel_prices(dataset, n_samples, seed, correlation)
+    samples = fixed + np.einsum("sfy,fy->s", prices, units)
+
+    quantile = np.quantile(samples, alpha)
+    return Risk(
+        base = fixed + float((dataset.fuel_cost * units).sum()),
+        mean = float(samples.mean()),
+        std = float(samples.std()),
+        quantile = float(quantile),
+        cvar = float(samples[samples >= quantile].mean()),
+        samples = samples,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "fuel-price risk of a submission")
+    parser.add_argument("submission", help = "submission csv")
+    parser.add_argument("--data", default = "dataset", help = "dataset directory")
+    parser.add_argument("--samples", type = int, default = 10000, help = "price paths")
+    parser.add_argument("--alpha", type = float, default = 0.95, help = "quantile and CVaR level")
+    parser.add_argument("--seed", type = int, default = None, help = "random seed")
+    parser.add_argument("--correlation", type = float, default = 1.0, help = "year-to-year correlation of a fuel's price shock, 0 to 1")
+    args = parser.parse_args()
+
+    dataset = FleetDataset.load(args.data)
+    start = time.perf_counter()
+    risk = price_risk(args.submission, args.samples, dataset, args.alpha, args.seed, args.correlation)
+    elapsed = time.perf_counter() - start
+    print(f"{'listed prices':>14} {risk.base:16,.0f}")
+    print(f"{'mean':>14} {risk.mean:16,.0f}")
+    print(f"{'std':>14} {risk.std:16,.0f}")
+    print(f"{'P%g' % (args.alpha * 100):>14} {risk.quantile:16,.0f}")
+    print(f"{'CVaR%g' % (args.alpha * 100):>14} {risk.cvar:16,.0f}")
+    print(f"{args.samples} samples in {elapsed:.2f} s")
@@ -0,0 +1,293 @@
+"""
+Phase-level profiling of the fleet pipeline: wall time, model size (rows, columns,
+nonzeros) and memory of every phase from the csv load to the plan extraction, written as
+JSON and optionally as a folded-stack profile for flame graph tools.
+
+The peak memory of a phase is measured by resetting the kernel's high-water mark of the
+process when the phase starts (Linux /proc/self/clear_refs) and reading it when it ends.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager, nullcontext
+
+import pyomo.environ as pe
+from pyomo.core.expr.visitor import identify_variables
+
+
+def rss_mb():
+    """
+    This function returns the resident memory of the process in MB, None where /proc is not available
+    """
+    try:
+        with open("/proc/self/statm") as file:
+            pages = int(file.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+
+
+def hwm_mb():
+    """
+    This function returns the peak resident memory since the process started or since the last
+    reset_peak_rss in MB, None where /proc is not available
+    """
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, IndexError, ValueError):
+        return None
+    return None
+
+
+def reset_peak_rss():
+    """
+    This function resets the peak resident memory of the process to its current value
+
+    returns False where the kernel does not allow it, the peak then stays cumulative
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+    except OSError:
+        return False
+    return True
+
+
+def peak_rss_mb():
+    """
+    This function returns the peak resident memory of the process so far in MB, None where resource is not available
+
+    A reset_peak_rss lowers it on Linux as well.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in KB on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if peak > 1 << 32 else peak / 1024
+
+
+def model_size(components):
+    """
+    This function counts the rows, columns and nonzeros of the given model components
+
+    parameters: components: iterable: Constraint, Var and Objective components, indexed or not
+
+    Nonzeros are the distinct variables of each active row and of the objective, columns
+    the variable entries.
+    """
+    rows = cols = nnz = 0
+    for component in components:
+        if component.ctype is pe.Var:
+            cols += len(component)
+        elif component.ctype is pe.Constraint:
+            for constraint in component.values():
+                if constraint.active:
+                    rows += 1
+                    nnz += sum(1 for _ in identify_variables(constraint.body, include_fixed = False))
+        elif component.ctype is pe.Objective:
+            for objective in component.values():
+                nnz += sum(1 for _ in identify_variables(objective.expr, include_fixed = False))
+    return {"rows": rows, "cols": cols, "nnz": nnz}
+
+
+class PhaseProfiler:
+    """
+    This class times nested phases and records the model size and memory of each
+
+    parameters: sizes: bool: count the rows, columns and nonzeros each phase adds to the model,
+                       the counting time is left out of every phase's duration
+
+    Use phase(name, model) as a context manager, phases opened inside another one are
+    its children. report() lists the phases in the order they started.
+
+    peak_rss_mb is the peak resident memory during the phase, children included, and
+    process_peak_rss_mb the peak of the process from its start to the end of the phase.
+    Where the peak can not be reset (not Linux), peak_rss_mb is None and only the cumulative
+    process_peak_rss_mb is known.
+    """
+
+    def __init__(self, sizes = True):
+        self.sizes = sizes
+        self.records = []
+        self._stack = []
+        self._peaks = []
+        self._process_peak = None
+        self._overhead = 0.0
+
+    def _read_peak(self):
+        # fold the high-water mark since the last reset into the open phases and the process peak
+        peak = hwm_mb()
+        if peak is not None:
+            self._peaks = [max(value, peak) for value in self._peaks]
+            self._process_peak = max(self._process_peak or 0.0, peak)
+        return peak
+
+    @contextmanager
+    def phase(self, name, model = None):
+        """
+        This function times the block it wraps as a phase
+
+        parameters: name: str: phase name, unique among its siblings
+                    model: ConcreteModel: optional, the components the block adds to it are counted
+        """
+        record = {"name": name, "path": ";".join([r["name"] for r in self._stack] + [name])}
+        self.records.append(record)
+        counted = time.perf_counter()
+        self._read_peak()
+        self._stack.append(record)
+        self._peaks.append(0.0)
+        resettable = reset_peak_rss()
+        before = set(model.component_map().keys()) if model is not None and self.sizes else None
+        self._overhead += time.perf_counter() - counted
+        overhead = self._overhead
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            # the counting done by the phases inside this one is not part of its time
+            record["seconds"] = time.perf_counter() - started - (self._overhead - overhead)
+            counted = time.perf_counter()
+            record["rss_mb"] = rss_mb()
+            self._read_peak()
+            self._stack.pop()
+            peak = self._peaks.pop()
+            # the two are read from different counters, the peak is never below the current value
+            if resettable and peak:
+                record["peak_rss_mb"] = max(peak, record["rss_mb"] or 0.0)
+                record["process_peak_rss_mb"] = max(self._process_peak, record["peak_rss_mb"])
+            else:
+                record["peak_rss_mb"] = None
+                record["process_peak_rss_mb"] = max(filter(None, (peak_rss_mb(), record["rss_mb"])), default = None)
+            if before is not None:
+                added = [component for key, component in model.component_map().items() if key not in before]
+                record.update(model_size(added))
+            self._overhead += time.perf_counter() - counted
+
+    def report(self):
+        """
+        This function returns a record per phase with its time, its self time (without children) and sizes
+        """
+        children = {}
+        for record in self.records:
+            parent = record["path"].rpartition(";")[0]
+            children[parent] = children.get(parent, 0.0) + record.get("seconds", 0.0)
+        return [
+            dict(record, self_seconds = max(record.get("seconds", 0.0) - children.get(record["path"], 0.0), 0.0))
+            for record in self.records
+        ]
+
+    def write_json(self, path):
+        with open(path, "w") as file:
+            json.dump(self.report(), file, indent = 2)
+
+    def write_folded(self, path):
+        """
+        This function writes the self time of every phase in microseconds as folded stacks
+
+        The "a;b;c count" lines are read by flamegraph.pl, speedscope and inferno.
+        """
+        with open(path, "w") as file:
+            for record in self.report():
+                file.write(f"{record['path']} {round(record['self_seconds'] * 1e6)}\n")
+
+    def summary(self):
+        """
+        This function formats the report as a table, children indented under their phase
+        """
+        lines = [f"{'phase':<44} {'seconds':>9} {'rows':>8} {'cols':>8} {'nnz':>9} {'rss MB':>8} {'peak MB':>8}"]
+        for record in self.report():
+            depth = record["path"].count(";")
+
+            def column(key, width, spec = "d"):
+                value = record.get(key)
+                return f"{value:>{width}{spec}}" if value is not None else " " * width
+
+            lines.append(
+                f"{'  ' * depth + record['name']:<44} {record['seconds']:9.3f} {column('rows', 8)} {column('cols', 8)}"
+                f" {column('nnz', 9)} {column('rss_mb', 8, '.0f')} {column('peak_rss_mb', 8, '.0f')}"
+            )
+        return "\n".join(lines)
+
+
+def profiled(profiler, name, model = None):
+    """
+    This function returns profiler.phase(name, model), or an empty context when profiler is None
+    """
+    return profiler.phase(name, model) if profiler is not None else nullcontext()
+
+
+def profile_pipeline(data_dir = "dataset", profiler = None, solver = "appsi_highs", time_limit = 60,
+                     file_format = "mps", output_file = None, **options):
+    """
+    This function runs load, build, write, solve and extraction under a profiler
+
+    parameters: data_dir: str: dataset directory
+                profiler: PhaseProfiler: optional, a new one by default
+                solver: str: Pyomo solver name, None to stop after the write
+                time_limit: float: seconds of the solve
+                file_format: str: format the model is written in, "mps" or "lp"
+                output_file: str: optional, submission csv written by the extraction
+                options: build_model keyword arguments, linear=True by default
+
+    returns the profiler
+    """
+    import pyomo.opt as po
+
+    from catalog import VehicleCatalog
+    from fleet_data import FleetDataset
+    from fleet_model import build_model
+    from submission import create_submission
+
+    profiler = profiler or PhaseProfiler()
+    options.setdefault("linear", True)
+    with profiler.phase("load"):
+        dataset = FleetDataset.load(data_dir)
+        catalog = VehicleCatalog(dataset)
+    with profiler.phase("build"):
+        model = build_model(dataset, catalog, profiler = profiler, **options)
+    with tempfile.TemporaryDirectory() as scratch, profiler.phase("write") as record:
+        path = os.path.join(scratch, f"model.{file_format}")
+        model.write(path, format = file_format, io_options = {"symbolic_solver_labels": False})
+        record["file_mb"] = os.path.getsize(path) / (1 << 20)
+    if solver is None:
+        return profiler
+    with profiler.phase("solve") as record:
+        results = po.SolverFactory(solver).solve(model, timelimit = time_limit, load_solutions = False)
+        if len(results.solution):
+            model.solutions.load_from(results)
+        record["termination"] = str(results.solver.termination_condition)
+        record["objective"] = pe.value(model.total_cost, exception = False)
+    with profiler.phase("extract"):
+        create_submission(model, output_file)
+    return profiler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "profile the fleet pipeline phase by phase")
+    parser.add_argument("--data", default = "dataset", help = "dataset directory")
+    parser.add_argument("--json", default = "profile.json", help = "JSON report to write")
+    parser.add_argument("--folded", default = None, help = "optional folded-stack profile for flame graphs")
+    parser.add_argument("--solver", default = "appsi_highs", help = "Pyomo solver name, 'none' to skip the solve")
+    parser.add_argument("--time-limit", type = float, default = 60, help = "seconds of the solve")
+    parser.add_argument("--format", default = "mps", choices = ["mps", "lp"], help = "model file format of the write phase")
+    parser.add_argument("--nonlinear", action = "store_true", help = "profile the MINLP instead of the linear model")
+    parser.add_argument("--sparse", action = "store_true", help = "build with sparse index sets")
+    parser.add_argument("--stock", action = "store_true", help = "build with cohort stock variables")
+    parser.add_argument("--no-sizes", action = "store_true", help = "skip the row, column and nonzero counts")
+    args = parser.parse_args()
+
+    profiler = profile_pipeline(
+        args.data, PhaseProfiler(sizes = not args.no_sizes), None if args.solver == "none" else args.solver,
+        args.time_limit, args.format, linear = not args.nonlinear, sparse = args.sparse, stock = args.stock,
+    )
+    print(profiler.summary())
+    profiler.write_json(args.json)
+    if args.folded:
+        profiler.write_folded(args.folded)
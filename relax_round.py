@@ -0,0 +1,464 @@
+"""
+Relax-and-round heuristic: solve the LP relaxation of the fleet model, round its purchases
+and sales to integers where demand needs them, and repair the sell and carbon limits, which
+gives an integer plan in a few LP solves together with the LP bound as a guaranteed gap.
+"""
+import argparse
+import math
+import time
+from collections import defaultdict
+
+import pyomo.environ as pe
+from pyomo.contrib.appsi.solvers import Highs
+
+from catalog import SELL_LIMIT, VehicleCatalog
+from fleet_data import FleetDataset
+from fleet_model import build_model
+from greedy import GreedyPlanner
+from rolling_horizon import load_values, model_values
+from solution_store import record_from_args, record_solve
+from solvers import add_store_arguments
+from submission import create_submission
+from warm_start import warm_start_from_submission
+
+
+# integer decision variables relaxed to continuous values for the LP solves
+INTEGERS = ["number_vehicles_bought", "number_vehicles_use", "number_vehicles_sold"]
+
+# values this close to an integer count as that integer
+TOLERANCE = 1e-6
+
+
+def _highs():
+    solver = Highs()
+    if not solver.available():
+        raise RuntimeError("relax-and-round needs highspy, pip install highspy")
+    solver.config.load_solution = False
+    return solver
+
+
+def set_relaxed(model, relaxed):
+    """
+    This function switches the integer decision variables of a model between integer and continuous domains
+    """
+    domain = pe.NonNegativeReals if relaxed else pe.NonNegativeIntegers
+    for name in INTEGERS:
+        for var in getattr(model, name).values():
+            var.domain = domain
+
+
+def _solve(solver, model):
+    # solve and load the plan, returns the objective or None when no plan was found
+    results = solver.solve(model)
+    if results.best_feasible_objective is None:
+        return None
+    results.solution_loader.load_vars()
+    return results.best_feasible_objective
+
+
+def _floor(value):
+    return math.floor(value + TOLERANCE)
+
+
+def _cumulative_sales(model, catalog, bought):
+    # LP sales of every vehicle up to the end of each of its held years, {v: {year: vehicles sold}}
+    through = defaultdict(dict)
+    for v in bought:
+        total = 0.0
+        for year in catalog.active_years(v):
+            if (v, year) in model.number_vehicles_sold:
+                total += model.number_vehicles_sold[v, year].value or 0.0
+            through[v][year] = total
+    return through
+
+
+def round_purchases(model, dataset, catalog):
+    """
+    This function rounds the LP purchases of a model down, then up where demand would go uncovered
+
+    parameters: model: ConcreteModel: sparse linear model holding an LP solution
+                dataset: FleetDataset: the loaded dataset
+                catalog: VehicleCatalog: catalog of the dataset
+
+    The fleet of a vehicle in a year is its rounded purchase less its LP sales before the
+    year, rounded down. Year by year, for every size and bucket Dx, the range of the vehicles
+    that can serve buckets Dx and above must cover their demand; while it does not, the
+    fractional purchase with the largest remainder among the vehicles serving the cell is
+    rounded up instead.
+
+    returns the rounded purchases {v: vehicles bought}
+    """
+    lp = {v: var.value or 0.0 for (v, _), var in model.number_vehicles_bought.items()}
+    rounded = {v: _floor(value) for v, value in lp.items()}
+    through = _cumulative_sales(model, catalog, lp)
+
+    def held(v, year):
+        return max(rounded[v] - _floor(through[v].get(year - 1, 0.0)), 0)
+
+    for y, year in enumerate(catalog.years):
+        for s, size in enumerate(dataset.sizes):
+            candidates = [v for v in catalog.by_size[size] if v in lp and year in through[v]]
+            for b in range(len(dataset.distances) - 1, -1, -1):
+                demand = dataset.demand[y, s, b:].sum()
+                serving = [v for v in candidates if dataset.vehicle_distance[dataset.vehicle_index[v]] >= b]
+                short = demand - sum(held(v, year) * catalog.vehicles[v].range for v in serving)
+                fractional = sorted(
+                    (v for v in serving if lp[v] - rounded[v] > TOLERANCE), key = lambda v: rounded[v] - lp[v]
+                )
+                for v in fractional:
+                    if short <= 0:
+                        break
+                    rounded[v] += 1
+                    short -= catalog.vehicles[v].range
+    return rounded
+
+
+def round_sales(model, catalog, bought):
+    """
+    This function rounds the LP sales of a model with the purchases fixed to integers
+
+    parameters: model: ConcreteModel: sparse linear model holding an LP solution
+                catalog: VehicleCatalog: catalog of the dataset
+                bought: dict: integer purchases {v: vehicles bought}
+
+    Cumulative sales are rounded down, so vehicles are kept a little longer rather than sold
+    early, and retiring vehicles are sold in full. Sales over 20% of a year's fleet are then
+    postponed to the next year, voluntary sales first, retirements can not be postponed.
+
+    returns the integer sales {(v, year): vehicles sold} and the years whose retirements
+    alone break the sell limit
+    """
+    through = _cumulative_sales(model, catalog, bought)
+    sold = {}
+    for v, number in bought.items():
+        for year in catalog.active_years(v):
+            previous = min(_floor(through[v].get(year - 1, 0.0)), number)
+            if catalog.retirement_year(v) == year:
+                sold[v, year] = number - previous
+            else:
+                sold[v, year] = min(_floor(through[v][year]), number) - previous
+
+    return sold, limit_sales(catalog, bought, sold)
+
+
+def limit_sales(catalog, bought, sold):
+    """
+    This function postpones sales over 20% of a year's fleet to the next year, in place
+
+    parameters: catalog: VehicleCatalog: catalog of the dataset
+                bought: dict: integer purchases {v: vehicles bought}
+                sold: dict: integer sales {(v, year): vehicles sold}, changed in place
+
+    Voluntary sales are postponed first, largest first; retirements can not be postponed and
+    a sale postponed past the horizon is dropped.
+
+    returns the years whose retirements alone break the sell limit
+    """
+    fleet = defaultdict(int)
+    broken = []
+    for year in catalog.years:
+        for v in catalog.by_model_year.get(year, []):
+            fleet[v] += bought.get(v, 0)
+        limit = math.floor(SELL_LIMIT * sum(fleet.values()) + TOLERANCE)
+        excess = sum(sold.get((v, year), 0) for v in fleet) - limit
+        voluntary = [v for v in fleet if sold.get((v, year), 0) and catalog.retirement_year(v) != year]
+        for v in sorted(voluntary, key = lambda v: -sold[v, year]):
+            if excess <= 0:
+                break
+            postponed = min(excess, sold[v, year])
+            sold[v, year] -= postponed
+            if year + 1 <= catalog.last_year:
+                sold[v, year + 1] = sold.get((v, year + 1), 0) + postponed
+            excess -= postponed
+        if excess > 0:
+            broken.append(year)
+        for v in list(fleet):
+            fleet[v] -= sold.get((v, year), 0)
+            if fleet[v] <= 0:
+                del fleet[v]
+    for key in [key for key, number in sold.items() if number <= 0]:
+        del sold[key]
+    return broken
+
+
+def _fleet(catalog, bought, sold):
+    # vehicles of every (vehicle, year) held during the year
+    fleet = {}
+    for v, number in bought.items():
+        for year in catalog.active_years(v):
+            fleet[v, year] = number
+            number -= sold.get((v, year), 0)
+    return fleet
+
+
+def share_cells(dataset, catalog, use, km, fleet):
+    """
+    This function rounds down the use of vehicles counted in more cells than the fleet holds, in place
+
+    parameters: dataset: FleetDataset: the loaded dataset
+                catalog: VehicleCatalog: catalog of the dataset
+                use: dict: integer use {(v, f, d, year): vehicles}, rounded up from the LP
+                km: dict: km driven {(v, f, d, year): km} within range of the use
+                fleet: dict: vehicles held {(v, year): vehicles}
+
+    Rounding up gives the other vehicles of a demand cell spare range. A cell of an over-used
+    vehicle, smallest LP remainder first, loses one vehicle when the km it then lacks fit in
+    the spare range of other vehicles or fuels serving the same cell, cheapest fuel cost first and
+    within what is left of the year's carbon limit.
+    """
+    cells = defaultdict(list)
+    for key in use:
+        v, _, d, year = key
+        cells[year, catalog.vehicles[v].size, d].append(key)
+
+    def per_km(key, values):
+        v, f, _, year = key
+        return dataset.consumption[dataset.vehicle_index[v], dataset.fuel_index[f]] * values[dataset.fuel_index[f], dataset.year_index[year]]
+
+    carbon = {year: float(limit) for year, limit in zip(catalog.years, dataset.carbon_limit)}
+    for key, distance in km.items():
+        carbon[key[-1]] -= distance * per_km(key, dataset.fuel_emissions)
+
+    used = defaultdict(list)
+    for key in use:
+        used[key[0], key[-1]].append(key)
+    for (v, year), keys in used.items():
+        excess = sum(use[key] for key in keys) - fleet.get((v, year), 0)
+        reach = catalog.vehicles[v].range
+        for key in sorted(keys, key = lambda key: km.get(key, 0.0) / reach - (use[key] - 1)):
+            if excess <= 0:
+                break
+            moved = km.get(key, 0.0) - reach * (use[key] - 1)
+            others = sorted(
+                (other for other in cells[year, catalog.vehicles[v].size, key[2]] if other != key),
+                key = lambda other: per_km(other, dataset.fuel_cost),
+            )
+            moves, left, emitted = [], moved, 0.0
+            for other in others:
+                room = use.get(other, 0) * catalog.vehicles[other[0]].range - km.get(other, 0.0)
+                if room <= TOLERANCE:
+                    continue
+                amount = min(room, left)
+                moves.append((other, amount))
+                emitted += amount * (per_km(other, dataset.fuel_emissions) - per_km(key, dataset.fuel_emissions))
+                left -= amount
+                if left <= TOLERANCE:
+                    break
+            if left > TOLERANCE or emitted > carbon[year]:
+                continue
+            for other, amount in moves:
+                km[other] = km.get(other, 0.0) + amount
+            km[key] -= moved
+            carbon[year] -= emitted
+            use[key] -= 1
+            excess -= 1
+            if use[key] == 0:
+                del use[key]
+                km.pop(key, None)
+
+
+def cover_use(model, dataset, catalog, bought, sold):
+    """
+    This function rounds the LP use of a model up and buys the vehicles that rounding lacks
+
+    parameters: model: ConcreteModel: sparse linear model holding an LP solution with integer purchases and sales
+                dataset: FleetDataset: the loaded dataset
+                catalog: VehicleCatalog: catalog of the dataset
+                bought: dict: integer purchases {v: vehicles bought}, changed in place
+                sold: dict: integer sales {(v, year): vehicles sold}, changed in place
+
+    Rounding every use up keeps the LP km within range, so demand and the carbon limits hold
+    as in the LP, but a vehicle the LP split across cells or fuels is then counted in each.
+    share_cells takes back what it can, and where the rounded use still exceeds the fleet,
+    the missing vehicles are bought in the model year and sold at the end of the last year
+    they are short, subject to the sell limit.
+
+    returns the integer use {(v, f, d, year): vehicles}, the km, the vehicles added and the
+    years whose retirements alone break the sell limit
+    """
+    use = {
+        index: math.ceil(var.value - TOLERANCE)
+        for index, var in model.number_vehicles_use.items() if var.value and var.value > TOLERANCE
+    }
+    km = {index: var.value for index, var in model.total_km.items() if var.value}
+    share_cells(dataset, catalog, use, km, _fleet(catalog, bought, sold))
+    needed = defaultdict(lambda: defaultdict(int))
+    for (v, _, _, year), number in use.items():
+        needed[year][v] += number
+
+    held = defaultdict(int)
+    extra = {}
+    added = 0
+    for year in catalog.years:
+        for v in catalog.by_model_year.get(year, []):
+            held[v] += bought.get(v, 0)
+        for v, number in needed[year].items():
+            missing = number - held[v]
+            if missing <= 0:
+                continue
+            kept = 0
+            if v in extra:
+                # keep the vehicles added for an earlier year rather than buy more
+                last, leaving = extra[v]
+                kept = min(leaving, missing)
+                sold[v, last] -= kept
+            bought[v] = bought.get(v, 0) + missing - kept
+            added += missing - kept
+            held[v] += missing
+            sold[v, year] = sold.get((v, year), 0) + missing
+            extra[v] = (year, missing)
+        for v in list(held):
+            held[v] -= sold.get((v, year), 0)
+    return use, km, added, limit_sales(catalog, bought, sold)
+
+
+def _fix(component, values):
+    for index, var in component.items():
+        var.fix(values.get(index, 0))
+
+
+def _unfix(model):
+    for name in INTEGERS:
+        for var in getattr(model, name).values():
+            var.unfix()
+
+
+def solve_relax_round(dataset, catalog = None, polish = True, time_limit = 60, mip_rel_gap = 1e-4):
+    """
+    This function builds an integer fleet plan by rounding the LP relaxation and repairing it
+
+    parameters: dataset: FleetDataset: the loaded dataset
+                catalog: VehicleCatalog: optional, built from the dataset when omitted
+                polish: bool: re-optimize use, fuels and km of the rounded fleet with a MIP
+                time_limit: float: seconds of the polishing MIP
+                mip_rel_gap: float: relative gap of the polishing MIP
+
+    1. the LP relaxation gives the lower bound and fractional purchases and sales
+    2. purchases are rounded with round_purchases and fixed, and the LP is solved again
+    3. its sales are rounded with round_sales, fixed, and the LP is solved again
+    4. its use is rounded up with cover_use, which gives an integer plan meeting demand and
+       the carbon limits with the km of the last LP
+    5. optionally, a MIP over use, fuels and km alone, a small problem once the fleet is
+       fixed, starts from that plan
+    When the rounded purchases leave the LP infeasible or retirements break the sell limit,
+    every fractional purchase is rounded up and the steps repeated. The greedy plan is the
+    last resort.
+
+    returns a dict with the plan's values and cost, the LP bound, the gap (cost - bound) / cost,
+    the method that produced the plan and the time of every step that ran
+    """
+    catalog = catalog or VehicleCatalog(dataset)
+    log = {}
+    started = time.perf_counter()
+
+    def step(name):
+        log[name] = time.perf_counter() - started - sum(log.values())
+
+    model = build_model(dataset, catalog, linear = True, sparse = True)
+    step("build")
+    # the LP solves run to optimality, the time limit and gap only apply to the polishing MIP
+    solver = _highs()
+
+    set_relaxed(model, True)
+    bound = _solve(solver, model)
+    if bound is None:
+        raise RuntimeError("the LP relaxation has no solution")
+    lp_values = model_values(model)
+    step("lp")
+
+    demand_aware = round_purchases(model, dataset, catalog)
+    step("round purchases")
+    lp_bought = {v: value for (v, _), value in lp_values["number_vehicles_bought"].items()}
+    attempts = [
+        ("demand-aware rounding", demand_aware),
+        ("rounding up", {v: max(number, math.ceil(lp_bought.get(v, 0.0) - TOLERANCE)) for v, number in demand_aware.items()}),
+    ]
+
+    cost, method = None, None
+    for name, bought in attempts:
+        bought = dict(bought)
+        load_values(model, lp_values)
+        set_relaxed(model, True)
+        _fix(model.number_vehicles_bought, {(v, catalog.model_year(v)): number for v, number in bought.items()})
+        if _solve(solver, model) is None:
+            _unfix(model)
+            step(f"{name} failed")
+            continue
+        sold, broken = round_sales(model, catalog, bought)
+        use = None
+        if not broken:
+            _fix(model.number_vehicles_sold, sold)
+            if _solve(solver, model) is not None:
+                use, km, added, broken = cover_use(model, dataset, catalog, bought, sold)
+        _unfix(model)
+        if broken or use is None:
+            step(f"{name} failed")
+            continue
+
+        # the rounded plan: integer purchases, sales and use, and the km of the last LP
+        load_values(model, {
+            "number_vehicles_bought": {(v, catalog.model_year(v)): number for v, number in bought.items() if number},
+            "number_vehicles_sold": sold,
+            "number_vehicles_use": use,
+            "total_km": km,
+        })
+        cost, values, method = pe.value(model.total_cost), model_values(model), f"{name}, {added} vehicles added to round the use"
+        step("rounded plan")
+
+        # the fleet stays fixed, a MIP over use, fuels and km alone starts from the rounded plan
+        if polish:
+            set_relaxed(model, False)
+            _fix(model.number_vehicles_bought, values["number_vehicles_bought"])
+            _fix(model.number_vehicles_sold, sold)
+            solver.config.warmstart = True
+            solver.config.time_limit = time_limit
+            solver.config.mip_gap = mip_rel_gap
+            polished = _solve(solver, model)
+            _unfix(model)
+            if polished is not None and polished < cost:
+                cost, values, method = polished, model_values(model), method + ", dispatch re-optimized"
+            step("polish")
+        break
+
+    if cost is None:
+        greedy = build_model(dataset, catalog, linear = True, sparse = True)
+        loaded, _ = warm_start_from_submission(greedy, GreedyPlanner(dataset, catalog).plan(), catalog)
+        if not loaded:
+            raise RuntimeError("no rounding succeeded and the greedy plan could not be repaired")
+        values, cost, method = model_values(greedy), pe.value(greedy.total_cost), "greedy fallback"
+        step("greedy fallback")
+    set_relaxed(model, False)
+
+    record_solve(
+        dataset.content_hash(), {"solver": "relax_round", "polish": polish, "time_limit": time_limit, "mip_rel_gap": mip_rel_gap},
+        values, float(cost), float(bound), method, solve_s = sum(log.values()),
+    )
+    return {
+        "values": values,
+        "cost": float(cost),
+        "bound": float(bound),
+        "gap": float((cost - bound) / abs(cost)),
+        "method": method,
+        "seconds": log,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "integer fleet plan from the rounded LP relaxation, with the LP bound as its gap")
+    parser.add_argument("--data", default = "dataset", help = "dataset directory")
+    parser.add_argument("--output", default = "submission.csv", help = "submission csv to write")
+    parser.add_argument("--time-limit", type = float, default = 60, help = "seconds of the polishing MIP")
+    parser.add_argument("--no-polish", action = "store_true", help = "keep the rounded plan without the polishing MIP")
+    add_store_arguments(parser)
+    args = parser.parse_args()
+
+    record_from_args(args)
+
+    dataset = FleetDataset.load(args.data)
+    catalog = VehicleCatalog(dataset)
+    solution = solve_relax_round(dataset, catalog, not args.no_polish, args.time_limit)
+    print(f"{solution['method']}: cost {solution['cost']:,.2f} LP bound {solution['bound']:,.2f} gap {solution['gap']:.2%}")
+    print(" ".join(f"{name} {seconds:.1f}s" for name, seconds in solution["seconds"].items()))
+    model = build_model(dataset, catalog, linear = True, sparse = True)
+    load_values(model, solution["values"])
+    create_submission(model, args.output)
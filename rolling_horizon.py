@@ -0,0 +1,159 @@
+"""
+Rolling-horizon solver: optimize a sliding window of years, commit the decisions of
+its first years, carry the fleet forward and repeat until the end of the horizon.
+"""
+import argparse
+import time
+
+import pyomo.environ as pe
+import pyomo.opt as po
+
+from catalog import VehicleCatalog
+from fleet_data import FleetDataset
+from fleet_model import build_model, fill_fleet_stock
+from submission import create_submission
+
+
+# decision variables of the linear model, all indexed with the year last
+DECISIONS = ["number_vehicles_bought", "number_vehicles_use", "number_vehicles_sold", "total_km"]
+
+
+def model_values(model, years = None):
+    """
+    This function reads the nonzero decision values of a model, the inverse of load_values
+
+    parameters: model: ConcreteModel: a linear model from fleet_model.build_model
+                years: collection of int: optional, only keep the values of these years, all by default
+
+    returns component name -> {index: value}
+    """
+    values = {}
+    for name in DECISIONS:
+        values[name] = {
+            index: var.value
+            for index, var in getattr(model, name).items()
+            if var.value and (years is None or index[-1] in years)
+        }
+    return values
+
+
+def load_values(model, values):
+    """
+    This function writes decision values into a model, every other decision variable is set to 0
+
+    parameters: model: ConcreteModel: a linear model from fleet_model.build_model
+                values: dict: component name -> {index: value}
+    """
+    for name in DECISIONS:
+        component = getattr(model, name)
+        given = values.get(name, {})
+        for index, var in component.items():
+            var.set_value(given.get(index, 0), skip_validation = True)
+    if model.find_component("fleet_stock") is not None:
+        fill_fleet_stock(model)
+
+
+def plan_objective(dataset, catalog, values):
+    """
+    This function evaluates the full-horizon objective of a plan and returns it with the loaded model
+    """
+    model = build_model(dataset, catalog, linear = True)
+    load_values(model, values)
+    return pe.value(model.total_cost), model
+
+
+def solve_rolling_horizon(dataset, window = 5, commit = 1, solver = "appsi_highs", time_limit = None, catalog = None, tee = False):
+    """
+    This function solves the planning years window by window
+
+    parameters: dataset: FleetDataset: the loaded dataset
+                window: int: years optimized together
+                commit: int: leading years of each window whose decisions are fixed before moving on
+                solver: str: Pyomo solver name, warm started when the solver supports it
+                time_limit: float: optional, seconds per window
+                catalog: VehicleCatalog: optional, built from the dataset when omitted
+                tee: bool: stream the solver log
+
+    Each window model only holds its own years: vehicles bought earlier enter through
+    initial_fleet, and the previous window's solution is passed as a MIP start.
+
+    returns the submission DataFrame, its full-horizon objective and one log record per window
+    """
+    if not 1 <= commit <= window:
+        raise ValueError("commit must be between 1 and window")
+    catalog = catalog or VehicleCatalog(dataset)
+    years = catalog.years
+    opt = po.SolverFactory(solver)
+    warmstart = opt.warm_start_capable()
+
+    committed = {name: {} for name in DECISIONS}
+    initial_fleet = {}
+    previous = None
+    log = []
+    start = 0
+    while start < len(years):
+        window_years = years[start: start + window]
+        last_window = start + window >= len(years)
+        commit_years = set(window_years if last_window else window_years[:commit])
+
+        started = time.perf_counter()
+        model = build_model(dataset, catalog, linear = True, years = window_years, initial_fleet = initial_fleet)
+        built = time.perf_counter()
+        if warmstart and previous is not None:
+            load_values(model, previous)
+        kwargs = {"tee": tee, "load_solutions": False}
+        if warmstart:
+            kwargs["warmstart"] = True
+        if time_limit is not None:
+            kwargs["timelimit"] = time_limit
+        result = opt.solve(model, **kwargs)
+        solved = time.perf_counter()
+        if len(result.solution) == 0:
+            raise RuntimeError(
+                f"no feasible plan for {window_years[0]}-{window_years[-1]} "
+                f"({result.solver.termination_condition}), try a longer time limit or a shorter window"
+            )
+        model.solutions.load_from(result)
+
+        log.append({
+            "years": (window_years[0], window_years[-1]),
+            "termination": str(result.solver.termination_condition),
+            "objective": pe.value(model.total_cost),
+            "build_s": built - started,
+            "solve_s": solved - built,
+        })
+
+        # commit the leading years and carry the fleet forward
+        previous = model_values(model)
+        done = model_values(model, commit_years)
+        for name in DECISIONS:
+            committed[name].update({k: round(v) if name != "total_km" else v for k, v in done[name].items()})
+        for (v, year), number in done["number_vehicles_bought"].items():
+            initial_fleet[v] = initial_fleet.get(v, 0) + round(number)
+        for (v, year), number in done["number_vehicles_sold"].items():
+            initial_fleet[v] = initial_fleet.get(v, 0) - round(number)
+        initial_fleet = {v: number for v, number in initial_fleet.items() if number > 0}
+
+        start += len(commit_years)
+
+    objective, model = plan_objective(dataset, catalog, committed)
+    return create_submission(model), objective, log
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "solve the fleet model with a rolling horizon")
+    parser.add_argument("--data", default = "dataset", help = "dataset directory")
+    parser.add_argument("--output", default = "submission.csv", help = "submission csv to write")
+    parser.add_argument("--window", type = int, default = 5, help = "years per window")
+    parser.add_argument("--commit", type = int, default = 1, help = "years committed per window")
+    parser.add_argument("--solver", default = "appsi_highs", help = "Pyomo solver name")
+    parser.add_argument("--time-limit", type = float, default = None, help = "seconds per window")
+    args = parser.parse_args()
+
+    submission, objective, log = solve_rolling_horizon(
+        FleetDataset.load(args.data), args.window, args.commit, args.solver, args.time_limit
+    )
+    for record in log:
+        print(record)
+    print("objective", objective)
+    submission.to_csv(args.output, index = False)
@@ -0,0 +1,229 @@
+"""
+Submission scorer: replays a submission csv against the dataset with array group-bys and
+reports its cost, its yearly emissions and every rule it breaks, without building a model.
+"""
+import argparse
+import time
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from catalog import LIFETIME, SELL_LIMIT
+from fleet_data import FleetDataset
+from submission import read_submission
+
+
+Score = namedtuple("Score", ["total_cost", "costs", "yearly", "violations"])
+
+VIOLATION_COLUMNS = ["Year", "ID", "Rule", "Detail"]
+
+# relative slack on km and emission checks, csv distances carry rounding noise
+TOLERANCE = 1e-6
+
+
+def _violations(mask, years, ids, rule, details):
+    # violation rows where mask holds, details is an array of strings aligned with the mask
+    return pd.DataFrame({
+        "Year": np.asarray(years)[mask],
+        "ID": np.asarray(ids, dtype = object)[mask],
+        "Rule": rule,
+        "Detail": np.asarray(details, dtype = object)[mask],
+    })
+
+
+def score_frame(frame, dataset):
+    """
+    This function scores submission rows against a dataset
+
+    parameters: frame: DataFrame: rows from submission.read_submission
+                dataset: FleetDataset: the dataset the plan is scored against
+
+    Vehicles held during a year are those bought up to it minus those sold in earlier years;
+    they pay insurance and maintenance at their age, sales earn the resale value at the age
+    of sale, and use rows pay their fuel.
+
+    returns a Score: total cost, cost by component, a per-year frame (cost, emissions,
+    carbon limit, vehicles held and sold) and a frame of rule violations
+    """
+    n_vehicles, n_years = len(dataset.vehicle_ids), len(dataset.years)
+    years = dataset.years
+    found = []
+
+    vehicle = pd.Index(dataset.vehicle_ids).get_indexer(frame["ID"])
+    year = pd.Index(years).get_indexer(frame["Year"])
+    known = (vehicle >= 0) & (year >= 0)
+    found.append(_violations(
+        ~known, frame["Year"], frame["ID"], "unknown vehicle or year", np.full(len(frame), "row ignored"),
+    ))
+    frame, vehicle, year = frame[known], vehicle[known], year[known]
+    number = frame["Num_Vehicles"].to_numpy(dtype = float)
+    kind = frame["Type"].to_numpy()
+    ids = frame["ID"].to_numpy(dtype = object)
+    row_year = years[year]
+
+    # buy and sell per vehicle x year
+    buy, sell = np.zeros((n_vehicles, n_years)), np.zeros((n_vehicles, n_years))
+    is_buy, is_sell, is_use = kind == "Buy", kind == "Sell", kind == "Use"
+    np.add.at(buy, (vehicle[is_buy], year[is_buy]), number[is_buy])
+    np.add.at(sell, (vehicle[is_sell], year[is_sell]), number[is_sell])
+
+    wrong_year = is_buy & (row_year != dataset.vehicle_year[vehicle])
+    found.append(_violations(
+        wrong_year, row_year, ids, "wrong model year",
+        np.char.add("model year ", dataset.vehicle_year[vehicle].astype(str)),
+    ))
+
+    # fleet held during each year and its age
+    bought_to_date = np.cumsum(buy, axis = 1)
+    sold_before = np.cumsum(sell, axis = 1) - sell
+    fleet = bought_to_date - sold_before
+    age = years[None, :] - dataset.vehicle_year[:, None] + 1
+
+    all_ids = np.repeat(np.array(dataset.vehicle_ids, dtype = object)[:, None], n_years, axis = 1)
+    all_years = np.broadcast_to(years, fleet.shape)
+    held_str = fleet.astype(int).astype(str)
+
+    over_sold = np.cumsum(sell, axis = 1) > bought_to_date
+    found.append(_violations(
+        over_sold, all_years, all_ids, "sold more than held",
+        np.char.add("sold to date ", np.cumsum(sell, axis = 1).astype(int).astype(str)),
+    ))
+    # every vehicle must be sold by the end of its 10th year
+    kept = fleet - sell
+    too_old = (kept > 0) & (age >= LIFETIME)
+    found.append(_violations(
+        too_old, all_years, all_ids, "age over 10",
+        np.char.add(kept.astype(int).astype(str), " still held after the 10th year"),
+    ))
+
+    # vehicles in use per vehicle x year
+    in_use = np.zeros((n_vehicles, n_years))
+    np.add.at(in_use, (vehicle[is_use], year[is_use]), number[is_use])
+    over_used = in_use > fleet
+    found.append(_violations(
+        over_used, all_years, all_ids, "used more than held",
+        np.char.add(np.char.add("used ", in_use.astype(int).astype(str)), np.char.add(" of ", held_str)),
+    ))
+
+    # at most 20% of the fleet sold each year
+    yearly_fleet, yearly_sold = fleet.sum(axis = 0), sell.sum(axis = 0)
+    over_limit = yearly_sold > SELL_LIMIT * yearly_fleet + TOLERANCE
+    found.append(_violations(
+        over_limit, years, np.full(n_years, None), "more than 20% sold",
+        np.char.add(np.char.add("sold ", yearly_sold.astype(int).astype(str)), np.char.add(" of ", yearly_fleet.astype(int).astype(str))),
+    ))
+
+    # use rows: fuel, bucket and range
+    use = frame[is_use]
+    use_vehicle, use_year, use_number = vehicle[is_use], year[is_use], number[is_use]
+    fuel = pd.Index(dataset.fuels).get_indexer(use["Fuel"])
+    bucket = pd.Index(dataset.distances).get_indexer(use["Distance_bucket"])
+    distance = use["Distance_per_vehicle(km)"].to_numpy(dtype = float)
+    use_ids, use_years = ids[is_use], row_year[is_use]
+
+    valid_fuel = fuel >= 0
+    valid_fuel[valid_fuel] = dataset.compatible[use_vehicle[valid_fuel], fuel[valid_fuel]]
+    found.append(_violations(~valid_fuel, use_years, use_ids, "incompatible fuel", use["Fuel"].astype(str).to_numpy()))
+    valid_bucket = (bucket >= 0) & (bucket <= dataset.vehicle_distance[use_vehicle])
+    found.append(_violations(
+        ~valid_bucket, use_years, use_ids, "bucket above vehicle distance", use["Distance_bucket"].astype(str).to_numpy(),
+    ))
+    vehicle_range = dataset.vehicle_range[use_vehicle]
+    over_range = distance > vehicle_range * (1 + TOLERANCE)
+    found.append(_violations(
+        over_range, use_years, use_ids, "distance above yearly range",
+        np.char.add(np.char.add(distance.round(1).astype(str), " > "), vehicle_range.astype(str)),
+    ))
+
+    # km, fuel and emissions of the use rows that can be priced
+    priced = valid_fuel
+    km = use_number * distance
+    consumption = np.where(priced, dataset.consumption[use_vehicle, np.where(priced, fuel, 0)], 0.0)
+    fuel_units = km * consumption
+    row_fuel = np.where(priced, fuel, 0)
+    fuel_cost = fuel_units * dataset.fuel_cost[row_fuel, use_year]
+    emissions = fuel_units * dataset.fuel_emissions[row_fuel, use_year]
+
+    # demand met per (year, size, distance) cell, counting only rows in a bucket the vehicle serves
+    served = np.zeros(dataset.demand.shape)
+    counted = valid_bucket & priced
+    np.add.at(
+        served,
+        (use_year[counted], dataset.vehicle_size[use_vehicle[counted]], bucket[counted]),
+        km[counted],
+    )
+    short = served < dataset.demand * (1 - TOLERANCE)
+    y, s, d = short.nonzero()
+    found.append(pd.DataFrame({
+        "Year": years[y],
+        "ID": None,
+        "Rule": "unmet demand",
+        "Detail": [
+            f"{dataset.sizes[i]} {dataset.distances[j]}: {served[k, i, j]:.0f} of {dataset.demand[k, i, j]:.0f} km"
+            for k, i, j in zip(y, s, d)
+        ],
+    }))
+
+    yearly_emissions = np.bincount(use_year, weights = emissions, minlength = n_years)
+    over_carbon = yearly_emissions > dataset.carbon_limit * (1 + TOLERANCE)
+    found.append(_violations(
+        over_carbon, years, np.full(n_years, None), "carbon emissions above limit",
+        np.char.add(np.char.add(yearly_emissions.round().astype(str), " > "), dataset.carbon_limit.astype(str)),
+    ))
+
+    # costs, profiles are indexed by age 1..10 and ages past 10 are charged at the last one
+    profile = np.clip(age, 1, LIFETIME) - 1
+    price = dataset.vehicle_cost[:, None]
+    held = np.where(fleet > 0, fleet, 0.0) * (age >= 1)
+    yearly = pd.DataFrame({
+        "Year": years,
+        "buy": (buy * price).sum(axis = 0),
+        "insurance": (held * price * dataset.insurance_cost[profile]).sum(axis = 0),
+        "maintenance": (held * price * dataset.maintenance_cost[profile]).sum(axis = 0),
+        "resale": -(sell * price * dataset.resale_value[profile]).sum(axis = 0),
+        "fuel": np.bincount(use_year, weights = fuel_cost, minlength = n_years),
+    })
+    components = ["buy", "insurance", "maintenance", "resale", "fuel"]
+    yearly["cost"] = yearly[components].sum(axis = 1)
+    yearly["emissions"] = yearly_emissions
+    yearly["carbon_limit"] = dataset.carbon_limit
+    yearly["vehicles"] = yearly_fleet
+    yearly["sold"] = yearly_sold
+
+    costs = {component: float(yearly[component].sum()) for component in components}
+    violations = pd.concat([v for v in found if len(v)] or [pd.DataFrame(columns = VIOLATION_COLUMNS)], ignore_index = True)
+    violations = violations.sort_values("Year", kind = "stable").reset_index(drop = True)
+    return Score(float(yearly["cost"].sum()), costs, yearly, violations)
+
+
+def score_submission(path, dataset = None):
+    """
+    This function scores a submission csv
+
+    parameters: path: str: submission csv
+                dataset: FleetDataset: optional, loaded from the dataset directory when omitted
+    """
+    dataset = dataset or FleetDataset.load()
+    return score_frame(read_submission(path), dataset)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "score a submission and list the rules it breaks")
+    parser.add_argument("submission", help = "submission csv")
+    parser.add_argument("--data", default = "dataset", help = "dataset directory")
+    args = parser.parse_args()
+
+    dataset = FleetDataset.load(args.data)
+    start = time.perf_counter()
+    score = score_submission(args.submission, dataset)
+    elapsed = time.perf_counter() - start
+
+    print(score.yearly.to_string(index = False))
+    print()
+    for component, cost in score.costs.items():
+        print(f"{component:>12} {cost:16,.0f}")
+    print(f"{'total':>12} {score.total_cost:16,.0f}")
+    print(f"{len(score.violations)} violations, scored in {elapsed * 1000:.1f} ms")
+    if len(score.violations):
+        print(score.violations.to_string(index = False))
@@ -0,0 +1,330 @@
+"""
+SQLite store of solved plans: every solve is recorded with the hash of its inputs, its
+solver settings, objective, bound, timings and the full plan, so a repeated request is
+answered from the store instead of the solver.
+
+Once record_to has set the store of a process, solvers.solve, FleetOptimizer.solve and the
+relax-and-round and Lagrangian solvers record each plan they find through record_solve, and
+the worker pools started afterwards record into the same file. The inputs are hashed with
+FleetDataset.content_hash, so a plan solved on an edited dataset is filed under the edit.
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import sqlite3
+import time
+
+import pandas as pd
+
+from fleet_data import FleetDataset
+from model_cache import ModelCache, solve_cached
+from submission import create_submission, submission_from_values
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS solves (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    input_hash TEXT NOT NULL,
+    settings_hash TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    status TEXT,
+    objective REAL,
+    bound REAL,
+    gap REAL,
+    build_s REAL,
+    solve_s REAL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    plan_bytes INTEGER NOT NULL,
+    plan BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS solves_request ON solves (input_hash, settings_hash, created);
+CREATE INDEX IF NOT EXISTS solves_quality ON solves (input_hash, gap, objective);
+CREATE INDEX IF NOT EXISTS solves_last_used ON solves (last_used);
+"""
+
+# metadata columns returned by the query helpers, the plan itself is read by plan()
+COLUMNS = ["id", "input_hash", "settings", "status", "objective", "bound", "gap", "build_s", "solve_s", "created", "last_used", "plan_bytes"]
+
+
+def settings_hash(settings):
+    """
+    This function hashes solver settings, key order does not matter
+    """
+    return hashlib.sha256(json.dumps(settings, sort_keys = True, default = str).encode()).hexdigest()
+
+
+def relative_gap(objective, bound):
+    """
+    This function returns the relative gap of an objective to its bound, None when either is unknown
+    """
+    if objective is None or bound is None:
+        return None
+    return abs(objective - bound) / max(abs(objective), 1e-9)
+
+
+class SolutionStore:
+    """
+    This class records solves in a SQLite file and answers repeated requests from it
+
+    parameters: path: str: SQLite file, created when missing
+                max_bytes: int: file size the least recently used solves are evicted down to
+
+    Plans are stored as gzipped submission csv; a lookup or a query that returns a solve
+    counts as a use for the eviction order.
+    """
+
+    def __init__(self, path = "solutions.sqlite", max_bytes = 256 << 20):
+        self.path = path
+        self.max_bytes = max_bytes
+        # the workers of a pool record into the same file, a writer waits for the others
+        self.connection = sqlite3.connect(path, timeout = 60)
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def record(self, input_key, settings, plan, objective = None, bound = None, status = None, build_s = None, solve_s = None):
+        """
+        This function stores a solve and returns its id
+
+        parameters: input_key: str: hash of the inputs, e.g. model_cache.input_hash
+                    settings: dict: solver settings of the solve
+                    plan: DataFrame: the submission
+                    objective, bound: float: objective and dual bound of the solve
+                    status: str: solver status
+                    build_s, solve_s: float: timings in seconds
+        """
+        buffer = io.BytesIO()
+        with gzip.GzipFile(fileobj = buffer, mode = "wb") as file:
+            file.write(plan.to_csv(index = False).encode())
+        blob = buffer.getvalue()
+        now = time.time()
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO solves (input_hash, settings_hash, settings, status, objective, bound, gap, build_s, solve_s,"
+                " created, last_used, plan_bytes, plan) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (input_key, settings_hash(settings), json.dumps(settings, sort_keys = True, default = str), status,
+                 objective, bound, relative_gap(objective, bound), build_s, solve_s, now, now, len(blob), blob),
+            )
+        self.evict()
+        return cursor.lastrowid
+
+    def _rows(self, where, parameters, order, limit = None):
+        # metadata rows matching a query, marked as used
+        query = f"SELECT {', '.join(COLUMNS)} FROM solves WHERE {where} ORDER BY {order}"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        rows = pd.DataFrame(self.connection.execute(query, parameters).fetchall(), columns = COLUMNS)
+        if len(rows):
+            with self.connection:
+                self.connection.executemany(
+                    "UPDATE solves SET last_used = ? WHERE id = ?", [(time.time(), int(i)) for i in rows["id"]]
+                )
+        return rows
+
+    def lookup(self, input_key, settings):
+        """
+        This function returns the latest solve of the same inputs and settings as a metadata dict, None when there is none
+        """
+        rows = self._rows("input_hash = ? AND settings_hash = ?", (input_key, settings_hash(settings)), "created DESC", 1)
+        return rows.iloc[0].to_dict() if len(rows) else None
+
+    def best(self, input_key, max_gap = None):
+        """
+        This function returns the cheapest stored solve of the inputs, optionally among those with gap <= max_gap
+
+        For example best(key, 0.01) is the best plan for this dataset hash under gap <= 1%.
+        """
+        where, parameters = "input_hash = ? AND objective IS NOT NULL", [input_key]
+        if max_gap is not None:
+            where += " AND gap <= ?"
+            parameters.append(max_gap)
+        rows = self._rows(where, parameters, "objective ASC", 1)
+        return rows.iloc[0].to_dict() if len(rows) else None
+
+    def history(self, input_key = None):
+        """
+        This function returns the metadata of every stored solve, of one input hash when given, the newest first
+        """
+        if input_key is None:
+            return pd.read_sql_query(f"SELECT {', '.join(COLUMNS)} FROM solves ORDER BY created DESC", self.connection)
+        return pd.read_sql_query(
+            f"SELECT {', '.join(COLUMNS)} FROM solves WHERE input_hash = ? ORDER BY created DESC", self.connection, params = (input_key,)
+        )
+
+    def plan(self, solve_id):
+        """
+        This function returns the stored submission of a solve
+        """
+        row = self.connection.execute("SELECT plan FROM solves WHERE id = ?", (int(solve_id),)).fetchone()
+        if row is None:
+            raise KeyError(f"no stored solve {solve_id}")
+        return pd.read_csv(io.BytesIO(gzip.decompress(row[0])))
+
+    def size(self):
+        page_count = self.connection.execute("PRAGMA page_count").fetchone()[0]
+        page_size = self.connection.execute("PRAGMA page_size").fetchone()[0]
+        return page_count * page_size
+
+    def evict(self):
+        """
+        This function deletes the least recently used solves until the file fits in max_bytes, the newest solve is always kept
+        """
+        if self.size() <= self.max_bytes:
+            return
+        rows = self.connection.execute("SELECT id, plan_bytes FROM solves ORDER BY last_used ASC").fetchall()
+        excess = self.size() - self.max_bytes
+        doomed = []
+        for solve_id, plan_bytes in rows[:-1]:
+            if excess <= 0:
+                break
+            doomed.append((solve_id,))
+            excess -= plan_bytes
+        with self.connection:
+            self.connection.executemany("DELETE FROM solves WHERE id = ?", doomed)
+        self.connection.execute("VACUUM")
+
+
+# store the solves of this process are recorded into, see record_to
+_recording = None
+
+
+def record_to(store):
+    """
+    This function sets the store every solve of this process is recorded into, None stops recording
+
+    returns the store solves were recorded into before
+    """
+    global _recording
+    previous, _recording = _recording, store
+    return previous
+
+
+def recording():
+    """
+    This function returns the store solves are recorded into, None when they are not recorded
+    """
+    return _recording
+
+
+def model_key(model, dataset = None):
+    """
+    This function returns the input hash a solved fleet model's plan is recorded under
+
+    parameters: model: ConcreteModel: a model from fleet_model.build_model
+                dataset: FleetDataset: optional, hashed instead of the dataset the model was
+                         built from, for models whose Params were edited since
+
+    returns None when the model does not minimize total_cost over the whole horizon and
+    fleet, its plan then solves another problem than the dataset's
+    """
+    objective = model.find_component("total_cost")
+    if objective is None or not objective.active or getattr(model, "input_key", None) is None:
+        return None
+    return dataset.content_hash() if dataset is not None else model.input_key
+
+
+def record_solve(input_key, settings, plan, objective = None, bound = None, status = None, build_s = None, solve_s = None):
+    """
+    This function records a solve into the store set by record_to
+
+    parameters: input_key: str: hash of the inputs, e.g. model_key or FleetDataset.content_hash
+                settings: dict: solver settings of the solve, with the solver or method under "solver"
+                plan: solved model, decision values (component name -> {index: value}) or submission DataFrame,
+                      turned into a submission only when the solve is recorded
+                objective, bound, status, build_s, solve_s: as in SolutionStore.record
+
+    Nothing is recorded when no store is set or input_key is None.
+
+    returns the id of the stored solve, or None
+    """
+    if _recording is None or input_key is None:
+        return None
+    if isinstance(plan, dict):
+        plan = submission_from_values(plan)
+    elif not isinstance(plan, pd.DataFrame):
+        plan = create_submission(plan)
+    return _recording.record(input_key, settings, plan, objective, bound, status, build_s, solve_s)
+
+
+def record_from_args(args):
+    """
+    This function opens the store of arguments parsed with solvers.add_store_arguments and records into it
+
+    returns the store, None when --no-store was given
+    """
+    if args.no_store:
+        return None
+    store = SolutionStore(args.store)
+    record_to(store)
+    return store
+
+
+def solve_with_store(store, data_dir = "dataset", cache = None, time_limit = None, mip_rel_gap = None, threads = None, refresh = False):
+    """
+    This function answers a solve request from the store, solving and recording it on a miss
+
+    parameters: store: SolutionStore: the store
+                data_dir: str: dataset directory, its content hash is the input hash
+                cache: ModelCache: optional, model cache the linear model is built through
+                time_limit, mip_rel_gap, threads: solver settings, part of the request
+                refresh: bool: solve again even when the request is stored
+
+    returns the submission DataFrame and the metadata of the stored solve
+    """
+    settings = {"solver": "highs", "model": "linear", "time_limit": time_limit, "mip_rel_gap": mip_rel_gap, "threads": threads}
+    input_key = FleetDataset.load(data_dir).content_hash()
+    if not refresh:
+        stored = store.lookup(input_key, settings)
+        if stored is not None:
+            return store.plan(stored["id"]), stored
+
+    cache = cache or ModelCache()
+    started = time.perf_counter()
+    entry = cache.load_or_build(data_dir = data_dir, linear = True)
+    built = time.perf_counter()
+    solution = solve_cached(entry, time_limit, mip_rel_gap, threads)
+    solved = time.perf_counter()
+    plan = submission_from_values(solution.values)
+    store.record(
+        input_key, settings, plan, solution.objective, solution.bound, solution.status, built - started, solved - built,
+    )
+    return plan, store.lookup(input_key, settings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "solve through the solution store, or query it")
+    parser.add_argument("command", choices = ["solve", "best", "history"], help = "solve a request, show the best plan, or list solves")
+    parser.add_argument("--data", default = "dataset", help = "dataset directory")
+    parser.add_argument("--store", default = "solutions.sqlite", help = "SQLite file")
+    parser.add_argument("--max-mb", type = float, default = 256, help = "store size the least recently used solves are evicted down to")
+    parser.add_argument("--time-limit", type = float, default = None, help = "seconds")
+    parser.add_argument("--mip-rel-gap", type = float, default = None, help = "relative gap")
+    parser.add_argument("--threads", type = int, default = None, help = "HiGHS threads")
+    parser.add_argument("--max-gap", type = float, default = None, help = "best: only plans with gap at most this")
+    parser.add_argument("--refresh", action = "store_true", help = "solve: ignore a stored answer")
+    parser.add_argument("--output", default = None, help = "submission csv to write")
+    args = parser.parse_args()
+
+    store = SolutionStore(args.store, int(args.max_mb * (1 << 20)))
+    if args.command == "history":
+        print(store.history(FleetDataset.load(args.data).content_hash()).to_string(index = False))
+    else:
+        started = time.perf_counter()
+        if args.command == "solve":
+            plan, metadata = solve_with_store(
+                store, args.data, None, args.time_limit, args.mip_rel_gap, args.threads, args.refresh,
+            )
+        else:
+            metadata = store.best(FleetDataset.load(args.data).content_hash(), args.max_gap)
+            if metadata is None:
+                raise SystemExit("no stored plan matches")
+            plan = store.plan(metadata["id"])
+        print(metadata)
+        print(f"answered in {time.perf_counter() - started:.2f} s")
+        if args.output:
+            plan.to_csv(args.output, index = False)
+    store.close()
@@ -0,0 +1,289 @@
+"""
+Solver backends: pick an installed solver for a model, check that it handles the model's
+class (LP, MILP, NLP, MINLP) and translate one set of settings, time limit, relative and
+absolute gap, threads and presolve, into the option names of each backend.
+
+Pyomo is only imported by the functions that need it, so the CLI options and settings
+can be set up without paying for its import.
+"""
+import argparse
+import json
+import math
+import time
+from collections import namedtuple
+
+
+SolverSettings = namedtuple(
+    "SolverSettings", ["time_limit", "mip_rel_gap", "mip_abs_gap", "threads", "presolve"], defaults = (None,) * 5
+)
+
+# names: Pyomo solver names tried in order, classes: model classes the backend solves,
+# options: backend option of each setting (None where the backend has none), presolve: the
+# option values of presolve "on" and "off"
+Backend = namedtuple("Backend", ["names", "classes", "options", "presolve"])
+
+BACKENDS = {
+    "highs": Backend(
+        ["appsi_highs", "highs"], {"LP", "MILP"},
+        {"time_limit": "time_limit", "mip_rel_gap": "mip_rel_gap", "mip_abs_gap": "mip_abs_gap", "threads": "threads", "presolve": "presolve"},
+        {"on": "on", "off": "off"},
+    ),
+    "cbc": Backend(
+        ["cbc"], {"LP", "MILP"},
+        {"time_limit": "sec", "mip_rel_gap": "ratioGap", "mip_abs_gap": "allowableGap", "threads": "threads", "presolve": "presolve"},
+        {"on": "on", "off": "off"},
+    ),
+    "glpk": Backend(
+        ["glpk"], {"LP", "MILP"},
+        # glpsol takes presolve as a flag, --presol or --nopresol
+        {"time_limit": "tmlim", "mip_rel_gap": "mipgap", "mip_abs_gap": None, "threads": None, "presolve": None},
+        {"on": ("presol", ""), "off": ("nopresol", "")},
+    ),
+    "scip": Backend(
+        ["scip"], {"LP", "MILP", "NLP", "MINLP"},
+        {"time_limit": "limits/time", "mip_rel_gap": "limits/gap", "mip_abs_gap": "limits/absgap", "threads": "lp/threads", "presolve": "presolving/maxrounds"},
+        {"on": -1, "off": 0},
+    ),
+    "ipopt": Backend(
+        ["ipopt"], {"LP", "NLP"},
+        {"time_limit": "max_wall_time", "mip_rel_gap": None, "mip_abs_gap": None, "threads": None, "presolve": None},
+        {},
+    ),
+}
+
+# order in which select_backend tries the backends
+PREFERENCE = ["highs", "cbc", "scip", "glpk", "ipopt"]
+
+PRESOLVE = ["on", "off", "choose"]
+
+
+def pyomo_name(backend):
+    """
+    This function returns the first Pyomo solver name of a backend that is installed, None when none is
+    """
+    import pyomo.environ as pe
+
+    for name in BACKENDS[backend].names:
+        try:
+            if pe.SolverFactory(name).available(exception_flag = False):
+                return name
+        except Exception:
+            continue
+    return None
+
+
+def available_backends():
+    """
+    This function lists the backends with an installed solver, in order of preference
+    """
+    return [backend for backend in PREFERENCE if pyomo_name(backend) is not None]
+
+
+def backend_of(name):
+    """
+    This function returns the backend of a backend name or of a Pyomo solver name, e.g. "appsi_highs" -> "highs"
+    """
+    if name in BACKENDS:
+        return name
+    for backend, info in BACKENDS.items():
+        if name in info.names:
+            return backend
+    raise ValueError(f"unknown solver {name}, expected one of {', '.join(BACKENDS)}")
+
+
+def model_class(model):
+    """
+    This function classifies a model as "LP", "MILP", "NLP" or "MINLP"
+
+    parameters: model: ConcreteModel: the model to solve
+
+    A model is nonlinear when an active constraint or objective is of degree above 1, and
+    mixed-integer when an unfixed variable is integer or binary.
+    """
+    import pyomo.environ as pe
+
+    nonlinear = any(
+        component.body.polynomial_degree() not in (0, 1)
+        for component in model.component_data_objects(pe.Constraint, active = True)
+    ) or any(
+        component.expr.polynomial_degree() not in (0, 1)
+        for component in model.component_data_objects(pe.Objective, active = True)
+    )
+    integer = any(var.is_integer() and not var.fixed for var in model.component_data_objects(pe.Var))
+    return ("MI" if integer else "") + ("NLP" if nonlinear else "LP")
+
+
+def select_backend(model = None, backend = None):
+    """
+    This function picks the backend a model is solved with
+
+    parameters: model: ConcreteModel: optional, the backend must handle its class
+                backend: str: optional, the backend or Pyomo solver name asked for, the first
+                              installed backend handling the model by default
+
+    Raises RuntimeError when the backend is not installed and ValueError when it can not
+    solve the model's class, naming the installed backends that can.
+
+    returns the backend name
+    """
+    kind = model_class(model) if model is not None else None
+    installed = available_backends()
+    fits = [name for name in installed if kind is None or kind in BACKENDS[name].classes]
+    if backend is None:
+        if not fits:
+            raise RuntimeError(f"no installed solver handles a {kind}, installed: {', '.join(installed) or 'none'}")
+        return fits[0]
+    backend = backend_of(backend)
+    if backend not in installed:
+        raise RuntimeError(f"{backend} is not installed, installed: {', '.join(installed) or 'none'}")
+    if kind is not None and kind not in BACKENDS[backend].classes:
+        raise ValueError(f"{backend} does not solve a {kind}, use one of: {', '.join(fits) or 'none installed'}")
+    return backend
+
+
+def solver_options(backend, settings):
+    """
+    This function translates solver settings into the options of a backend
+
+    parameters: backend: str: a key of BACKENDS
+                settings: SolverSettings: the settings, None fields are left to the solver
+
+    "choose" presolve is the default of every backend and sets nothing.
+
+    returns the options dict and the names of the settings the backend has no option for
+    """
+    info = BACKENDS[backend]
+    options, ignored = {}, []
+    for field, value in settings._asdict().items():
+        if value is None:
+            continue
+        if field == "presolve":
+            if value not in PRESOLVE:
+                raise ValueError(f"presolve must be one of {', '.join(PRESOLVE)}")
+            if value == "choose":
+                continue
+            value = info.presolve.get(value)
+            if isinstance(value, tuple):
+                # a flag without a value
+                options[value[0]] = value[1]
+                continue
+        if field == "time_limit" and backend == "glpk":
+            # glpsol takes whole seconds
+            value = math.ceil(value)
+        option = info.options[field]
+        if option is None or value is None:
+            ignored.append(field)
+            continue
+        options[option] = value
+    return options, ignored
+
+
+def solve(model, backend = None, settings = None, tee = False, load_solutions = True, warmstart = False):
+    """
+    This function solves a model with the chosen backend and settings
+
+    parameters: model: ConcreteModel: the model to solve
+                backend: str: optional, backend or Pyomo solver name, see select_backend
+                settings: SolverSettings: optional, time limit, gaps, threads and presolve
+                tee: bool: stream the solver log
+                load_solutions: bool: load the best plan found into the model, also when the solve stopped early
+                warmstart: bool: start from the values loaded in the model, where the solver supports it
+
+    The appsi HiGHS interface gets the time limit as its own setting, the solvers Pyomo runs
+    as a subprocess get it as a solver option, so it stops the search instead of killing it.
+    The loaded plan of a fleet model is recorded in the solution store set by
+    solution_store.record_to, if any.
+
+    returns the Pyomo results
+    """
+    import pyomo.environ as pe
+
+    from solution_store import model_key, record_solve
+
+    backend = select_backend(model, backend)
+    name = pyomo_name(backend)
+    options, _ = solver_options(backend, settings or SolverSettings())
+    opt = pe.SolverFactory(name)
+    kwargs = {"tee": tee, "load_solutions": False}
+    if name.startswith("appsi_"):
+        kwargs["timelimit"] = options.pop(BACKENDS[backend].options["time_limit"], None)
+    if warmstart and opt.warm_start_capable():
+        kwargs["warmstart"] = True
+    started = time.perf_counter()
+    results = opt.solve(model, options = options, **kwargs)
+    elapsed = time.perf_counter() - started
+    # the incumbent of a solve stopped by its time limit or gap is loaded too
+    if load_solutions and len(results.solution):
+        model.solutions.load_from(results)
+        record_solve(
+            model_key(model), {"solver": name, **(settings or SolverSettings())._asdict()}, model,
+            results.problem.upper_bound, results.problem.lower_bound, str(results.solver.termination_condition),
+            solve_s = elapsed,
+        )
+    return results
+
+
+def load_settings(path):
+    """
+    This function reads a JSON solver configuration, {"solver": name, "time_limit": seconds, ...}
+
+    returns the solver name (None when not given) and the SolverSettings
+    """
+    with open(path) as file:
+        config = json.load(file)
+    unknown = set(config) - {"solver"} - set(SolverSettings._fields)
+    if unknown:
+        raise ValueError(f"unknown solver settings in {path}: {', '.join(sorted(unknown))}")
+    return config.get("solver"), SolverSettings(**{field: config.get(field) for field in SolverSettings._fields})
+
+
+def add_solver_arguments(parser):
+    """
+    This function adds the --solver, --solver-config, --time-limit, --mip-rel-gap, --mip-abs-gap,
+    --threads and --presolve options to an argparse parser
+    """
+    group = parser.add_argument_group("solver")
+    group.add_argument("--solver", default = None, help = f"backend ({', '.join(BACKENDS)}) or Pyomo solver name, the first installed one by default")
+    group.add_argument("--solver-config", default = None, help = "JSON file of solver settings, the options below override it")
+    group.add_argument("--time-limit", type = float, default = None, help = "seconds")
+    group.add_argument("--mip-rel-gap", type = float, default = None, help = "relative MIP gap to stop at")
+    group.add_argument("--mip-abs-gap", type = float, default = None, help = "absolute MIP gap to stop at")
+    group.add_argument("--threads", type = int, default = None, help = "solver threads")
+    group.add_argument("--presolve", default = None, choices = PRESOLVE, help = "presolve")
+    add_store_arguments(parser)
+    return parser
+
+
+def add_store_arguments(parser):
+    """
+    This function adds the --store and --no-store options to an argparse parser, see solution_store.record_from_args
+    """
+    group = parser.add_argument_group("solution store")
+    group.add_argument("--store", default = "solutions.sqlite", help = "SQLite file every plan found is recorded in")
+    group.add_argument("--no-store", action = "store_true", help = "do not record the plans found")
+    return parser
+
+
+def solver_from_args(args):
+    """
+    This function returns the solver name and SolverSettings of arguments parsed with add_solver_arguments
+    """
+    solver, settings = load_settings(args.solver_config) if args.solver_config else (None, SolverSettings())
+    given = {field: getattr(args, field) for field in SolverSettings._fields if getattr(args, field) is not None}
+    return args.solver or solver, settings._replace(**given)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "list the installed solver backends and the options a configuration maps to")
+    add_solver_arguments(parser)
+    args = parser.parse_args()
+
+    solver, settings = solver_from_args(args)
+    installed = available_backends()
+    for backend in PREFERENCE:
+        name = pyomo_name(backend)
+        print(f"{backend:<6} {name or 'not installed':<14} {'/'.join(sorted(BACKENDS[backend].classes))}")
+    if installed:
+        backend = select_backend(backend = solver)
+        options, ignored = solver_options(backend, settings)
+        print(f"{backend} options: {options}" + (f", not supported: {', '.join(ignored)}" if ignored else ""))
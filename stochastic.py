@@ -0,0 +1,252 @@
+"""
+Two-stage stochastic fleet model solved by progressive hedging.
+
+Purchases and sales are first-stage decisions shared by every fuel-price scenario; fuel
+choice, vehicles in use and km are recourse chosen per scenario. Each scenario subproblem
+is the linear model at the scenario's prices plus the hedging terms, and the subproblems
+of an iteration are solved in parallel worker processes.
+"""
+import argparse
+import copy
+import os
+import time
+
+import numpy as np
+import pyomo.environ as pe
+
+from catalog import VehicleCatalog
+from fleet_data import FleetDataset
+from greedy import GreedyPlanner
+from price_risk import sample_fuel_prices
+from rolling_horizon import load_values, model_values, plan_objective
+from solution_store import record_from_args, record_solve, recording
+from solvers import add_store_arguments
+from submission import create_submission
+from worker_pool import start_pool, worker
+
+
+def first_stage_keys(catalog):
+    """
+    This function lists the first-stage decisions: (component, vehicle, year) of every purchase and sale that can happen
+    """
+    keys = [("number_vehicles_bought", v, catalog.model_year(v)) for v in catalog.vehicles]
+    keys += [("number_vehicles_sold", v, year) for v in catalog.vehicles for year in catalog.active_years(v)]
+    return keys
+
+
+def add_hedging_terms(model, keys, weights):
+    """
+    This function adds the progressive hedging terms to a model built with mutable=True
+
+    parameters: model: ConcreteModel: linear model from fleet_model.build_model
+                keys: list: first-stage keys from first_stage_keys
+                weights: array: cost scale of each key, the proximal weight is rho x weight
+
+    The subproblem objective is total_cost + sum(w x) + rho sum(weight |x - xbar|). The
+    absolute value is split into two nonnegative deviations, which keeps the subproblem a
+    MILP where the usual quadratic proximal term would make it a MIQP.
+    """
+    positions = range(len(keys))
+    model.ph_keys = pe.Set(initialize = positions)
+    model.ph_w = pe.Param(model.ph_keys, initialize = 0.0, mutable = True)
+    model.ph_xbar = pe.Param(model.ph_keys, initialize = 0.0, mutable = True)
+    model.ph_rho = pe.Param(model.ph_keys, initialize = 0.0, mutable = True)
+    model.ph_above = pe.Var(model.ph_keys, domain = pe.NonNegativeReals)
+    model.ph_below = pe.Var(model.ph_keys, domain = pe.NonNegativeReals)
+
+    def first_stage(m, k):
+        name, v, year = keys[k]
+        return getattr(m, name)[v, year]
+
+    def deviation_rule(m, k):
+        return first_stage(m, k) - m.ph_xbar[k] == m.ph_above[k] - m.ph_below[k]
+
+    model.ph_deviation_constraint = pe.Constraint(model.ph_keys, rule = deviation_rule)
+
+    model.total_cost.deactivate()
+    model.ph_objective = pe.Objective(
+        expr = model.total_cost.expr + pe.quicksum(
+            model.ph_w[k] * first_stage(model, k)
+            + model.ph_rho[k] * float(weights[k]) * (model.ph_above[k] + model.ph_below[k])
+            for k in positions
+        ),
+        sense = pe.minimize,
+    )
+    return [first_stage(model, k) for k in positions]
+
+
+def _setup_worker(state):
+    # one model build and persistent solver per worker process
+    from optimizer import FleetOptimizer
+
+    optimizer = FleetOptimizer(state["dataset"], time_limit = state["time_limit"], mip_rel_gap = state["mip_rel_gap"])
+    keys = first_stage_keys(optimizer.catalog)
+    weights = optimizer.dataset.vehicle_cost[[optimizer.dataset.vehicle_index[v] for _, v, _ in keys]]
+    state["optimizer"] = optimizer
+    state["first_stage"] = add_hedging_terms(optimizer.model, keys, weights)
+
+
+def solve_subproblem(task):
+    """
+    This function solves one scenario subproblem in a worker
+
+    parameters: task: dict: prices (fuel x year), w, xbar, rho (arrays over the first-stage keys),
+                      start (values to warm start from, or None for the scenario's greedy plan) and
+                      fixed (first-stage values to hold, or None to optimize them)
+
+    returns the first-stage values, the scenario cost without hedging terms and the decision values
+    """
+    optimizer = worker["optimizer"]
+    model, first_stage = optimizer.model, worker["first_stage"]
+    dataset = optimizer.dataset
+    for f, fuel in enumerate(dataset.fuels):
+        for y, year in enumerate(dataset.years.tolist()):
+            optimizer.set_fuel_cost(fuel, year, task["prices"][f, y])
+    for k, var in enumerate(first_stage):
+        model.ph_w[k] = task["w"][k]
+        model.ph_xbar[k] = task["xbar"][k]
+        model.ph_rho[k] = task["rho"][k]
+
+    if task["start"] is None:
+        optimizer.warm_start(GreedyPlanner(dataset, optimizer.catalog).plan())
+    else:
+        load_values(model, task["start"])
+    # deviations that match the start, so the solver accepts it as an incumbent
+    for k, var in enumerate(first_stage):
+        deviation = (var.value or 0.0) - task["xbar"][k]
+        model.ph_above[k].set_value(max(deviation, 0.0))
+        model.ph_below[k].set_value(max(-deviation, 0.0))
+    fixed = task["fixed"]
+    if fixed is not None:
+        for var, value in zip(first_stage, fixed):
+            var.fix(value)
+    try:
+        cost = optimizer.solve()
+    finally:
+        if fixed is not None:
+            for var in first_stage:
+                var.unfix()
+    return {
+        "first_stage": np.array([var.value or 0.0 for var in first_stage]).round(),
+        "cost": cost,
+        "values": model_values(model),
+        "termination": optimizer.log[-1]["termination"],
+        "pid": os.getpid(),
+    }
+
+
+def solve_progressive_hedging(dataset, n_scenarios = 8, rho = 0.05, iterations = 10, tolerance = 0.5,
+                              workers = None, time_limit = 60, mip_rel_gap = None, seed = None):
+    """
+    This function solves the two-stage stochastic model by progressive hedging
+
+    parameters: dataset: FleetDataset: the loaded dataset, the prices are sampled from it and
+                                       every worker solves it
+                n_scenarios: int: equally likely fuel-price scenarios drawn from the uncertainty bands
+                rho: float: proximal weight per unit of vehicle cost
+                iterations: int: most hedging iterations after the first independent solves
+                tolerance: float: stop once the mean L1 distance of the scenario purchases and sales to their average is below it
+                workers: int: worker processes, os.cpu_count() by default
+                time_limit: float: seconds per subproblem solve
+                mip_rel_gap: float: optional, relative gap at which a subproblem solve stops
+                seed: int: optional, seed of the price samples
+
+    Once the hedging stops, the purchases and sales of the scenario solution nearest to
+    their average are fixed in every scenario and the recourse is re-solved; once the
+    scenarios agree that is the consensus itself.
+
+    returns a dict with the first-stage values, the expected cost, the cost per scenario,
+    the recourse values at the mean sampled prices and the iteration log
+    """
+    prices = sample_fuel_prices(dataset, n_scenarios, seed)
+    probability = np.full(n_scenarios, 1.0 / n_scenarios)
+
+    with start_pool(dataset, n_scenarios, workers, time_limit, mip_rel_gap, _setup_worker) as pool:
+        keys = first_stage_keys(VehicleCatalog(dataset))
+        weights = dataset.vehicle_cost[[dataset.vehicle_index[v] for _, v, _ in keys]]
+        zeros = np.zeros(len(keys))
+
+        def solve_all(w, xbar, rho_values, starts, fixed = None):
+            tasks = [
+                {"prices": prices[s], "w": w[s], "xbar": xbar, "rho": rho_values, "start": starts[s], "fixed": fixed}
+                for s in range(n_scenarios)
+            ]
+            return list(pool.map(solve_subproblem, tasks))
+
+        log = []
+        started = time.perf_counter()
+        results = solve_all(np.zeros((n_scenarios, len(keys))), zeros, zeros, [None] * n_scenarios)
+        w = np.zeros((n_scenarios, len(keys)))
+        for iteration in range(iterations + 1):
+            x = np.array([result["first_stage"] for result in results])
+            xbar = probability @ x
+            spread = float(probability @ np.abs(x - xbar).sum(axis = 1))
+            log.append({
+                "iteration": iteration,
+                "spread": spread,
+                "expected_cost": float(probability @ [result["cost"] for result in results]),
+                "seconds": time.perf_counter() - started,
+            })
+            if spread <= tolerance or iteration == iterations:
+                break
+            rho_values = rho * weights
+            w += rho_values * (x - xbar)
+            results = solve_all(w, xbar, rho_values, [result["values"] for result in results])
+
+        # fix the scenario solution nearest the average, it is a valid plan in every scenario
+        # since prices do not change feasibility, and its recourse starts every scenario
+        nearest = int(np.abs(x - xbar).sum(axis = 1).argmin())
+        consensus = x[nearest]
+        starts = [results[nearest]["values"]] * n_scenarios
+        final = solve_all(np.zeros_like(w), zeros, zeros, starts, consensus)
+        mean_prices = prices.mean(axis = 0)
+        expected = pool.submit(solve_subproblem, {
+            "prices": mean_prices, "w": zeros, "xbar": zeros, "rho": zeros, "start": starts[0], "fixed": consensus,
+        }).result()
+
+    if recording() is not None:
+        # the recourse plan solves the dataset at the mean sampled prices, it is filed under that
+        at_mean = copy.copy(dataset)
+        at_mean.fuel_cost = mean_prices
+        record_solve(
+            at_mean.content_hash(),
+            {"solver": "progressive_hedging", "n_scenarios": n_scenarios, "rho": rho, "iterations": iterations,
+             "tolerance": tolerance, "time_limit": time_limit, "mip_rel_gap": mip_rel_gap, "seed": seed},
+            expected["values"], expected["cost"], status = "progressive hedging", solve_s = time.perf_counter() - started,
+        )
+    scenario_costs = np.array([result["cost"] for result in final])
+    return {
+        "first_stage": dict(zip(keys, consensus)),
+        "expected_cost": float(probability @ scenario_costs),
+        "scenario_costs": scenario_costs,
+        "values": expected["values"],
+        "log": log,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "solve the two-stage fuel-price stochastic model by progressive hedging")
+    parser.add_argument("--data", default = "dataset", help = "dataset directory")
+    parser.add_argument("--output", default = "submission.csv", help = "submission csv of the plan at the mean sampled prices")
+    parser.add_argument("--scenarios", type = int, default = 8, help = "fuel-price scenarios")
+    parser.add_argument("--rho", type = float, default = 0.05, help = "proximal weight per unit of vehicle cost")
+    parser.add_argument("--iterations", type = int, default = 10, help = "most hedging iterations")
+    parser.add_argument("--workers", type = int, default = None, help = "worker processes")
+    parser.add_argument("--time-limit", type = float, default = 60, help = "seconds per subproblem")
+    parser.add_argument("--seed", type = int, default = None, help = "random seed of the price samples")
+    add_store_arguments(parser)
+    args = parser.parse_args()
+
+    record_from_args(args)
+
+    dataset = FleetDataset.load(args.data)
+    solution = solve_progressive_hedging(
+        dataset, args.scenarios, args.rho, args.iterations, workers = args.workers,
+        time_limit = args.time_limit, seed = args.seed,
+    )
+    for record in solution["log"]:
+        print(record)
+    print("expected cost", solution["expected_cost"])
+    print("scenario costs", solution["scenario_costs"].round())
+    _, model = plan_objective(dataset, VehicleCatalog(dataset), solution["values"])
+    create_submission(model, args.output)
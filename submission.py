@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+
+
+SUBMISSION_COLUMNS = ["Year", "ID", "Num_Vehicles", "Type", "Fuel", "Distance_bucket", "Distance_per_vehicle(km)"]
+
+TYPE_ORDER = {"Buy": 0, "Use": 1, "Sell": 2}
+
+
+def submission_frame(results):
+    """
+    This function turns a list of result rows into the submission DataFrame
+
+    parameters: results: list of dict: rows keyed by the submission columns
+
+    Rows are ordered year by year as Buy, Use, Sell, which is the order the fleet is replayed in.
+    """
+    df_results = pd.DataFrame(results, columns = SUBMISSION_COLUMNS)
+    order = df_results["Type"].map(TYPE_ORDER)
+    df_results = df_results.assign(_order = order).sort_values(["Year", "_order"], kind = "stable")
+    return df_results.drop(columns = "_order").reset_index(drop = True)
+
+
+def read_submission(path):
+    """
+    This function reads a submission csv into a DataFrame with the submission columns
+
+    parameters: path: str: submission csv in the Year,ID,Num_Vehicles,Type,Fuel,Distance_bucket,Distance_per_vehicle(km) format,
+                      or a submission DataFrame already in memory
+    """
+    frame = path.copy() if isinstance(path, pd.DataFrame) else pd.read_csv(path)
+    missing = [column for column in SUBMISSION_COLUMNS if column not in frame.columns]
+    if missing:
+        raise ValueError(f"{path} is missing the submission columns {missing}")
+    frame = frame[SUBMISSION_COLUMNS]
+    frame["Num_Vehicles"] = frame["Num_Vehicles"].fillna(0).round().astype(int)
+    frame["Distance_per_vehicle(km)"] = frame["Distance_per_vehicle(km)"].fillna(0.0).astype(float)
+    return frame
+
+
+# decision components a plan is read from
+PLAN_COMPONENTS = ["number_vehicles_bought", "number_vehicles_use", "number_vehicles_sold", "total_km", "number_vehicles_distance"]
+
+# columnar formats a plan can also be written in, by file extension
+COLUMNAR_FORMATS = (".parquet", ".arrow", ".feather")
+
+
+def write_columnar(frame, path):
+    """
+    This function writes a plan as Parquet (.parquet) or Arrow IPC (.arrow, .feather) for analytics
+
+    parameters: frame: DataFrame: the submission
+                path: str: output file, the extension picks the format
+    """
+    if not path.endswith(COLUMNAR_FORMATS):
+        raise ValueError(f"columnar output must end with one of {COLUMNAR_FORMATS}")
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError("writing parquet or arrow needs pyarrow, pip install pyarrow")
+    if path.endswith(".parquet"):
+        frame.to_parquet(path, index = False)
+    else:
+        frame.to_feather(path)
+
+
+def _positive(keys, values):
+    # keys, rounded numbers and positions of the entries that round to at least one vehicle
+    numbers = np.rint(np.nan_to_num(np.asarray(values, dtype = float)))
+    kept = np.flatnonzero(numbers > 0)
+    return [keys[i] for i in kept], numbers[kept].astype(int), kept
+
+
+def _aligned(arrays, name, keys, kept, selected):
+    # values of a component at the selected keys, read by position when it shares their index
+    if name not in arrays:
+        return None
+    other_keys, other_values = arrays[name]
+    if len(other_keys) == len(keys) and other_keys == keys:
+        return np.nan_to_num(np.asarray(other_values, dtype = float))[kept]
+    lookup = dict(zip(other_keys, other_values))
+    return np.nan_to_num(np.array([lookup.get(key) for key in selected], dtype = float))
+
+
+def submission_from_arrays(arrays, output_file = None, columnar_file = None):
+    """
+    This function turns decision arrays into the submission DataFrame
+
+    parameters: arrays: dict: component name -> (list of index tuples, array of values), None values count as 0
+                output_file: str: optional, path the submission csv is written to
+                columnar_file: str: optional, .parquet or .arrow path the plan is also written to
+
+    The nonzero entries are masked out of each array and every row type is built as one
+    frame. Use rows take their km per vehicle from total_km when it is given (the linear
+    model), from number_vehicles_distance otherwise.
+    """
+    frames = []
+    for name, kind in (("number_vehicles_bought", "Buy"), ("number_vehicles_use", "Use"), ("number_vehicles_sold", "Sell")):
+        keys, values = arrays.get(name, ([], []))
+        selected, numbers, kept = _positive(keys, values)
+        if not selected:
+            continue
+        if kind == "Use":
+            frame = pd.DataFrame.from_records(selected, columns = ["ID", "Fuel", "Distance_bucket", "Year"])
+            km = _aligned(arrays, "total_km", keys, kept, selected)
+            if km is not None:
+                distance = km / numbers
+            else:
+                distance = _aligned(arrays, "number_vehicles_distance", keys, kept, selected)
+                distance = distance if distance is not None else np.zeros(len(selected))
+        else:
+            frame = pd.DataFrame.from_records(selected, columns = ["ID", "Year"])
+            frame["Fuel"] = None
+            frame["Distance_bucket"] = None
+            distance = np.zeros(len(selected))
+        frame["Num_Vehicles"] = numbers
+        frame["Type"] = kind
+        frame["Distance_per_vehicle(km)"] = distance
+        frames.append(frame[SUBMISSION_COLUMNS])
+
+    df_results = submission_frame(pd.concat(frames, ignore_index = True) if frames else [])
+    if columnar_file is not None:
+        write_columnar(df_results, columnar_file)
+    if output_file is not None:
+        df_results.to_csv(output_file, index = False)
+    return df_results
+
+
+def submission_from_values(values, output_file = None, columnar_file = None):
+    """
+    This function turns decision values into the submission DataFrame
+
+    parameters: values: dict: component name -> {index: value}, with the index tuples of fleet_model.build_model
+                output_file: str: optional, path the submission csv is written to
+                columnar_file: str: optional, .parquet or .arrow path the plan is also written to
+    """
+    arrays = {name: (list(entries.keys()), list(entries.values())) for name, entries in values.items()}
+    return submission_from_arrays(arrays, output_file, columnar_file)
+
+
+def create_submission(model, output_file = None, columnar_file = None):
+    """
+    This function collects the buy/use/sell decisions of a solved fleet model
+
+    parameters: model: ConcreteModel: a model built by fleet_model.build_model and solved
+                output_file: str: optional, path the submission csv is written to
+                columnar_file: str: optional, .parquet or .arrow path the plan is also written to
+
+    Every decision component is read in one pass over its variables into an array.
+    """
+    arrays = {}
+    for name in PLAN_COMPONENTS:
+        component = model.find_component(name)
+        if component is not None:
+            arrays[name] = (list(component.keys()), [var.value for var in component.values()])
+    return submission_from_arrays(arrays, output_file, columnar_file)
@@ -0,0 +1,206 @@
+"""
+Scenario sweep: carbon-cap multipliers x fuel-price shocks solved across a process pool,
+one model build per worker, collected into a single CSV or Parquet table.
+
+usage: python sweep.py --carbon 0.8 0.9 1.0 --fuel-shock none all=1.2 Electricity=0.8,LNG=1.1
+                       --workers 4 --time-limit 120 --output sweep.csv [--resume]
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import as_completed
+
+import pandas as pd
+
+from fleet_data import FleetDataset
+from greedy import GreedyPlanner
+from scoring import score_frame
+from solution_store import record_from_args
+from solvers import add_store_arguments
+from worker_pool import start_pool, worker
+
+
+def parse_shock(text):
+    """
+    This function parses a fuel-price shock such as "none", "all=1.2" or "Electricity=0.8,LNG=1.1"
+
+    returns a dict fuel -> price multiplier, "all" applying to every fuel not named
+    """
+    if text in ("", "none"):
+        return {}
+    shock = {}
+    for part in text.split(","):
+        fuel, _, multiplier = part.partition("=")
+        shock[fuel.strip()] = float(multiplier)
+    return shock
+
+
+def scenario_grid(carbon_multipliers, fuel_shocks):
+    """
+    This function crosses carbon-cap multipliers with fuel-price shocks
+
+    parameters: carbon_multipliers: list of float: applied to every year of carbon_emissions.csv
+                fuel_shocks: list of dict: fuel -> multiplier applied to the costs of fuels.csv
+
+    returns one scenario dict per combination, named after its settings
+    """
+    scenarios = []
+    for carbon, shock in itertools.product(carbon_multipliers, fuel_shocks):
+        shock_name = ",".join(f"{fuel}={m:g}" for fuel, m in sorted(shock.items())) or "none"
+        scenarios.append({"name": f"carbon={carbon:g};fuel={shock_name}", "carbon_multiplier": carbon, "fuel_shock": shock})
+    return scenarios
+
+
+def _setup_worker(state):
+    # one model build and solver instance per worker process
+    from optimizer import FleetOptimizer
+
+    optimizer = FleetOptimizer(state["dataset"], time_limit = state["time_limit"], mip_rel_gap = state["mip_rel_gap"])
+    state["optimizer"] = optimizer
+    state["fuel_cost"] = optimizer.dataset.fuel_cost.copy()
+    state["carbon_limit"] = optimizer.dataset.carbon_limit.copy()
+
+
+def _apply(optimizer, scenario):
+    # set every fuel cost and carbon cap from the baseline, so scenarios do not stack
+    dataset = optimizer.dataset
+    shock = scenario["fuel_shock"]
+    for f, fuel in enumerate(dataset.fuels):
+        multiplier = shock.get(fuel, shock.get("all", 1.0))
+        for y, year in enumerate(dataset.years.tolist()):
+            optimizer.set_fuel_cost(fuel, year, worker["fuel_cost"][f, y] * multiplier)
+    for y, year in enumerate(dataset.years.tolist()):
+        optimizer.set_carbon_cap(year, worker["carbon_limit"][y] * scenario["carbon_multiplier"])
+
+
+def summarize(submission, dataset):
+    """
+    This function condenses a plan into one sweep row: cost, emissions and fleet mix
+
+    parameters: submission: DataFrame: the plan
+                dataset: FleetDataset: the scenario's dataset
+    """
+    score = score_frame(submission, dataset)
+    row = {
+        "cost": score.total_cost,
+        "emissions": float(score.yearly["emissions"].sum()),
+        "carbon_slack": float((score.yearly["carbon_limit"] - score.yearly["emissions"]).min()),
+        "violations": len(score.violations),
+    }
+    bought = submission[submission["Type"] == "Buy"]
+    powertrain = pd.Series(dataset.vehicle_type, index = dataset.vehicle_ids)
+    for name, number in bought.groupby(bought["ID"].map(powertrain))["Num_Vehicles"].sum().items():
+        row[f"bought_{name}"] = int(number)
+    use = submission[submission["Type"] == "Use"]
+    km = use["Num_Vehicles"] * use["Distance_per_vehicle(km)"]
+    for fuel, share in (km.groupby(use["Fuel"]).sum() / km.sum()).items():
+        row[f"km_share_{fuel}"] = float(share)
+    return row
+
+
+def solve_scenario(scenario):
+    """
+    This function solves one scenario in a worker, starting from the greedy plan of the scenario
+
+    returns the sweep row of the scenario, with status "error" and the message when it fails
+    """
+    optimizer = worker["optimizer"]
+    row = {"name": scenario["name"], "carbon_multiplier": scenario["carbon_multiplier"],
+           "fuel_shock": json.dumps(scenario["fuel_shock"], sort_keys = True), "pid": os.getpid()}
+    started = time.perf_counter()
+    try:
+        _apply(optimizer, scenario)
+        greedy = GreedyPlanner(optimizer.dataset, optimizer.catalog).plan()
+        row["greedy_cost"] = score_frame(greedy, optimizer.dataset).total_cost
+        optimizer.warm_start(greedy)
+        optimizer.solve()
+        record = optimizer.log[-1]
+        row.update(status = record["termination"], objective = record["objective"], bound = record["bound"])
+        row.update(summarize(optimizer.submission(), optimizer.dataset))
+    except Exception as error:
+        row.update(status = "error", error = f"{type(error).__name__}: {error}")
+    row["seconds"] = time.perf_counter() - started
+    return row
+
+
+def _write(rows, output):
+    table = pd.DataFrame(rows)
+    if output.endswith(".parquet"):
+        table.to_parquet(output, index = False)
+    else:
+        table.to_csv(output, index = False)
+    return table
+
+
+def sweep(scenarios, workers = None, data_dir = "dataset", time_limit = 120, mip_rel_gap = None,
+          output = "sweep.csv", resume = False):
+    """
+    This function solves every scenario across a process pool and writes one table of results
+
+    parameters: scenarios: list of dict: from scenario_grid
+                workers: int: worker processes, os.cpu_count() by default
+                data_dir: str: dataset directory, loaded once and sent to every worker
+                time_limit: float: seconds per scenario solve
+                mip_rel_gap: float: optional, relative gap at which a scenario solve stops
+                output: str: .csv or .parquet table to write
+                resume: bool: skip the scenarios already solved in the checkpoint of a crashed run,
+                              scenarios with status "error" there are solved again
+
+    Every finished scenario is appended to output + ".jsonl" as it arrives, which is the
+    checkpoint resume reads back; the table is written from it once all scenarios are done.
+    """
+    if output.endswith(".parquet"):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("writing parquet needs pyarrow, pip install pyarrow or use a .csv output")
+
+    checkpoint = output + ".jsonl"
+    rows = []
+    if resume and os.path.exists(checkpoint):
+        with open(checkpoint) as file:
+            rows = [json.loads(line) for line in file if line.strip()]
+        # failed scenarios (out of memory, a crashed solver) are not done: their rows are dropped and they are solved again
+        rows = [row for row in rows if row["status"] != "error"]
+    elif os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    done = {row["name"] for row in rows}
+    pending = [scenario for scenario in scenarios if scenario["name"] not in done]
+
+    if pending:
+        dataset = FleetDataset.load(data_dir)
+        pool = start_pool(dataset, len(pending), workers, time_limit, mip_rel_gap, _setup_worker)
+        with pool, open(checkpoint, "a") as file:
+            futures = [pool.submit(solve_scenario, scenario) for scenario in pending]
+            for future in as_completed(futures):
+                row = future.result()
+                rows.append(row)
+                file.write(json.dumps(row, default = float) + "\n")
+                file.flush()
+                print(f"{len(rows)}/{len(scenarios)} {row['name']}: {row['status']} {row.get('objective')}")
+
+    order = {scenario["name"]: i for i, scenario in enumerate(scenarios)}
+    rows = sorted((row for row in rows if row["name"] in order), key = lambda row: order[row["name"]])
+    return _write(rows, output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "solve a grid of carbon-cap and fuel-price scenarios in parallel")
+    parser.add_argument("--data", default = "dataset", help = "dataset directory")
+    parser.add_argument("--carbon", type = float, nargs = "+", default = [1.0], help = "carbon cap multipliers")
+    parser.add_argument("--fuel-shock", nargs = "+", default = ["none"], help = "fuel price shocks, e.g. none all=1.2 Electricity=0.8,LNG=1.1")
+    parser.add_argument("--workers", type = int, default = None, help = "worker processes")
+    parser.add_argument("--time-limit", type = float, default = 120, help = "seconds per scenario")
+    parser.add_argument("--mip-rel-gap", type = float, default = None, help = "relative gap per scenario")
+    parser.add_argument("--output", default = "sweep.csv", help = "results table, .csv or .parquet")
+    parser.add_argument("--resume", action = "store_true", help = "skip the scenarios solved by an earlier run, retrying the failed ones")
+    add_store_arguments(parser)
+    args = parser.parse_args()
+
+    record_from_args(args)
+
+    grid = scenario_grid(args.carbon, [parse_shock(text) for text in args.fuel_shock])
+    table = sweep(grid, args.workers, args.data, args.time_limit, args.mip_rel_gap, args.output, args.resume)
+    print(table.to_string(index = False))
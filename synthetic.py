@@ -0,0 +1,210 @@
+"""
+Synthetic datasets in the exact schema of the dataset directory, at a configurable number of
+sizes, distance buckets, powertrains, fuels and horizon years, for scaling studies.
+
+Magnitudes follow the hackathon set: the first powertrain is electric with a distance
+bucket that grows over the model years, the others are combustion powertrains covering
+every bucket with a fossil and a low-carbon fuel. The carbon limit of each year is set
+between the emissions of the cleanest and the dirtiest way to serve its demand, tightening
+over the horizon, so every generated dataset has feasible plans.
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from catalog import LIFETIME
+from fleet_data import DATASET_FILES, FleetDataset
+
+
+# named scales: sizes, distance buckets, powertrains and horizon years
+SCALES = {
+    "small": dict(n_sizes = 2, n_distances = 2, n_powertrains = 2, n_years = 8),
+    "base": dict(n_sizes = 4, n_distances = 4, n_powertrains = 3, n_years = 16),
+    "large": dict(n_sizes = 6, n_distances = 6, n_powertrains = 4, n_years = 20),
+    "xlarge": dict(n_sizes = 8, n_distances = 8, n_powertrains = 5, n_years = 25),
+}
+
+# powertrains of the hackathon set and their fuels, fossil first, further ones are generated
+POWERTRAINS = [("BEV", ["Electricity"]), ("Diesel", ["B20", "HVO"]), ("LNG", ["LNG", "BioLNG"])]
+
+
+def cost_profile_frame():
+    """
+    This function returns the cost profiles of the hackathon set, resale, insurance and maintenance % by age
+    """
+    age = np.arange(1, LIFETIME + 1)
+    return pd.DataFrame({
+        "End of Year": age,
+        "Resale Value %": np.maximum(100 - 10 * age, 30),
+        "Insurance Cost %": 4 + age,
+        "Maintenance Cost %": 2 * age - 1,
+    })
+
+
+def generate_frames(n_sizes = 4, n_distances = 4, n_powertrains = 3, n_years = 16, fuels_per_powertrain = 2,
+                    first_year = 2023, seed = 0):
+    """
+    This function generates the tables of a synthetic dataset
+
+    parameters: n_sizes: int: vehicle sizes S1..Sn
+                n_distances: int: distance buckets D1..Dn
+                n_powertrains: int: powertrains, the first is electric with a single fuel
+                n_years: int: horizon years from first_year
+                fuels_per_powertrain: int: fuels of each generated combustion powertrain
+                first_year: int: first year of the horizon
+                seed: int: seed of the random draws
+
+    returns a dict of DataFrames keyed like fleet_data.DATASET_FILES
+    """
+    rng = np.random.default_rng(seed)
+    years = np.arange(first_year, first_year + n_years)
+    trend = np.arange(n_years)
+    sizes = [f"S{i + 1}" for i in range(n_sizes)]
+    distances = [f"D{i + 1}" for i in range(n_distances)]
+
+    powertrains = list(POWERTRAINS[:n_powertrains])
+    for i in range(len(powertrains), n_powertrains):
+        powertrains.append((f"PT{i + 1}", [f"PT{i + 1}_F{j + 1}" for j in range(fuels_per_powertrain)]))
+
+    # fuels: electricity is clean and cheapening, combustion fuels pair a fossil and a low-carbon fuel
+    fuel_rows = []
+    uncertainty = np.minimum(2 * trend, 30)
+    for p, (_, fuels) in enumerate(powertrains):
+        for j, fuel in enumerate(fuels):
+            if p == 0:
+                emissions, cost, drift = 0.0, rng.uniform(0.15, 0.25), -0.04
+            elif j == 0:
+                emissions, cost, drift = rng.uniform(2.4, 3.1), rng.uniform(0.9, 1.3), rng.uniform(-0.01, 0.02)
+            else:
+                emissions, cost, drift = rng.uniform(0.3, 0.6), rng.uniform(1.0, 1.9), rng.uniform(-0.01, 0.0)
+            for y, year in enumerate(years):
+                fuel_rows.append((fuel, year, emissions, cost * (1 + drift) ** y, uncertainty[y]))
+    fuels_frame = pd.DataFrame(
+        fuel_rows, columns = ["Fuel", "Year", "Emissions (CO2/unit_fuel)", "Cost ($/unit_fuel)", "Cost Uncertainty (±%)"]
+    )
+
+    # vehicles: one model per powertrain, size and model year
+    size_cost = np.linspace(85000, 85000 + 25000 * (n_sizes - 1), n_sizes)
+    size_range = rng.integers(70, 120, n_sizes) * 1000
+    vehicle_rows, consumption_rows = [], []
+    for p, (powertrain, fuels) in enumerate(powertrains):
+        consumption = rng.uniform(0.8, 0.9) if p == 0 else rng.uniform(0.15, 0.25)
+        for s, size in enumerate(sizes):
+            for y, year in enumerate(years):
+                if p == 0:
+                    # electric: over twice the price at first, falling to a floor, longer buckets over time
+                    price = size_cost[s] * 2.2 * max(0.95 ** y, 0.7)
+                    bucket = min(n_distances - 1, y * n_distances // max(n_years // 2, 1))
+                else:
+                    price = size_cost[s] * (1 + 0.15 * (p - 1)) * 1.03 ** y
+                    bucket = n_distances - 1
+                vehicle_id = f"{powertrain}_{size}_{year}"
+                vehicle_rows.append((vehicle_id, powertrain, size, year, round(price), size_range[s], distances[bucket]))
+                for fuel in fuels:
+                    consumption_rows.append((vehicle_id, fuel, consumption * rng.uniform(0.98, 1.02)))
+    vehicles_frame = pd.DataFrame(
+        vehicle_rows, columns = ["ID", "Vehicle", "Size", "Year", "Cost ($)", "Yearly range (km)", "Distance"]
+    )
+    vehicles_fuels_frame = pd.DataFrame(consumption_rows, columns = ["ID", "Fuel", "Consumption (unit_fuel/km)"])
+
+    # demand: a random level per cell growing a few % a year
+    level = rng.lognormal(np.log(1.2e6), 0.9, size = (n_sizes, n_distances))
+    growth = rng.uniform(0.01, 0.04, size = (n_sizes, n_distances))
+    demand_rows = [
+        (year, size, distance, round(level[s, d] * (1 + growth[s, d]) ** y))
+        for y, year in enumerate(years) for s, size in enumerate(sizes) for d, distance in enumerate(distances)
+    ]
+    demand_frame = pd.DataFrame(demand_rows, columns = ["Year", "Size", "Distance", "Demand (km)"])
+
+    frames = {
+        "vehicles": vehicles_frame,
+        "vehicles_fuels": vehicles_fuels_frame,
+        "fuels": fuels_frame,
+        "demand": demand_frame,
+        "carbon_emissions": pd.DataFrame({"Year": years, "Carbon emission CO2/kg": np.zeros(n_years, dtype = int)}),
+        "cost_profiles": cost_profile_frame(),
+    }
+    frames["carbon_emissions"]["Carbon emission CO2/kg"] = carbon_limits(FleetDataset(frames))
+    return frames
+
+
+def carbon_limits(dataset, loose = 0.9, tight = 0.2):
+    """
+    This function sets carbon limits that tighten from loose to tight across the horizon
+
+    parameters: dataset: FleetDataset: dataset whose carbon limits are ignored
+                loose, tight: float: position of the first and last year's limit between the
+                                     cleanest (0) and the dirtiest (1) way to serve the demand
+
+    Each demand cell is valued at the lowest and highest CO2 per km of the vehicles and fuels
+    that can serve it in the year, so the limit is always reachable.
+
+    returns the integer limit of every year
+    """
+    n_years = len(dataset.years)
+    limits = np.zeros(n_years)
+    for y, year in enumerate(dataset.years.tolist()):
+        active = (dataset.vehicle_year <= year) & (year < dataset.vehicle_year + LIFETIME)
+        per_km = np.where(dataset.compatible, dataset.consumption * dataset.fuel_emissions[:, y], np.nan)
+        cleanest, dirtiest = np.nanmin(per_km, axis = 1), np.nanmax(per_km, axis = 1)
+        tightness = loose + (tight - loose) * y / max(n_years - 1, 1)
+        for s in range(len(dataset.sizes)):
+            for d in range(len(dataset.distances)):
+                serving = active & (dataset.vehicle_size == s) & (dataset.vehicle_distance >= d)
+                if not serving.any():
+                    raise ValueError(f"no vehicle serves {dataset.sizes[s]} {dataset.distances[d]} in {year}")
+                low, high = cleanest[serving].min(), dirtiest[serving].max()
+                limits[y] += dataset.demand[y, s, d] * (low + tightness * (high - low))
+    return np.ceil(limits).astype(int)
+
+
+def write_dataset(frames, output_dir):
+    """
+    This function writes generated tables as the csv files of a dataset directory
+    """
+    os.makedirs(output_dir, exist_ok = True)
+    for name, file_name in DATASET_FILES.items():
+        frames[name].to_csv(os.path.join(output_dir, file_name), index = False)
+    return output_dir
+
+
+def generate_dataset(output_dir, scale = "base", seed = 0, **overrides):
+    """
+    This function writes a synthetic dataset of a named scale to a directory
+
+    parameters: output_dir: str: dataset directory to write
+                scale: str: one of SCALES
+                seed: int: seed of the random draws
+                overrides: generate_frames keyword arguments replacing those of the scale
+    """
+    options = dict(SCALES[scale], seed = seed)
+    options.update(overrides)
+    return write_dataset(generate_frames(**options), output_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "generate a synthetic dataset in the dataset/ schema")
+    parser.add_argument("output", help = "dataset directory to write")
+    parser.add_argument("--scale", default = "base", choices = sorted(SCALES), help = "named scale")
+    parser.add_argument("--sizes", type = int, default = None, help = "vehicle sizes, overrides the scale")
+    parser.add_argument("--distances", type = int, default = None, help = "distance buckets, overrides the scale")
+    parser.add_argument("--powertrains", type = int, default = None, help = "powertrains, overrides the scale")
+    parser.add_argument("--fuels-per-powertrain", type = int, default = 2, help = "fuels of each generated powertrain")
+    parser.add_argument("--years", type = int, default = None, help = "horizon years, overrides the scale")
+    parser.add_argument("--first-year", type = int, default = 2023, help = "first year of the horizon")
+    parser.add_argument("--seed", type = int, default = 0, help = "random seed")
+    args = parser.parse_args()
+
+    overrides = {
+        key: value for key, value in (
+            ("n_sizes", args.sizes), ("n_distances", args.distances), ("n_powertrains", args.powertrains), ("n_years", args.years),
+        ) if value is not None
+    }
+    generate_dataset(
+        args.output, args.scale, args.seed, fuels_per_powertrain = args.fuels_per_powertrain, first_year = args.first_year, **overrides,
+    )
+    dataset = FleetDataset.load(args.output)
+    print(f"{args.output}: {len(dataset.vehicle_ids)} vehicles, {len(dataset.fuels)} fuels, "
+          f"{len(dataset.sizes)} sizes, {len(dataset.distances)} distance buckets, {len(dataset.years)} years")
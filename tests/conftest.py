@@ -0,0 +1,45 @@
+"""
+Shared fixtures: the bundled dataset, and a synthetic dataset small enough to solve the
+MIP to optimality in seconds.
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from catalog import VehicleCatalog  # noqa: E402
+from fleet_data import FleetDataset  # noqa: E402
+from solution_store import record_to  # noqa: E402
+from synthetic import generate_dataset  # noqa: E402
+
+
+@pytest.fixture(scope = "session")
+def bundled():
+    return FleetDataset.load(os.path.join(ROOT, "dataset"))
+
+
+@pytest.fixture(scope = "session")
+def tiny_dir(tmp_path_factory):
+    # 12 vehicles over 3 years, every backend solves the MIP to a 0 gap in a few seconds
+    return generate_dataset(str(tmp_path_factory.mktemp("tiny") / "dataset"), "small", seed = 0, n_years = 3)
+
+
+@pytest.fixture(scope = "session")
+def tiny(tiny_dir):
+    return FleetDataset.load(tiny_dir)
+
+
+@pytest.fixture(scope = "session")
+def tiny_catalog(tiny):
+    return VehicleCatalog(tiny)
+
+
+@pytest.fixture(autouse = True)
+def no_recording():
+    # a test that sets a solution store never leaves it set for the next one
+    previous = record_to(None)
+    yield
+    record_to(previous)
@@ -0,0 +1,53 @@
+"""
+The Pyomo, appsi and sparse-matrix backends solve the same model: their LP relaxations and
+MIP optima agree.
+"""
+import pyomo.environ as pe
+import pytest
+from pyomo.contrib.appsi.solvers import Highs
+
+from fleet_model import build_model
+from milp_backend import FleetMatrix
+from relax_round import set_relaxed
+from scoring import score_frame
+from solvers import SolverSettings, solve
+from submission import read_submission
+
+# LP relaxation of the bundled dataset
+BUNDLED_LP = 186263709.27
+
+
+def _pyomo(dataset, relaxed):
+    model = build_model(dataset, linear = True, sparse = True)
+    set_relaxed(model, relaxed)
+    solve(model, "highs", SolverSettings(mip_rel_gap = 0))
+    return pe.value(model.total_cost)
+
+
+def _appsi(dataset, relaxed):
+    model = build_model(dataset, linear = True, stock = True)
+    set_relaxed(model, relaxed)
+    solver = Highs()
+    solver.config.mip_gap = 0
+    return solver.solve(model).best_feasible_objective
+
+
+def test_lp_relaxations_agree(bundled):
+    csr = FleetMatrix(bundled).solve(integral = False)
+    assert csr.success
+    assert csr.fun == pytest.approx(BUNDLED_LP, rel = 1e-8)
+    assert _pyomo(bundled, True) == pytest.approx(BUNDLED_LP, rel = 1e-8)
+    assert _appsi(bundled, True) == pytest.approx(BUNDLED_LP, rel = 1e-8)
+
+
+def test_mip_optima_agree(tiny):
+    matrix = FleetMatrix(tiny)
+    result = matrix.solve(mip_rel_gap = 0)
+    assert result.success
+    assert _pyomo(tiny, False) == pytest.approx(result.fun, rel = 1e-7)
+    assert _appsi(tiny, False) == pytest.approx(result.fun, rel = 1e-7)
+
+    # the matrix plan scores at its objective without breaking a rule
+    score = score_frame(read_submission(matrix.submission(result.x)), tiny)
+    assert score.violations.empty
+    assert score.total_cost == pytest.approx(result.fun, rel = 1e-7)
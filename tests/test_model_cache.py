@@ -0,0 +1,27 @@
+"""
+A cached model file is found again for the same inputs and solves to the plan of the model it was written from.
+"""
+import pytest
+
+from milp_backend import FleetMatrix
+from model_cache import ModelCache, solve_cached
+from scoring import score_frame
+from submission import read_submission, submission_from_values
+
+
+def test_cache_hit_and_round_trip(tmp_path, tiny_dir, tiny):
+    cache = ModelCache(str(tmp_path / "cache"))
+    built = cache.load_or_build(tiny_dir, linear = True)
+    cached = cache.load_or_build(tiny_dir, linear = True)
+    assert not built.hit
+    assert cached.hit
+    assert cached.key == built.key
+    assert cache.load_or_build(tiny_dir, linear = True, sparse = True).key != built.key
+
+    solution = solve_cached(cached, mip_rel_gap = 0)
+    assert solution.objective == pytest.approx(FleetMatrix(tiny).solve(mip_rel_gap = 0).fun, rel = 1e-7)
+
+    # the symbol map sends the columns back to the decision values the plan is written from
+    score = score_frame(read_submission(submission_from_values(solution.values)), tiny)
+    assert score.violations.empty
+    assert score.total_cost == pytest.approx(solution.objective, rel = 1e-7)
@@ -0,0 +1,72 @@
+"""
+Plans built without a full MIP solve keep every rule of the problem: the greedy plan, the
+repaired warm starts and the relax-and-round plan score without violations.
+"""
+import copy
+
+import pytest
+
+from catalog import VehicleCatalog
+from fleet_model import build_model
+from greedy import GreedyPlanner
+from relax_round import solve_relax_round
+from scoring import score_frame
+from submission import create_submission, read_submission, submission_from_values
+from warm_start import warm_start_from_submission
+
+
+@pytest.fixture(scope = "module")
+def greedy_plan(bundled):
+    return read_submission(GreedyPlanner(bundled).plan())
+
+
+def test_greedy_plan_has_no_violations(bundled, greedy_plan):
+    score = score_frame(greedy_plan, bundled)
+    assert score.violations.empty
+    assert score.total_cost > 186263709.27
+
+
+def _drop_half_use(plan):
+    use = plan.index[plan["Type"] == "Use"]
+    return plan.drop(use[::2])
+
+
+def _buys_only(plan):
+    return plan[plan["Type"] == "Buy"]
+
+
+@pytest.mark.parametrize("degrade", [_drop_half_use, _buys_only])
+def test_repaired_plan_has_no_violations(bundled, greedy_plan, degrade):
+    catalog = VehicleCatalog(bundled)
+    model = build_model(bundled, catalog, linear = True, sparse = True)
+    loaded, repairs = warm_start_from_submission(model, degrade(greedy_plan), catalog)
+    assert loaded
+    assert repairs
+    assert score_frame(read_submission(create_submission(model)), bundled).violations.empty
+
+
+def test_repaired_plan_meets_a_lower_carbon_cap(bundled, greedy_plan):
+    dataset = copy.deepcopy(bundled)
+    dataset.carbon_limit = dataset.carbon_limit * 0.85
+    catalog = VehicleCatalog(dataset)
+    model = build_model(dataset, catalog, linear = True, sparse = True)
+    loaded, _ = warm_start_from_submission(model, greedy_plan, catalog)
+    assert loaded
+    assert score_frame(read_submission(create_submission(model)), dataset).violations.empty
+
+
+def test_unrepairable_plan_is_not_loaded(tiny, tiny_catalog):
+    dataset = copy.deepcopy(tiny)
+    dataset.carbon_limit = dataset.carbon_limit * 0.01
+    catalog = VehicleCatalog(dataset)
+    model = build_model(dataset, catalog, linear = True, sparse = True)
+    loaded, _ = warm_start_from_submission(model, GreedyPlanner(tiny, tiny_catalog).plan(), catalog)
+    assert not loaded
+
+
+def test_relax_round_plan_has_no_violations(tiny, tiny_catalog):
+    solution = solve_relax_round(tiny, tiny_catalog, polish = False)
+    score = score_frame(read_submission(submission_from_values(solution["values"])), tiny)
+    assert score.violations.empty
+    assert score.total_cost == pytest.approx(solution["cost"], rel = 1e-7)
+    assert solution["bound"] <= solution["cost"]
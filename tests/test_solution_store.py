@@ -0,0 +1,55 @@
+"""
+Solves are recorded into the store set by record_to, and a repeated request is answered from it.
+"""
+import io
+
+import pandas as pd
+import pyomo.environ as pe
+import pytest
+
+from fleet_model import build_model
+from model_cache import ModelCache
+from scoring import score_frame
+from solution_store import SolutionStore, record_to, solve_with_store
+from solvers import SolverSettings, solve
+from submission import read_submission
+
+
+def test_solve_is_recorded(tmp_path, tiny):
+    store = SolutionStore(str(tmp_path / "solutions.sqlite"))
+    record_to(store)
+    model = build_model(tiny, linear = True, sparse = True)
+    solve(model, "highs", SolverSettings(mip_rel_gap = 0))
+
+    history = store.history(tiny.content_hash())
+    assert len(history) == 1
+    stored = history.iloc[0]
+    assert stored["objective"] == pytest.approx(pe.value(model.total_cost), rel = 1e-7)
+    score = score_frame(read_submission(store.plan(stored["id"])), tiny)
+    assert score.violations.empty
+    assert score.total_cost == pytest.approx(stored["objective"], rel = 1e-7)
+
+
+def test_partial_model_is_not_recorded(tmp_path, tiny):
+    store = SolutionStore(str(tmp_path / "solutions.sqlite"))
+    record_to(store)
+    solve(build_model(tiny, linear = True, sparse = True, years = tiny.years[:2]), "highs")
+    assert store.history().empty
+
+
+def test_nothing_is_recorded_without_a_store(tmp_path, tiny):
+    store = SolutionStore(str(tmp_path / "solutions.sqlite"))
+    record_to(None)
+    solve(build_model(tiny, linear = True, sparse = True), "highs")
+    assert store.history().empty
+
+
+def test_repeated_request_is_answered_from_the_store(tmp_path, tiny_dir):
+    store = SolutionStore(str(tmp_path / "solutions.sqlite"))
+    cache = ModelCache(str(tmp_path / "cache"))
+    plan, first = solve_with_store(store, tiny_dir, cache, mip_rel_gap = 0)
+    again, second = solve_with_store(store, tiny_dir, cache, mip_rel_gap = 0)
+    assert second["id"] == first["id"]
+    assert len(store.history()) == 1
+    # the stored plan is the csv of the solved one
+    pd.testing.assert_frame_equal(again, pd.read_csv(io.StringIO(plan.to_csv(index = False))))
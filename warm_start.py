@@ -0,0 +1,414 @@
+"""
+MIP start from an existing submission: the rows of a submission csv are mapped back onto
+the decision variables of a fleet model, repaired where they break a rule, and handed to
+the solver as the initial incumbent.
+"""
+import argparse
+import math
+from collections import defaultdict, namedtuple
+
+import pyomo.environ as pe
+import pyomo.opt as po
+
+from catalog import SELL_LIMIT, VehicleCatalog
+from fleet_data import FleetDataset
+from fleet_model import build_model, fill_fleet_stock, vehicle_use_limit
+from submission import create_submission, read_submission
+
+
+RepairedPlan = namedtuple("RepairedPlan", ["bought", "use", "km", "sold", "repairs", "feasible"])
+
+
+def _fuel_rates(dataset, v, f, year):
+    # (emissions, fuel cost) per km of vehicle v on fuel f in the year
+    position, y = dataset.fuel_index[f], dataset.year_index[year]
+    consumption = dataset.consumption[dataset.vehicle_index[v], position]
+    return consumption * dataset.fuel_emissions[position, y], consumption * dataset.fuel_cost[position, y]
+
+
+def repair_plan(frame, catalog):
+    """
+    This function turns submission rows into a buy/use/sell plan that satisfies the fleet rules
+
+    parameters: frame: DataFrame: rows from read_submission
+                catalog: VehicleCatalog: catalog of the dataset the plan is repaired against
+
+    Rows naming an unknown vehicle, year, fuel or bucket are dropped, distances are clamped
+    to the vehicle range, buys are only kept in the model year, and the fleet is replayed
+    year by year: missing vehicles in use are bought in the model year (or the use is trimmed
+    when that year is gone), short demand cells are covered by driving the vehicles in use
+    further, then by putting idle vehicles to use, then by buying vehicles of the year. A year
+    over the carbon cap drops the km driven above demand, moves vehicles to cleaner fuels and
+    then hands km to cleaner idle or new vehicles. Sells are trimmed to the fleet and to the
+    20% limit, retiring vehicles are sold, the limit is widened by buying the cheapest model of
+    the year when retirements alone break it, and retirements it could not take later are sold
+    ahead. What can not be repaired is reported and leaves the plan marked infeasible.
+
+    returns a RepairedPlan of bought {(v, year): n}, use {(v, f, d, year): n}, km {(v, f, d, year): total km},
+    sold {(v, year): n}, the list of repairs made and whether the repaired plan keeps every rule
+    """
+    dataset = catalog.dataset
+    years = set(catalog.years)
+    repairs = []
+    feasible = True
+
+    bought = defaultdict(int)
+    use = defaultdict(int)
+    km = defaultdict(float)
+    sold = defaultdict(int)
+
+    for row in frame.itertuples(index = False):
+        year, v, number, kind, f, d, distance = row
+        if number <= 0:
+            continue
+        if v not in catalog.vehicles or year not in years:
+            repairs.append((year, v, f"dropped {kind} row of an unknown vehicle or year"))
+            continue
+        info = catalog.vehicles[v]
+        if kind == "Buy":
+            if year != info.model_year:
+                repairs.append((year, v, f"dropped {number} bought outside the model year {info.model_year}"))
+                continue
+            bought[v, year] += number
+        elif kind == "Sell":
+            sold[v, year] += number
+        elif kind == "Use":
+            if f not in info.fuels or d not in catalog.buckets(v):
+                repairs.append((year, v, f"dropped use on fuel {f} in bucket {d}"))
+                continue
+            if distance > info.range:
+                # csv round trips leave distances a hair above the range, only report real overshoots
+                if distance > info.range * (1 + 1e-9):
+                    repairs.append((year, v, f"clamped {distance:.0f} km per vehicle to the range {info.range}"))
+                distance = info.range
+            use[v, f, d, year] += number
+            km[v, f, d, year] += number * distance
+        else:
+            repairs.append((year, v, f"dropped row of unknown type {kind}"))
+
+    use_by_vehicle = defaultdict(list)
+    for v, f, d, year in use:
+        use_by_vehicle[v, year].append((f, d))
+
+    def rates(v, f, year):
+        return _fuel_rates(dataset, v, f, year)
+
+    def cheapest_fuel(v, year):
+        return min(catalog.fuels(v), key = lambda f: rates(v, f, year)[1])
+
+    def cleanest_fuel(v, year):
+        return min(catalog.fuels(v), key = lambda f: rates(v, f, year))
+
+    fleet = defaultdict(int)
+    in_use = defaultdict(int)
+
+    def put_to_use(v, f, d, year, number, distance):
+        # number more vehicles of v in bucket d, at most the use bound of the cell and the idle
+        # vehicles unless it is the model year, when the missing ones are bought
+        idle = fleet.get(v, 0) - in_use[v]
+        if year != catalog.model_year(v):
+            number = min(number, idle)
+        number = min(number, vehicle_use_limit(dataset, catalog, v, d, year) - use[v, f, d, year])
+        if number <= 0:
+            return 0, 0.0
+        added = min(distance, number * catalog.vehicles[v].range)
+        use[v, f, d, year] += number
+        km[v, f, d, year] += added
+        in_use[v] += number
+        if number > idle:
+            bought[v, year] += number - max(idle, 0)
+            fleet[v] += number - max(idle, 0)
+        return number, added
+
+    for year in catalog.years:
+        y = dataset.year_index[year]
+        for v in catalog.by_model_year.get(year, []):
+            fleet[v] += bought.get((v, year), 0)
+
+        # vehicles in use must be held, buy the shortfall in the model year or trim the use
+        for (v, y_), keys in use_by_vehicle.items():
+            if y_ != year:
+                continue
+            shortfall = sum(use[v, f, d, year] for f, d in keys) - fleet[v]
+            if shortfall <= 0:
+                continue
+            if year == catalog.model_year(v):
+                bought[v, year] += shortfall
+                fleet[v] += shortfall
+                repairs.append((year, v, f"bought {shortfall} more to cover the vehicles in use"))
+                continue
+            repairs.append((year, v, f"trimmed the use by {shortfall} to the {fleet[v]} held"))
+            for f, d in keys:
+                cut = min(shortfall, use[v, f, d, year])
+                if cut:
+                    km[v, f, d, year] *= (use[v, f, d, year] - cut) / use[v, f, d, year]
+                    use[v, f, d, year] -= cut
+                    shortfall -= cut
+
+        in_use.clear()
+        served = defaultdict(list)
+        for (v, f, d, y_), number in use.items():
+            if y_ == year and number > 0:
+                in_use[v] += number
+                served[catalog.vehicles[v].size, d].append((v, f))
+
+        # short demand cells: drive the vehicles in use further, then use idle vehicles, then
+        # buy vehicles of the year, the cheapest to run and to buy per km of range first
+        for s, size in enumerate(dataset.sizes):
+            for b, d in enumerate(dataset.distances):
+                short = dataset.demand[y, s, b] - sum(km[v, f, d, year] for v, f in served[size, d])
+                if short <= 1e-6:
+                    continue
+                for v, f in served[size, d]:
+                    added = min(use[v, f, d, year] * catalog.vehicles[v].range - km[v, f, d, year], short)
+                    if added > 0:
+                        km[v, f, d, year] += added
+                        short -= added
+                if short <= 1e-6:
+                    repairs.append((year, None, f"raised the km driven in {size} {d} to meet demand"))
+                    continue
+                idle = sorted(
+                    (v for v in catalog.serving[size, d] if fleet.get(v, 0) > in_use[v]),
+                    key = lambda v: rates(v, cheapest_fuel(v, year), year)[1],
+                )
+                new = sorted(
+                    (v for v in catalog.serving[size, d] if catalog.model_year(v) == year),
+                    key = lambda v: catalog.vehicles[v].cost / catalog.vehicles[v].range,
+                )
+                for v in idle + new:
+                    f = cheapest_fuel(v, year)
+                    number, added = put_to_use(v, f, d, year, math.ceil(short / catalog.vehicles[v].range), short)
+                    if number:
+                        short -= added
+                        served[size, d].append((v, f))
+                        repairs.append((year, v, f"put {number} to use on {added:.0f} km of {size} {d} demand"))
+                    if short <= 1e-6:
+                        break
+                if short > 1e-6:
+                    feasible = False
+                    repairs.append((year, None, f"{short:.0f} km of {size} {d} demand is left unmet"))
+
+        # over the carbon cap: drop the km driven above demand on the most emitting uses, move
+        # vehicles to cleaner fuels, cheapest extra fuel cost per kg saved first, then hand the
+        # km of the most emitting uses to cleaner idle vehicles or vehicles of the year
+        keys = [key for key in km if key[3] == year and km[key] > 0]
+        excess = sum(km[key] * rates(*key[:2], year)[0] for key in keys) - dataset.carbon_limit[y]
+        if excess > 1e-6:
+            surplus = defaultdict(float)
+            for v, f, d, _ in keys:
+                surplus[catalog.vehicles[v].size, d] += km[v, f, d, year]
+            for size, d in surplus:
+                surplus[size, d] -= dataset.demand[y, dataset.size_index[size], dataset.distance_index[d]]
+            trimmed = 0.0
+            for v, f, d, _ in sorted(keys, key = lambda key: -rates(*key[:2], year)[0]):
+                rate, cell = rates(v, f, year)[0], (catalog.vehicles[v].size, d)
+                if excess <= 1e-6 or rate <= 0 or surplus[cell] <= 1e-6:
+                    continue
+                cut = min(surplus[cell], km[v, f, d, year], excess / rate)
+                km[v, f, d, year] -= cut
+                surplus[cell] -= cut
+                excess -= cut * rate
+                trimmed += cut
+            if trimmed:
+                repairs.append((year, None, f"trimmed {trimmed:.0f} km driven above demand to respect the carbon cap"))
+
+            switches = []
+            for v, f, d, _ in keys:
+                (emitted, cost) = rates(v, f, year)
+                for cleaner in catalog.fuels(v):
+                    saved = emitted - rates(v, cleaner, year)[0]
+                    if saved > 0:
+                        switches.append(((rates(v, cleaner, year)[1] - cost) / saved, v, f, cleaner, d))
+            for _, v, f, cleaner, d in sorted(switches):
+                if excess <= 1e-6:
+                    break
+                if not use[v, f, d, year] or not km[v, f, d, year]:
+                    continue
+                per_vehicle = km[v, f, d, year] / use[v, f, d, year]
+                saved = per_vehicle * (rates(v, f, year)[0] - rates(v, cleaner, year)[0])
+                number = min(
+                    use[v, f, d, year],
+                    math.ceil(excess / saved),
+                    vehicle_use_limit(dataset, catalog, v, d, year) - use[v, cleaner, d, year],
+                )
+                if number <= 0:
+                    continue
+                moved = km[v, f, d, year] if number == use[v, f, d, year] else number * per_vehicle
+                use[v, f, d, year] -= number
+                km[v, f, d, year] -= moved
+                use[v, cleaner, d, year] += number
+                km[v, cleaner, d, year] += moved
+                excess -= number * saved
+                repairs.append((year, v, f"moved {number} from {f} to {cleaner} to respect the carbon cap"))
+
+            keys = [key for key in km if key[3] == year and km[key] > 0]
+            for v, f, d, _ in sorted(keys, key = lambda key: -rates(*key[:2], year)[0]):
+                if excess <= 1e-6:
+                    break
+                size, rate = catalog.vehicles[v].size, rates(v, f, year)[0]
+                cleaner = sorted(
+                    (rates(w, g, year)[0], w, g)
+                    for w in catalog.serving[size, d]
+                    if fleet.get(w, 0) > in_use[w] or catalog.model_year(w) == year
+                    for g in [cleanest_fuel(w, year)]
+                    if rates(w, g, year)[0] < rate
+                )
+                for clean_rate, w, g in cleaner:
+                    wanted = min(km[v, f, d, year], excess / (rate - clean_rate))
+                    number, moved = put_to_use(w, g, d, year, math.ceil(wanted / catalog.vehicles[w].range), wanted)
+                    if not number:
+                        continue
+                    km[v, f, d, year] -= moved
+                    excess -= moved * (rate - clean_rate)
+                    # the vehicles the remaining km no longer need stay in the fleet, unused
+                    needed = math.ceil(km[v, f, d, year] / catalog.vehicles[v].range - 1e-9)
+                    in_use[v] -= use[v, f, d, year] - needed
+                    use[v, f, d, year] = needed
+                    repairs.append((year, w, f"put {number} on {g} to take over {moved:.0f} km from {v} under the carbon cap"))
+                    if excess <= 1e-6 or not km[v, f, d, year]:
+                        break
+            if excess > 1e-6:
+                feasible = False
+                repairs.append((year, None, f"emissions stay {excess:.0f} over the carbon cap"))
+
+        # sells are limited by the vehicles held, retiring vehicles are sold in full
+        retiring = set()
+        for v, number in list(fleet.items()):
+            wanted = sold.get((v, year), 0)
+            if catalog.retirement_year(v) == year:
+                retiring.add(v)
+                if wanted != number:
+                    repairs.append((year, v, f"sold {number} retiring vehicles instead of {wanted}"))
+                wanted = number
+            elif wanted > number:
+                repairs.append((year, v, f"trimmed the sale of {wanted} to the {number} held"))
+                wanted = number
+            sold[v, year] = wanted
+        for v, y_ in list(sold):
+            if y_ == year and v not in fleet and sold[v, y_]:
+                repairs.append((year, v, f"dropped the sale of {sold[v, y_]} never bought"))
+                sold[v, y_] = 0
+
+        # trim voluntary sells down to the 20% limit
+        held = sum(fleet.values())
+        excess = sum(sold.get((v, year), 0) for v in fleet) - math.floor(SELL_LIMIT * held + 1e-9)
+        for v in sorted(fleet, key = lambda v: -sold.get((v, year), 0)):
+            if excess <= 0:
+                break
+            if v in retiring or not sold.get((v, year), 0):
+                continue
+            cut = min(excess, sold[v, year])
+            sold[v, year] -= cut
+            excess -= cut
+            repairs.append((year, v, f"kept {cut} vehicles to respect the sell limit"))
+        if excess > 0 and catalog.by_model_year.get(year):
+            # retirements alone break the limit, widen it by holding more of the cheapest model of the year
+            extra = math.ceil(sum(sold.get((v, year), 0) for v in fleet) / SELL_LIMIT - held - 1e-9)
+            cheapest = min(catalog.by_model_year[year], key = lambda v: catalog.vehicles[v].cost)
+            bought[cheapest, year] += extra
+            fleet[cheapest] += extra
+            held += extra
+            excess = 0
+            repairs.append((year, cheapest, f"bought {extra} to widen the sell limit for the retiring vehicles"))
+        if excess > 0:
+            feasible = False
+            repairs.append((year, None, f"retiring sales exceed the sell limit by {excess}"))
+        else:
+            # retirements of the coming years that would not fit under a limit of today's size
+            # are sold ahead, the oldest vehicles first
+            cap = math.floor(SELL_LIMIT * held + 1e-9)
+            room = cap - sum(sold.get((v, year), 0) for v in fleet)
+            due = defaultdict(int)
+            for v, number in fleet.items():
+                if v not in retiring and catalog.retirement_year(v) is not None:
+                    due[catalog.retirement_year(v)] += number - sold.get((v, year), 0)
+            ahead = 0
+            for later in range(catalog.last_year, year, -1):
+                ahead = max(0, due[later] + ahead - cap)
+            for v in sorted((v for v in fleet if v not in retiring), key = catalog.model_year):
+                number = min(fleet[v] - sold.get((v, year), 0), ahead, room)
+                if number <= 0:
+                    continue
+                sold[v, year] += number
+                ahead -= number
+                room -= number
+                repairs.append((year, v, f"sold {number} ahead of a retirement the sell limit can not take"))
+
+        for v in list(fleet):
+            fleet[v] -= sold.get((v, year), 0)
+            if fleet[v] <= 0:
+                del fleet[v]
+
+    def nonzero(values):
+        return {k: value for k, value in values.items() if value}
+
+    return RepairedPlan(nonzero(bought), nonzero(use), nonzero(km), nonzero(sold), repairs, feasible)
+
+
+def warm_start_from_submission(model, path, catalog):
+    """
+    This function loads a submission csv into the decision variables of a fleet model as its MIP start
+
+    parameters: model: ConcreteModel: a model from fleet_model.build_model, linear or not
+                path: str: submission csv, e.g. yesterday's plan, or a submission DataFrame
+                catalog: VehicleCatalog: catalog of the dataset the model was built from
+
+    Values are clamped to the variable bounds, every variable the plan does not mention
+    is set to 0, and years the model does not hold are skipped. Solve afterwards with
+    warmstart=True so the solver keeps the values as its first incumbent. A plan that
+    repair_plan can not make feasible is not loaded, the model keeps its values.
+
+    returns whether the plan was loaded, and the list of (year, ID, message) repairs made to it
+    """
+    bought, use, km, sold, repairs, feasible = repair_plan(read_submission(path), catalog)
+    if not feasible:
+        return False, repairs
+
+    def assign(component, values):
+        for index, var in component.items():
+            value = values.get(index, 0)
+            if var.ub is not None and value > var.ub:
+                if value > var.ub * (1 + 1e-9):
+                    repairs.append((index[-1], index[0], f"clamped {component.local_name} {value:g} to its bound {var.ub:g}"))
+                value = var.ub
+            var.set_value(value, skip_validation = True)
+
+    assign(model.number_vehicles_bought, bought)
+    assign(model.number_vehicles_use, use)
+    assign(model.number_vehicles_sold, sold)
+    if model.find_component("total_km") is not None:
+        assign(model.total_km, km)
+    else:
+        distance = {k: km[k] / number for k, number in use.items()}
+        assign(model.number_vehicles_distance, distance)
+    if model.find_component("fleet_stock") is not None:
+        fill_fleet_stock(model)
+    return True, repairs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "solve the fleet model starting from an existing submission")
+    parser.add_argument("submission", help = "submission csv used as the MIP start")
+    parser.add_argument("--data", default = "dataset", help = "dataset directory")
+    parser.add_argument("--output", default = "submission.csv", help = "submission csv to write")
+    parser.add_argument("--solver", default = "appsi_highs", help = "Pyomo solver name")
+    parser.add_argument("--time-limit", type = float, default = None, help = "seconds")
+    args = parser.parse_args()
+
+    dataset = FleetDataset.load(args.data)
+    catalog = VehicleCatalog(dataset)
+    model = build_model(dataset, catalog, linear = True)
+    loaded, repairs = warm_start_from_submission(model, args.submission, catalog)
+    for year, v, message in repairs:
+        print(year, v or "", message)
+    if loaded:
+        print("start objective", pe.value(model.total_cost))
+    else:
+        print("the submission could not be repaired, solving without a start")
+
+    opt = po.SolverFactory(args.solver)
+    kwargs = {"tee": True, "warmstart": loaded}
+    if args.time_limit is not None:
+        kwargs["timelimit"] = args.time_limit
+    opt.solve(model, **kwargs)
+    create_submission(model, args.output)
@@ -0,0 +1,45 @@
+"""
+Process pools for the parallel solvers (sweep, stochastic, lagrangian): the dataset and the
+solver settings are sent to each worker once, through the pool initializer, and every
+worker keeps the models and solvers it builds in worker_pool.worker between tasks. Workers
+record their solves in the solution store the starting process records in.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from solution_store import SolutionStore, record_to, recording
+
+
+# state of the current worker process, set up once by _init_worker
+worker = {}
+
+
+def _init_worker(dataset, time_limit, mip_rel_gap, setup, store):
+    if store is not None:
+        record_to(SolutionStore(*store))
+    worker.clear()
+    worker.update(dataset = dataset, time_limit = time_limit, mip_rel_gap = mip_rel_gap)
+    if setup is not None:
+        setup(worker)
+
+
+def start_pool(dataset, tasks, workers = None, time_limit = None, mip_rel_gap = None, setup = None):
+    """
+    This function starts a process pool whose workers all solve the given dataset
+
+    parameters: dataset: FleetDataset: the dataset the tasks are solved on, copied to every worker
+                tasks: int: number of tasks, no more workers are started than there are tasks
+                workers: int: optional, worker processes, os.cpu_count() by default
+                time_limit: float: optional, seconds per solve, kept in worker["time_limit"]
+                mip_rel_gap: float: optional, relative gap at which a solve stops, kept in worker["mip_rel_gap"]
+                setup: function: optional, module-level function called once per worker with the
+                       worker dict, to build the models and solvers its tasks reuse
+
+    returns the ProcessPoolExecutor, to be used as a context manager
+    """
+    store = recording()
+    return ProcessPoolExecutor(
+        max_workers = max(1, min(workers or os.cpu_count(), tasks)),
+        initializer = _init_worker,
+        initargs = (dataset, time_limit, mip_rel_gap, setup, None if store is None else (store.path, store.max_bytes)),
+    )